@@ -1,17 +1,33 @@
-import json
 import logging
-from typing import List
+from typing import List, Optional
 from fastapi import HTTPException
 
 from Models.Autores import Autor
 from Models.Libros import Libro
-from utils.database import execute_query_json
+from utils.database import execute_query, execute_query_one
+from utils.paginacion import LIMITE_POR_DEFECTO, armar_pagina, decodificar_cursor
+from utils.cache import MISS, TTLCache
+from utils.coalescing import SingleFlight
+from utils.sentencias import sentencias
+from utils.etags import versiones
+from Controllers.Libros import indexar_autor, vuelos_libro_autor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 1. Obtiene un autor específico por su ID.
+# Caché de lectura de autores por Id_autor; las escrituras de este módulo la invalidan.
+cache_autores = TTLCache("autores")
+
+# Lecturas idénticas concurrentes comparten una sola consulta (ver utils/coalescing.py).
+vuelos_autores = SingleFlight("autores")
+
+# 1. Obtiene un autor específico por su ID (primero busca en la caché).
+@vuelos_autores
 async def obtener_autor(id: int) -> Autor:
+    autor = cache_autores.get(id)
+    if autor is not MISS:
+        return autor
+    marca = cache_autores.marca()
     selectscript = """
         SELECT [Id_autor], [Nombre_autor], [Año_nacimiento]
         FROM [biblioteca].[autor]
@@ -19,49 +35,56 @@ async def obtener_autor(id: int) -> Autor:
     """
     params = [id]
     try:
-        result = await execute_query_json(selectscript, params=params)
-        if result:
-            result_dict = json.loads(result)
-            if len(result_dict) > 0:
-                return result_dict[0]
+        autor = await execute_query_one(selectscript, params=params, prepared=True)
+        if autor:
+            cache_autores.set(id, autor, marca)
+            return autor
         raise HTTPException(status_code=404, detail=f"Autor con id {id} no encontrado")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
-# 2. Obtiene la lista completa de autores.
-async def obtener_todos_autores() -> List[Autor]:
-    selectscript = """
-        SELECT [Id_autor], [Nombre_autor], [Año_nacimiento]
+# 2. Obtiene una página de autores ordenada por Id_autor (paginación por cursor).
+async def obtener_todos_autores(limit: int = LIMITE_POR_DEFECTO, cursor: Optional[str] = None) -> dict:
+    filtro = ""
+    params = [limit + 1]
+    if cursor:
+        filtro = "WHERE [Id_autor] > ?"
+        params += decodificar_cursor(cursor, 1)
+    selectscript = f"""
+        SELECT TOP (?) [Id_autor], [Nombre_autor], [Año_nacimiento]
         FROM [biblioteca].[autor]
+        {filtro}
+        ORDER BY [Id_autor];
     """
     try:
-        result = await execute_query_json(selectscript)
-        if result:
-            return json.loads(result)
-        return []
+        filas = await execute_query(selectscript, params=params)
+        return armar_pagina(filas, limit, ["Id_autor"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
 # 3. Crea un nuevo autor en la base de datos.
 async def crear_autor(autor: Autor) -> Autor:
-    sqlscript = "INSERT INTO [biblioteca].[autor] ([Nombre_autor], [Año_nacimiento]) VALUES (?, ?);"
+    # OUTPUT devuelve la fila recién insertada, con su Id_autor real aunque haya
+    # inserciones concurrentes.
+    sqlscript = """
+        INSERT INTO [biblioteca].[autor] ([Nombre_autor], [Año_nacimiento])
+        OUTPUT INSERTED.[Id_autor], INSERTED.[Nombre_autor], INSERTED.[Año_nacimiento]
+        VALUES (?, ?);
+    """
     params = [autor.Nombre_autor, autor.Año_nacimiento]
     try:
-        await execute_query_json(sqlscript, params, needs_commit=True)
+        creado = await execute_query_one(sqlscript, params, needs_commit=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creando autor: {str(e)}")
-
-    sqlfind = "SELECT TOP 1 [Id_autor] FROM [biblioteca].[autor] ORDER BY [Id_autor] DESC"
-    try:
-        result_find = await execute_query_json(sqlfind)
-        if result_find:
-            nuevo_id = json.loads(result_find)[0]['Id_autor']
-            return await obtener_autor(nuevo_id)
+    finally:
+        vuelos_autores.clear()
+        versiones.incrementar("autor")
+    if not creado:
         raise HTTPException(status_code=500, detail="No se pudo recuperar el autor creado")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error buscando autor creado: {str(e)}")
+    indexar_autor(creado)
+    return creado
 
 # 4. Actualiza los datos de un autor existente.
 async def actualizar_autor(autor: Autor) -> Autor:
@@ -70,18 +93,28 @@ async def actualizar_autor(autor: Autor) -> Autor:
     datos_dict = autor.model_dump(exclude={'Id_autor'}, exclude_none=True)
     if not datos_dict:
         raise HTTPException(status_code=400, detail="No hay datos para actualizar.")
-    llaves = [k for k in datos_dict.keys()]
-    variables = " = ?, ".join(llaves) + " = ?"
-    updatescript = f"UPDATE [biblioteca].[autor] SET {variables} WHERE [Id_autor] = ?;"
-    params = [datos_dict[k] for k in llaves]
+    # El texto del UPDATE sale del registro de sentencias: uno por combinación de columnas.
+    updatescript, params = sentencias.update(
+        "[biblioteca].[autor]", Autor, "Id_autor", datos_dict,
+        salida=["Id_autor", "Nombre_autor", "Año_nacimiento"]
+    )
     params.append(autor.Id_autor)
     try:
-        await execute_query_json(updatescript, params, needs_commit=True)
+        actualizado = await execute_query_one(updatescript, params, needs_commit=True, prepared=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando autor: {str(e)}")
-    return await obtener_autor(autor.Id_autor)
+    finally:
+        cache_autores.invalidate(autor.Id_autor)
+        vuelos_autores.clear()
+        versiones.incrementar("autor")
+        vuelos_libro_autor.clear()
+    if not actualizado:
+        raise HTTPException(status_code=404, detail=f"Autor con id {autor.Id_autor} no encontrado")
+    indexar_autor(actualizado)
+    return actualizado
 
 # 5. Obtiene la lista de libros escritos por un autor específico.
+@vuelos_libro_autor
 async def obtener_libros_de_autor(id_autor: int) -> List[Libro]:
 
     # Primero verificamos si el autor existe para dar un error 404 claro.
@@ -99,10 +132,7 @@ async def obtener_libros_de_autor(id_autor: int) -> List[Libro]:
     params = [id_autor]
 
     try:
-        result = await execute_query_json(sqlscript, params=params)
-        if result:
-            return json.loads(result)
         # Si el autor existe pero no tiene libros, devuelve una lista vacía.
-        return []
+        return await execute_query(sqlscript, params=params)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
\ No newline at end of file
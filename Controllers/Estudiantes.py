@@ -1,17 +1,99 @@
-import json
 import logging
-from typing import List
+import os
+from typing import List, Optional
 from fastapi import HTTPException
 
 from Models.Estudiantes import Estudiante
-from utils.database import execute_query_json
-from Controllers.Prestamos import contar_prestamos_activos 
+from utils.database import execute_query, execute_query_one, transaction
+from utils.paginacion import LIMITE_POR_DEFECTO, armar_pagina, decodificar_cursor
+from utils.cache import MISS, TTLCache
+from utils.cargas import en_lotes, validar_filas
+from utils.coalescing import SingleFlight
+from utils.sentencias import sentencias
+from utils.etags import versiones
+from utils.busqueda import IndicePrefijos
+from utils.tareas import TareaPeriodica
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Obtiene un estudiante específico por su ID.
+# Caché de lectura de estudiantes por matrícula; las escrituras de este módulo la invalidan.
+cache_estudiantes = TTLCache("estudiantes")
+
+# Lecturas idénticas concurrentes comparten una sola consulta (ver utils/coalescing.py).
+vuelos_estudiantes = SingleFlight("estudiantes")
+
+# Búsqueda de estudiantes por el comienzo del nombre y por correo exacto, en memoria
+# (ver utils/busqueda.py). Guarda la fila completa de cada estudiante, activo o no, así la
+# búsqueda no consulta la base de datos. Se carga al iniciar, las escrituras de este módulo
+# lo mantienen al día y se vuelve a cargar cada BUSQUEDA_RECARGA_SEGUNDOS.
+indice_estudiantes = IndicePrefijos("estudiantes_nombre")
+_por_correo = {}
+INTERVALO_RECARGA_ESTUDIANTES = float(os.getenv("BUSQUEDA_RECARGA_SEGUNDOS", "3600"))
+
+def _clave_correo(correo: Optional[str]) -> str:
+    return (correo or "").strip().casefold()
+
+# Carga el índice de búsqueda desde la base de datos.
+# Si una escritura ocurre mientras se lee, se vuelve a leer (ver _cargar_indice_busqueda en Controllers/Libros.py).
+async def _cargar_indice_estudiantes() -> dict:
+    selectscript = """
+        SELECT [id_matricula_estudiante], [Nombre_estudiante],
+               [Correo_estudiante], [Edad], [Esta_Activo]
+        FROM [biblioteca].[estudiante];
+    """
+    for _ in range(5):
+        version = versiones.clave(("estudiante",))
+        try:
+            filas = await execute_query(selectscript, compacto=True)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        if versiones.clave(("estudiante",)) == version:
+            break
+    estudiantes = list(filas)
+    indice_estudiantes.cargar(
+        (estudiante["id_matricula_estudiante"], estudiante["Nombre_estudiante"], estudiante)
+        for estudiante in estudiantes
+    )
+    _por_correo.clear()
+    for estudiante in estudiantes:
+        _por_correo.setdefault(_clave_correo(estudiante["Correo_estudiante"]), set()).add(estudiante["id_matricula_estudiante"])
+    return {"estudiantes": len(estudiantes)}
+
+tarea_indice_estudiantes = TareaPeriodica("indice_estudiantes", _cargar_indice_estudiantes)
+
+# Agrega o actualiza un estudiante en el índice de búsqueda después de una escritura.
+def _indexar_estudiante(estudiante: dict):
+    id_estudiante = estudiante["id_matricula_estudiante"]
+    anterior = indice_estudiantes.datos(id_estudiante)
+    if anterior is not None:
+        _por_correo.get(_clave_correo(anterior["Correo_estudiante"]), set()).discard(id_estudiante)
+    indice_estudiantes.poner(id_estudiante, estudiante["Nombre_estudiante"], estudiante)
+    _por_correo.setdefault(_clave_correo(estudiante["Correo_estudiante"]), set()).add(id_estudiante)
+
+# Busca estudiantes (activos o no) por el comienzo de alguna palabra del nombre, por correo
+# exacto (sin distinguir mayúsculas) o por ambos. Resuelve en memoria, sin consultar la base de datos.
+async def buscar_estudiantes(nombre: Optional[str], correo: Optional[str], limit: int) -> List[Estudiante]:
+    if not indice_estudiantes.cargado:
+        # Recién iniciada la aplicación: se espera la carga en curso.
+        await tarea_indice_estudiantes.ejecutar()
+    if correo is not None:
+        ids = sorted(_por_correo.get(_clave_correo(correo), ()))
+        if nombre is not None:
+            ids = [id_estudiante for id_estudiante in ids if indice_estudiantes.coincide(id_estudiante, nombre)]
+        ids = ids[:limit]
+    else:
+        ids = indice_estudiantes.buscar(nombre, limit)
+    encontrados = [indice_estudiantes.datos(id_estudiante) for id_estudiante in ids]
+    return [estudiante for estudiante in encontrados if estudiante is not None]
+
+# Obtiene un estudiante específico por su ID (primero busca en la caché).
+@vuelos_estudiantes
 async def obtener_estudiante(id: int) -> Estudiante:
+    estudiante = cache_estudiantes.get(id)
+    if estudiante is not MISS:
+        return estudiante
+    marca = cache_estudiantes.marca()
     selectscript = """
         SELECT [id_matricula_estudiante], [Nombre_estudiante], 
                [Correo_estudiante], [Edad], [Esta_Activo]
@@ -20,30 +102,33 @@ async def obtener_estudiante(id: int) -> Estudiante:
     """
     params = [id]
     try:
-        result = await execute_query_json(selectscript, params=params)
-        if result:
-            result_dict = json.loads(result)
-            if len(result_dict) > 0:
-                return result_dict[0]
+        estudiante = await execute_query_one(selectscript, params=params, prepared=True)
+        if estudiante:
+            cache_estudiantes.set(id, estudiante, marca)
+            return estudiante
         raise HTTPException(status_code=404, detail=f"Estudiante con id {id} no encontrado")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-# Obtiene una lista de todos los estudiantes que están activos.
-async def obtener_todos_estudiantes() -> List[Estudiante]:
-    selectscript = """
-        SELECT [id_matricula_estudiante], [Nombre_estudiante], 
+# Obtiene una página de los estudiantes activos ordenada por matrícula (paginación por cursor).
+async def obtener_todos_estudiantes(limit: int = LIMITE_POR_DEFECTO, cursor: Optional[str] = None) -> dict:
+    filtro = ""
+    params = [limit + 1]
+    if cursor:
+        filtro = "AND [id_matricula_estudiante] > ?"
+        params += decodificar_cursor(cursor, 1)
+    selectscript = f"""
+        SELECT TOP (?) [id_matricula_estudiante], [Nombre_estudiante], 
                [Correo_estudiante], [Edad], [Esta_Activo]
         FROM [biblioteca].[estudiante]
-        WHERE [Esta_Activo] = 1;
+        WHERE [Esta_Activo] = 1 {filtro}
+        ORDER BY [id_matricula_estudiante];
     """
     try:
-        result = await execute_query_json(selectscript)
-        if result:
-            return json.loads(result)
-        return []
+        filas = await execute_query(selectscript, params=params)
+        return armar_pagina(filas, limit, ["id_matricula_estudiante"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -51,7 +136,8 @@ async def obtener_todos_estudiantes() -> List[Estudiante]:
 async def crear_estudiante(estudiante: Estudiante) -> Estudiante:
     sqlscript: str = """
         INSERT INTO [biblioteca].[estudiante] ([Nombre_estudiante], [Correo_estudiante], [Edad])
-        OUTPUT INSERTED.id_matricula_estudiante AS NuevoId
+        OUTPUT INSERTED.[id_matricula_estudiante], INSERTED.[Nombre_estudiante],
+               INSERTED.[Correo_estudiante], INSERTED.[Edad], INSERTED.[Esta_Activo]
         VALUES (?, ?, ?);
     """
     params = [
@@ -60,13 +146,23 @@ async def crear_estudiante(estudiante: Estudiante) -> Estudiante:
         estudiante.Edad
     ]
     try:
-        result = await execute_query_json(sqlscript, params, needs_commit=True)
-        if result:
-            nuevo_id = json.loads(result)[0]['NuevoId']
-            return await obtener_estudiante(nuevo_id)
+        creado = await execute_query_one(sqlscript, params, needs_commit=True)
+        if creado:
+            _indexar_estudiante(creado)
+            return creado
         raise HTTPException(status_code=500, detail="No se pudo crear el estudiante")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        vuelos_estudiantes.clear()
+        versiones.incrementar("estudiante")
+
+# Condición del UPDATE que desactiva a un estudiante (parámetro: la matrícula).
+SIN_PRESTAMOS_ACTIVOS = """NOT EXISTS (
+            SELECT 1
+            FROM [biblioteca].[prestamo]
+            WHERE [Id_matricula_estudiante] = ? AND [Fecha_devolucion] IS NULL
+        )"""
 
 # Actualiza los datos de un estudiante (incluyendo estado Activo/Inactivo).
 async def actualizar_estudiante(estudiante: Estudiante) -> Estudiante:
@@ -74,36 +170,116 @@ async def actualizar_estudiante(estudiante: Estudiante) -> Estudiante:
     if id_estudiante is None:
         raise HTTPException(status_code=400, detail="El id_matricula_estudiante es necesario para actualizar.")
 
-    # Regla de negocio: Si se intenta desactivar, validar préstamos pendientes.
-    if estudiante.Esta_Activo is False:
-        activos = await contar_prestamos_activos(id_estudiante)
-        if activos > 0:
-            raise HTTPException(status_code=409, 
-                detail=f"Conflicto: No se puede desactivar. El estudiante tiene {activos} préstamos activos.")
-
     # Prepara el update dinámico excluyendo campos nulos y el ID.
     datos_dict = estudiante.model_dump(exclude={'id_matricula_estudiante'}, exclude_none=True) 
 
     if not datos_dict:
         raise HTTPException(status_code=400, detail="No hay datos para actualizar.")
 
-    llaves = [k for k in datos_dict.keys()]
-    variables = " = ?, ".join(llaves) + " = ?"
+    # Regla de negocio: no se puede desactivar a un estudiante con préstamos pendientes.
+    # La condición va en el mismo UPDATE: el préstamo que se cree a la vez (desde cualquier
+    # worker) bloquea la fila del estudiante, así que no puede colarse entre la verificación
+    # y la escritura.
+    desactivar = estudiante.Esta_Activo is False
+    condicion = SIN_PRESTAMOS_ACTIVOS if desactivar else ""
 
-    updatescript = f"""
-        UPDATE [biblioteca].[estudiante]
-        SET {variables}
+    # El texto del UPDATE sale del registro de sentencias: uno por combinación de columnas.
+    updatescript, params = sentencias.update(
+        "[biblioteca].[estudiante]", Estudiante, "id_matricula_estudiante", datos_dict,
+        salida=list(Estudiante.model_fields), condicion=condicion
+    )
+    params.append(id_estudiante)
+    if desactivar:
+        params.append(id_estudiante)
+    # Solo si no se pudo desactivar: distingue un estudiante inexistente de uno con préstamos.
+    sqlmotivo = """
+        SELECT (
+            SELECT COUNT(Id_prestamo)
+            FROM [biblioteca].[prestamo]
+            WHERE [Id_matricula_estudiante] = ? AND [Fecha_devolucion] IS NULL
+        ) AS total_activos
+        FROM [biblioteca].[estudiante]
         WHERE [id_matricula_estudiante] = ?;
     """
-    params = [datos_dict[k] for k in llaves]
-    params.append(id_estudiante)
 
+    # OUTPUT devuelve la fila actualizada; si no hay fila, el estudiante no existe o
+    # (al desactivarlo) tiene préstamos activos.
     try:
-        await obtener_estudiante(id_estudiante) # Asegura que existe
-        await execute_query_json(updatescript, params, needs_commit=True)
+        actualizado = await execute_query_one(updatescript, params, needs_commit=True, prepared=True)
+        if not actualizado and desactivar:
+            motivo = await execute_query_one(sqlmotivo, [id_estudiante, id_estudiante])
+            if motivo:
+                raise HTTPException(status_code=400,
+                    detail=f"No se puede desactivar. El estudiante tiene {motivo['total_activos']} préstamos activos.")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando estudiante: {str(e)}")
+    finally:
+        cache_estudiantes.invalidate(id_estudiante)
+        vuelos_estudiantes.clear()
+        versiones.incrementar("estudiante")
+
+    if not actualizado:
+        raise HTTPException(status_code=404, detail=f"Estudiante con id {id_estudiante} no encontrado")
+    _indexar_estudiante(actualizado)
+    return actualizado
+
+# Registra varios estudiantes en una sola solicitud.
+# Cada fila se valida por separado y las inválidas se informan sin detener la carga.
+# Las válidas se envían por lotes a una tabla temporal con fast_executemany y se pasan a
+# la tabla real con un único INSERT ... SELECT ordenado por fila: SQL Server asigna las
+# identidades en ese orden, así que ordenar el OUTPUT por matrícula permite saber qué
+# matrícula le tocó a cada fila del payload. (El OUTPUT de un INSERT no puede devolver
+# columnas de la tabla de origen, como [Fila].) Cada estudiante creado se devuelve con
+# su `fila`, igual que los errores, para que el cliente los relacione con lo que envió.
+async def crear_estudiantes_masivo(filas: List[dict]) -> dict:
+    sqltemporal = """
+        DROP TABLE IF EXISTS #carga_estudiantes;
+        CREATE TABLE #carga_estudiantes (
+            [Fila] INT NOT NULL PRIMARY KEY,
+            [Nombre_estudiante] NVARCHAR(255) NULL,
+            [Correo_estudiante] NVARCHAR(255) NULL,
+            [Edad] INT NULL
+        );
+    """
+    sqlcarga = """
+        INSERT INTO #carga_estudiantes ([Fila], [Nombre_estudiante], [Correo_estudiante], [Edad])
+        VALUES (?, ?, ?, ?);
+    """
+    sqlinsert = """
+        INSERT INTO [biblioteca].[estudiante] ([Nombre_estudiante], [Correo_estudiante], [Edad])
+        OUTPUT INSERTED.[id_matricula_estudiante], INSERTED.[Nombre_estudiante],
+               INSERTED.[Correo_estudiante], INSERTED.[Edad], INSERTED.[Esta_Activo]
+        SELECT [Nombre_estudiante], [Correo_estudiante], [Edad]
+        FROM #carga_estudiantes
+        ORDER BY [Fila];
+    """
+    validas, errores = validar_filas(filas, Estudiante)
+
+    creados = []
+    for lote in en_lotes(validas):
+        try:
+            async with transaction() as tx:
+                await tx.execute(sqltemporal)
+                await tx.executemany(sqlcarga, [
+                    [indice, e.Nombre_estudiante, e.Correo_estudiante, e.Edad]
+                    for indice, e in lote
+                ])
+                insertados = await tx.execute(sqlinsert)
+                if len(insertados) != len(lote):
+                    raise Exception(f"Se esperaban {len(lote)} filas insertadas y se obtuvieron {len(insertados)}")
+        except Exception as e:
+            logger.error(f"Error en la carga masiva de estudiantes: {e}")
+            errores += [{"fila": indice, "detalle": f"Database error: {str(e)}"} for indice, _ in lote]
+            continue
+        finally:
+            vuelos_estudiantes.clear()
+            versiones.incrementar("estudiante")
+        ordenados = sorted(insertados, key=lambda fila: fila["id_matricula_estudiante"])
+        for (indice, _), estudiante in zip(lote, ordenados):
+            _indexar_estudiante(estudiante)
+            creados.append({"fila": indice, **estudiante})
 
-    return await obtener_estudiante(id_estudiante)
\ No newline at end of file
+    errores.sort(key=lambda error: error["fila"])
+    return {"creados": creados, "errores": errores}
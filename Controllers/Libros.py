@@ -1,17 +1,108 @@
-import json
+import asyncio
+import heapq
 import logging
-from typing import List
+import os
+from typing import List, Optional
 from fastapi import HTTPException
 
 from Models.Libros import Libro
 from Models.Autores import Autor
-from utils.database import execute_query_json
+from utils.database import RANGE_LOCK, execute_query, execute_query_one, transaction
+from utils.paginacion import LIMITE_POR_DEFECTO, armar_pagina, decodificar_cursor
+from utils.cache import MISS, TTLCache
+from utils.cargas import en_lotes, validar_filas
+from utils.coalescing import SingleFlight
+from utils.sentencias import sentencias
+from utils.etags import versiones
+from utils.instantaneas import InstantaneaComprimida
+from utils.busqueda import IndiceTrigramas, trigramas
+from utils.tareas import TareaPeriodica
+from Controllers.Prestamos import COLUMNAS_PRESTAMO, FROM_PRESTAMO
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 1. Obtiene un libro por su ISBN.
+# Caché de lectura de libros por ISBN; las escrituras de este módulo la invalidan.
+cache_libros = TTLCache("libros")
+
+# Lecturas idénticas concurrentes comparten una sola consulta (ver utils/coalescing.py).
+# Las escrituras los limpian después del commit, junto con la caché.
+vuelos_libros = SingleFlight("libros")
+vuelos_libro_autor = SingleFlight("libro_autor")
+
+# Relaciones que se pueden incluir en las respuestas de libros con `?expand=`.
+EXPANSIONES_LIBRO = ("autores", "prestamo_activo")
+
+# Función interna: convierte "autores,prestamo_activo" en un conjunto validado.
+def parsear_expansiones(expand: Optional[str]) -> set:
+    if not expand:
+        return set()
+    expansiones = {parte.strip() for parte in expand.split(",") if parte.strip()}
+    desconocidas = expansiones.difference(EXPANSIONES_LIBRO)
+    if desconocidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Valores de expand no válidos: {sorted(desconocidas)}. Use: {', '.join(EXPANSIONES_LIBRO)}"
+        )
+    return expansiones
+
+# Función interna: autores de varios libros en una sola consulta, agrupados por ISBN.
+async def _autores_por_libro(isbns: List[str]) -> dict:
+    marcadores = ", ".join("?" for _ in isbns)
+    sqlscript = f"""
+        SELECT LA.[ISBN], A.[Id_autor], A.[Nombre_autor], A.[Año_nacimiento]
+        FROM [biblioteca].[libro_autor] AS LA
+        INNER JOIN [biblioteca].[autor] AS A
+            ON A.[Id_autor] = LA.[Id_autor]
+        WHERE LA.[ISBN] IN ({marcadores})
+        ORDER BY LA.[ISBN], A.[Id_autor];
+    """
+    agrupados = {isbn: [] for isbn in isbns}
+    for fila in await execute_query(sqlscript, params=isbns):
+        agrupados[fila.pop("ISBN")].append(fila)
+    return agrupados
+
+# Función interna: préstamo activo más reciente de varios libros en una sola consulta.
+async def _prestamo_activo_por_libro(isbns: List[str]) -> dict:
+    marcadores = ", ".join("?" for _ in isbns)
+    sqlscript = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+        WHERE P.[ISBN] IN ({marcadores}) AND P.[Fecha_devolucion] IS NULL
+        ORDER BY P.Fecha_prestamo DESC, P.Id_prestamo DESC;
+    """
+    activos = {}
+    for fila in await execute_query(sqlscript, params=isbns):
+        activos.setdefault(fila["ISBN"], fila)
+    return activos
+
+# Función interna: agrega a cada libro las relaciones pedidas.
+# Cada relación cuesta una consulta sin importar cuántos libros haya, y ambas corren en paralelo.
+async def _expandir_libros(libros: List[dict], expansiones: set):
+    isbns = [libro["ISBN"] for libro in libros]
+    if not isbns or not expansiones:
+        return
+    consultas = {}
+    if "autores" in expansiones:
+        consultas["autores"] = _autores_por_libro(isbns)
+    if "prestamo_activo" in expansiones:
+        consultas["prestamo_activo"] = _prestamo_activo_por_libro(isbns)
+    try:
+        resultados = dict(zip(consultas, await asyncio.gather(*consultas.values())))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    for libro in libros:
+        if "autores" in resultados:
+            libro["autores"] = resultados["autores"].get(libro["ISBN"], [])
+        if "prestamo_activo" in resultados:
+            libro["prestamo_activo"] = resultados["prestamo_activo"].get(libro["ISBN"])
+
+# 1. Obtiene un libro por su ISBN (primero busca en la caché).
+@vuelos_libros
 async def obtener_libro(isbn: str) -> Libro:
+    libro = cache_libros.get(isbn)
+    if libro is not MISS:
+        return libro
+    marca = cache_libros.marca()
     selectscript = """
         SELECT [ISBN], [Titulo], [Año_publicacion]
         FROM [biblioteca].[libro]
@@ -19,94 +110,312 @@ async def obtener_libro(isbn: str) -> Libro:
     """
     params = [isbn]
     try:
-        result = await execute_query_json(selectscript, params=params)
-        if result:
-            result_dict = json.loads(result)
-            if len(result_dict) > 0:
-                return result_dict[0]
+        libro = await execute_query_one(selectscript, params=params, prepared=True)
+        if libro:
+            cache_libros.set(isbn, libro, marca)
+            return libro
         raise HTTPException(status_code=404, detail=f"Libro con ISBN {isbn} no encontrado")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
-# 2. Obtiene todos los libros.
-async def obtener_todos_libros() -> List[Libro]:
-    selectscript = """
-        SELECT [ISBN], [Titulo], [Año_publicacion]
+# 1.1 Obtiene un libro con las relaciones pedidas en `expand`.
+async def obtener_libro_expandido(isbn: str, expansiones: set) -> dict:
+    libro = await obtener_libro(isbn)
+    await _expandir_libros([libro], expansiones)
+    return libro
+
+# 2. Obtiene una página de libros ordenada por ISBN (paginación por cursor),
+# con las relaciones pedidas en `expand` cargadas para toda la página a la vez.
+async def obtener_todos_libros(limit: int = LIMITE_POR_DEFECTO, cursor: Optional[str] = None,
+                               expansiones: Optional[set] = None) -> dict:
+    filtro = ""
+    params = [limit + 1]
+    if cursor:
+        filtro = "WHERE [ISBN] > ?"
+        params += decodificar_cursor(cursor, 1)
+    selectscript = f"""
+        SELECT TOP (?) [ISBN], [Titulo], [Año_publicacion]
         FROM [biblioteca].[libro]
+        {filtro}
+        ORDER BY [ISBN];
     """
     try:
-        result = await execute_query_json(selectscript)
-        if result:
-            return json.loads(result)
-        return []
+        filas = await execute_query(selectscript, params=params)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    pagina = armar_pagina(filas, limit, ["ISBN"])
+    if expansiones:
+        await _expandir_libros(pagina["elementos"], expansiones)
+    return pagina
 
-# 3. Crea un nuevo libro.
-async def crear_libro(libro: Libro) -> Libro:
+# 2.1 Arma el catálogo completo (todos los libros con sus autores) para la instantánea.
+# Son dos consultas sin parámetros que corren en paralelo; si una escritura ocurre
+# entre ambas, incrementa la versión de las tablas y la instantánea se vuelve a armar.
+async def _cargar_catalogo() -> list:
+    sqllibros = """
+        SELECT [ISBN], [Titulo], [Año_publicacion]
+        FROM [biblioteca].[libro]
+        ORDER BY [ISBN];
+    """
+    sqlautores = """
+        SELECT LA.[ISBN], A.[Id_autor], A.[Nombre_autor], A.[Año_nacimiento]
+        FROM [biblioteca].[libro_autor] AS LA
+        INNER JOIN [biblioteca].[autor] AS A
+            ON A.[Id_autor] = LA.[Id_autor]
+        ORDER BY LA.[ISBN], A.[Id_autor];
+    """
     try:
-        existente = await obtener_libro(libro.ISBN)
-        if existente:
-            raise HTTPException(status_code=400, detail=f"Ya existe un libro con el ISBN {libro.ISBN}")
-    except HTTPException as e:
-        if e.status_code != 404:
-            raise e
+        libros, autores = await asyncio.gather(
+            execute_query(sqllibros, compacto=True),
+            execute_query(sqlautores, compacto=True)
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error verificando ISBN: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    autores_por_libro = {}
+    for isbn, id_autor, nombre, anio in autores.tuplas:
+        autores_por_libro.setdefault(isbn, []).append(
+            {"Id_autor": id_autor, "Nombre_autor": nombre, "Año_nacimiento": anio}
+        )
+    return [
+        {"ISBN": isbn, "Titulo": titulo, "Año_publicacion": anio, "autores": autores_por_libro.get(isbn, [])}
+        for isbn, titulo, anio in libros.tuplas
+    ]
+
+# Catálogo completo materializado: JSON comprimido con gzip en memoria, reconstruido
+# después de cada escritura en libros, autores o sus asignaciones (ver utils/instantaneas.py)
+# y cada CATALOGO_REFRESCO_SEGUNDOS, para recoger cambios hechos fuera de este proceso.
+catalogo = InstantaneaComprimida("catalogo", _cargar_catalogo, ("libro", "libro_autor", "autor"))
+INTERVALO_REFRESCO_CATALOGO = float(os.getenv("CATALOGO_REFRESCO_SEGUNDOS", "300"))
+
+# Búsqueda de libros por título y por nombre de autor, en memoria (ver utils/busqueda.py).
+# Hay un índice por tabla y la relación libro-autor en dos diccionarios: un acierto en un
+# autor cuenta para todos sus libros, y renombrar un autor no obliga a tocar sus libros.
+# Se carga al iniciar, las escrituras de libros y autores lo mantienen al día, y se vuelve
+# a cargar cada BUSQUEDA_RECARGA_SEGUNDOS para recoger cambios hechos fuera de este proceso.
+indice_titulos = IndiceTrigramas("libros_titulo")
+indice_autores = IndiceTrigramas("libros_autor")
+_autores_de_libro = {}
+_libros_de_autor = {}
+INTERVALO_RECARGA_BUSQUEDA = float(os.getenv("BUSQUEDA_RECARGA_SEGUNDOS", "3600"))
+
+# 2.2 Carga los índices de búsqueda desde la base de datos.
+# Si una escritura ocurre mientras se lee (cambia la versión de las tablas, ver utils/etags.py),
+# se vuelve a leer: la actualización incremental de esa escritura se hizo sobre el índice viejo.
+# Las tres consultas van una tras otra: es trabajo de fondo y así no pide conexiones de más
+# al pool mientras arrancan las demás cargas.
+async def _cargar_indice_busqueda() -> dict:
+    tablas = ("libro", "libro_autor", "autor")
+    sqllibros = "SELECT [ISBN], [Titulo], [Año_publicacion] FROM [biblioteca].[libro];"
+    sqlautores = "SELECT [Id_autor], [Nombre_autor] FROM [biblioteca].[autor];"
+    sqlrelaciones = "SELECT [ISBN], [Id_autor] FROM [biblioteca].[libro_autor];"
+    for _ in range(5):
+        version = versiones.clave(tablas)
+        try:
+            libros = await execute_query(sqllibros, compacto=True)
+            autores = await execute_query(sqlautores, compacto=True)
+            relaciones = await execute_query(sqlrelaciones, compacto=True)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+        if versiones.clave(tablas) == version:
+            break
+    indice_titulos.cargar((libro["ISBN"], libro["Titulo"], libro) for libro in libros)
+    indice_autores.cargar((autor["Id_autor"], autor["Nombre_autor"], autor) for autor in autores)
+    _autores_de_libro.clear()
+    _libros_de_autor.clear()
+    for isbn, id_autor in relaciones.tuplas:
+        _relacionar(isbn, id_autor)
+    return {"libros": len(libros), "autores": len(autores), "relaciones": len(relaciones)}
+
+tarea_indice_busqueda = TareaPeriodica("indice_busqueda", _cargar_indice_busqueda)
 
+# Funciones internas para mantener al día los índices de búsqueda después de cada escritura.
+def _indexar_libro(libro: dict):
+    datos = {"ISBN": libro["ISBN"], "Titulo": libro["Titulo"], "Año_publicacion": libro["Año_publicacion"]}
+    indice_titulos.poner(libro["ISBN"], libro["Titulo"], datos)
+
+def _desindexar_libro(isbn: str):
+    indice_titulos.quitar(isbn)
+    for id_autor in _autores_de_libro.pop(isbn, ()):
+        _libros_de_autor.get(id_autor, set()).discard(isbn)
+
+def _relacionar(isbn: str, id_autor: int):
+    _autores_de_libro.setdefault(isbn, set()).add(id_autor)
+    _libros_de_autor.setdefault(id_autor, set()).add(isbn)
+
+def _desrelacionar(isbn: str, id_autor: int):
+    _autores_de_libro.get(isbn, set()).discard(id_autor)
+    _libros_de_autor.get(id_autor, set()).discard(isbn)
+
+# Agrega o actualiza un autor en el índice de búsqueda (lo usan las escrituras de Controllers/Autores.py).
+def indexar_autor(autor: dict):
+    indice_autores.poner(autor["Id_autor"], autor["Nombre_autor"], {"Id_autor": autor["Id_autor"], "Nombre_autor": autor["Nombre_autor"]})
+
+# 2.3 Busca libros por título o por nombre de autor, sin distinguir tildes ni mayúsculas.
+# Cada libro toma el mejor puntaje entre su título y sus autores; empates por ISBN.
+# De los títulos alcanzan los `limit` mejores; los autores se puntúan todos, porque
+# un autor puede no tener libros y no asegura ningún resultado.
+async def buscar_libros(q: str, limit: int) -> List[dict]:
+    if not indice_titulos.cargado:
+        # Recién iniciada la aplicación: se espera la carga en curso.
+        await tarea_indice_busqueda.ejecutar()
+    gramas = trigramas(q)
+    puntajes = indice_titulos.puntuar(gramas, limit)
+    for id_autor, puntaje in indice_autores.puntuar(gramas).items():
+        for isbn in _libros_de_autor.get(id_autor, ()):
+            if puntaje > puntajes.get(isbn, 0):
+                puntajes[isbn] = puntaje
+    resultados = []
+    for isbn, puntaje in heapq.nsmallest(limit, puntajes.items(), key=lambda par: (-par[1], par[0])):
+        libro = indice_titulos.datos(isbn)
+        if libro is None:
+            continue
+        autores = [indice_autores.datos(id_autor) for id_autor in sorted(_autores_de_libro.get(isbn, ()))]
+        resultados.append({
+            **libro,
+            "Autores": [autor["Nombre_autor"] for autor in autores if autor is not None],
+            "Puntaje": round(puntaje, 4),
+        })
+    return resultados
+
+# 3. Crea un nuevo libro.
+# El INSERT devuelve la fila creada con OUTPUT, y un ISBN repetido se detecta por la
+# violación de clave primaria, sin consultas previas ni posteriores.
+async def crear_libro(libro: Libro) -> Libro:
     sqlscript: str = """
         INSERT INTO [biblioteca].[libro] ([ISBN], [Titulo], [Año_publicacion])
+        OUTPUT INSERTED.[ISBN], INSERTED.[Titulo], INSERTED.[Año_publicacion]
         VALUES (?, ?, ?);
     """
     params = [libro.ISBN, libro.Titulo, libro.Año_publicacion]
     try:
-        await execute_query_json(sqlscript, params, needs_commit=True)
+        creado = await execute_query_one(sqlscript, params, needs_commit=True)
     except Exception as e:
+        if "PRIMARY KEY" in str(e):
+            raise HTTPException(status_code=400, detail=f"Ya existe un libro con el ISBN {libro.ISBN}")
         raise HTTPException(status_code=500, detail=f"Error creando libro: {str(e)}")
-    return await obtener_libro(libro.ISBN)
+    finally:
+        cache_libros.invalidate(libro.ISBN)
+        vuelos_libros.clear()
+        versiones.incrementar("libro")
+    if not creado:
+        raise HTTPException(status_code=500, detail="No se pudo crear el libro")
+    _indexar_libro(creado)
+    return creado
 
 # 4. Actualiza un libro existente.
+# El UPDATE devuelve la fila final con OUTPUT; si no afectó filas, el libro no existe.
+# El texto del UPDATE sale del registro de sentencias: uno por combinación de columnas.
 async def actualizar_libro(isbn: str, libro: Libro) -> Libro:
     datos_dict = libro.model_dump(exclude={'ISBN'}, exclude_none=True)
     if not datos_dict:
         raise HTTPException(status_code=400, detail="No hay datos para actualizar.")
-    llaves = [k for k in datos_dict.keys()]
-    variables = " = ?, ".join(llaves) + " = ?"
-    updatescript = f"""
-        UPDATE [biblioteca].[libro]
-        SET {variables}
-        WHERE [ISBN] = ?;
-    """
-    params = [datos_dict[k] for k in llaves]
+    updatescript, params = sentencias.update(
+        "[biblioteca].[libro]", Libro, "ISBN", datos_dict,
+        salida=["ISBN", "Titulo", "Año_publicacion"]
+    )
     params.append(isbn) 
     try:
-        await obtener_libro(isbn) 
-        await execute_query_json(updatescript, params, needs_commit=True)
-    except HTTPException as e:
-        if e.status_code == 404:
-            raise HTTPException(status_code=404, detail=f"Libro con ISBN {isbn} no encontrado")
-        raise e
+        actualizado = await execute_query_one(updatescript, params, needs_commit=True, prepared=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando libro: {str(e)}")
-    return await obtener_libro(isbn)
+    finally:
+        cache_libros.invalidate(isbn)
+        vuelos_libros.clear()
+        versiones.incrementar("libro")
+        vuelos_libro_autor.clear()
+    if not actualizado:
+        raise HTTPException(status_code=404, detail=f"Libro con ISBN {isbn} no encontrado")
+    _indexar_libro(actualizado)
+    return actualizado
 
 # 5. Elimina un libro por su ISBN.
 async def eliminar_libro(isbn: str) -> str:
-    deletescript = "DELETE FROM [biblioteca].[libro] WHERE [ISBN] = ?;"
+    deletescript = """
+        DELETE FROM [biblioteca].[libro]
+        OUTPUT DELETED.[ISBN]
+        WHERE [ISBN] = ?;
+    """
     params = [isbn]
     try:
-        await obtener_libro(isbn) 
-        await execute_query_json(deletescript, params, needs_commit=True)
-        return "ELIMINADO CORRECTAMENTE"
-    except HTTPException as e:
-        if e.status_code == 404:
-             raise HTTPException(status_code=404, detail=f"Libro no encontrado")
-        raise e
+        eliminado = await execute_query_one(deletescript, params, needs_commit=True)
     except Exception as e:
         logger.error(f"Error de FK al eliminar libro: {e}")
         raise HTTPException(status_code=409, detail=f"No se puede eliminar: Conflicto de FK.")
+    finally:
+        cache_libros.invalidate(isbn)
+        vuelos_libros.clear()
+        versiones.incrementar("libro")
+        vuelos_libro_autor.clear()
+    if not eliminado:
+        raise HTTPException(status_code=404, detail=f"Libro no encontrado")
+    _desindexar_libro(isbn)
+    return "ELIMINADO CORRECTAMENTE"
+
+# 6. Crea varios libros en una sola solicitud.
+# Cada fila se valida por separado y las inválidas se informan sin detener la carga.
+# Las válidas se insertan por lotes, cada uno en su transacción: una consulta marca los
+# ISBN ya existentes (bloqueando el rango para que nadie los inserte entre medio) y el
+# resto viaja en un solo INSERT con fast_executemany.
+async def crear_libros_masivo(filas: List[dict]) -> dict:
+    sqlinsert = """
+        INSERT INTO [biblioteca].[libro] ([ISBN], [Titulo], [Año_publicacion])
+        VALUES (?, ?, ?);
+    """
+    validas, errores = validar_filas(filas, Libro)
+
+    # Descartamos filas sin ISBN y los ISBN repetidos dentro de la misma carga
+    candidatas = []
+    vistos = set()
+    for indice, libro in validas:
+        if not libro.ISBN:
+            errores.append({"fila": indice, "detalle": "ISBN: el ISBN es obligatorio"})
+        elif libro.ISBN in vistos:
+            errores.append({"fila": indice, "detalle": f"ISBN {libro.ISBN} repetido en la carga"})
+        else:
+            vistos.add(libro.ISBN)
+            candidatas.append((indice, libro))
+
+    creados = []
+    for lote in en_lotes(candidatas):
+        marcadores = ", ".join("?" for _ in lote)
+        sqlexistentes = f"""
+            SELECT [ISBN]
+            FROM [biblioteca].[libro] {RANGE_LOCK}
+            WHERE [ISBN] IN ({marcadores});
+        """
+        errores_lote = []
+        nuevos = []
+        try:
+            async with transaction() as tx:
+                existentes = await tx.execute(sqlexistentes, [libro.ISBN for _, libro in lote])
+                ya_registrados = {fila["ISBN"] for fila in existentes}
+                for indice, libro in lote:
+                    if libro.ISBN in ya_registrados:
+                        errores_lote.append({"fila": indice, "detalle": f"Ya existe un libro con el ISBN {libro.ISBN}"})
+                    else:
+                        nuevos.append((indice, libro))
+                await tx.executemany(
+                    sqlinsert,
+                    [[libro.ISBN, libro.Titulo, libro.Año_publicacion] for _, libro in nuevos]
+                )
+        except Exception as e:
+            logger.error(f"Error en la carga masiva de libros: {e}")
+            errores += [{"fila": indice, "detalle": f"Error de base de datos: {str(e)}"} for indice, _ in lote]
+            continue
+        finally:
+            for _, libro in lote:
+                cache_libros.invalidate(libro.ISBN)
+            vuelos_libros.clear()
+            versiones.incrementar("libro")
+        errores += errores_lote
+        creados += [libro for _, libro in nuevos]
+        for _, libro in nuevos:
+            _indexar_libro(libro.model_dump())
+
+    errores.sort(key=lambda error: error["fila"])
+    return {"creados": creados, "errores": errores}
 
 # Asigna un autor a un libro.
 async def asignar_autor_a_libro(isbn: str, id_autor: int):
@@ -114,7 +423,7 @@ async def asignar_autor_a_libro(isbn: str, id_autor: int):
     params = [isbn, id_autor]
     try:
         await obtener_libro(isbn)
-        await execute_query_json(sqlscript, params, needs_commit=True)
+        await execute_query(sqlscript, params, needs_commit=True)
     except HTTPException as e:
         if e.status_code == 404:
             raise HTTPException(status_code=404, detail="El Libro no fue encontrado")
@@ -125,33 +434,45 @@ async def asignar_autor_a_libro(isbn: str, id_autor: int):
         if "FOREIGN KEY" in str(e) and "autor" in str(e):
              raise HTTPException(status_code=404, detail=f"El Autor no fue encontrado")
         raise HTTPException(status_code=500, detail=f"Error asignando autor: {str(e)}")
+    finally:
+        vuelos_libro_autor.clear()
+        versiones.incrementar("libro_autor")
+    _relacionar(isbn, id_autor)
     return {"status": "OK", "mensaje": "Autor asignado"}
 
 # Obtiene los autores de un libro.
+# Partimos del libro con LEFT JOIN: sin filas, el libro no existe (404); con una fila
+# sin autor, existe pero no tiene autores. Así basta una sola consulta.
+@vuelos_libro_autor
 async def obtener_autores_de_libro(isbn: str) -> List[Autor]:
-    await obtener_libro(isbn)
     sqlscript = """
         SELECT A.[Id_autor], A.[Nombre_autor], A.[Año_nacimiento]
-        FROM [biblioteca].[autor] AS A
-        INNER JOIN [biblioteca].[libro_autor] AS LA
+        FROM [biblioteca].[libro] AS L
+        LEFT JOIN [biblioteca].[libro_autor] AS LA
+            ON LA.[ISBN] = L.[ISBN]
+        LEFT JOIN [biblioteca].[autor] AS A
             ON A.[Id_autor] = LA.[Id_autor]
-        WHERE LA.[ISBN] = ?;
+        WHERE L.[ISBN] = ?;
     """
     params = [isbn]
     try:
-        result = await execute_query_json(sqlscript, params=params)
-        if result:
-            return json.loads(result)
-        return []
+        filas = await execute_query(sqlscript, params=params)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    if not filas:
+        raise HTTPException(status_code=404, detail=f"Libro con ISBN {isbn} no encontrado")
+    return [fila for fila in filas if fila["Id_autor"] is not None]
 
 # Quita un autor de un libro.
 async def quitar_autor_de_libro(isbn: str, id_autor: int):
     sqlscript = "DELETE FROM [biblioteca].[libro_autor] WHERE [ISBN] = ? AND [Id_autor] = ?;"
     params = [isbn, id_autor]
     try:
-        await execute_query_json(sqlscript, params, needs_commit=True)
+        await execute_query(sqlscript, params, needs_commit=True)
+        _desrelacionar(isbn, id_autor)
         return "ELIMINADO CORRECTAMENTE"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error quitando autor: {str(e)}")
+    finally:
+        vuelos_libro_autor.clear()
+        versiones.incrementar("libro_autor")
@@ -1,40 +1,72 @@
-import json
+import asyncio
 import logging
-from typing import List
+import os
+from typing import Optional
 from fastapi import HTTPException
-from datetime import date 
 
-from Models.Multas import Multa
-from utils.database import execute_query_json
-# Importamos obtener_prestamo para validar la existencia
-from Controllers.Prestamos import obtener_prestamo
+from Models.Multas import Multa, VistaPreviaMultas
+from utils.database import (
+    RANGE_LOCK,
+    ROW_LOCK,
+    execute_query,
+    execute_query_one,
+    stream_query,
+    transaction
+)
+from utils.paginacion import LIMITE_POR_DEFECTO, armar_pagina, decodificar_cursor
+from utils.exportacion import exportar_lotes, iniciar_flujo
+from utils.etags import versiones
+from utils.tareas import TareaPeriodica
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Función interna para obtener una multa por su ID.
-async def obtener_multa(id_multa: int) -> Multa:
-    sqlfind = """
-        SELECT 
+# Columnas y JOINs de la versión "rica" de una multa (con nombre del estudiante y
+# título del libro), compartidos por todas las consultas de lectura de este módulo.
+COLUMNAS_MULTA = """
             M.[Id_multa], M.[Id_prestamo], M.[Fecha_multa], M.[Monto],
             E.Nombre_estudiante,
             L.Titulo
-        FROM [biblioteca].[multa] AS M
+"""
+FROM_MULTA = """        FROM [biblioteca].[multa] AS M
         LEFT JOIN [biblioteca].[prestamo] AS P ON M.Id_prestamo = P.Id_prestamo
         LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
         LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+"""
+
+# Multas automáticas por atraso: un préstamo sin devolver vence a los DIAS_PRESTAMO días
+# y su multa es de MONTO_DIARIO_ATRASO por cada día de atraso al momento de generarla.
+DIAS_PRESTAMO = int(os.getenv("MULTAS_DIAS_PRESTAMO", "14"))
+MONTO_DIARIO_ATRASO = float(os.getenv("MULTAS_MONTO_DIARIO", "0.50"))
+INTERVALO_MULTAS_ATRASO = float(os.getenv("MULTAS_INTERVALO_SEGUNDOS", "3600"))
+
+# Días de atraso y monto de un préstamo vencido (parámetros: días de préstamo y monto diario).
+DIAS_ATRASO = "(DATEDIFF(DAY, P.[Fecha_prestamo], GETDATE()) - ?)"
+MONTO_ATRASO = f"CAST({DIAS_ATRASO} * ? AS DECIMAL(10, 2))"
+
+# Préstamos activos vencidos que todavía no tienen multa (parámetro: días de préstamo).
+# Recibe el hint de bloqueo para la lectura de multas (vacío en las consultas de solo lectura).
+def _filtro_atrasados(bloqueo: str = "") -> str:
+    return f"""        WHERE P.[Fecha_devolucion] IS NULL
+          AND {DIAS_ATRASO} > 0
+          AND NOT EXISTS (
+              SELECT 1
+              FROM [biblioteca].[multa] AS M {bloqueo}
+              WHERE M.[Id_prestamo] = P.[Id_prestamo]
+          )
+"""
+
+# Función interna para obtener una multa por su ID.
+async def obtener_multa(id_multa: int) -> Multa:
+    sqlfind = f"""
+        SELECT {COLUMNAS_MULTA}{FROM_MULTA}
         WHERE M.[Id_multa] = ?;
     """
     params = [id_multa]
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        if result:
-            result_dict = json.loads(result)
-            if len(result_dict) > 0:
-                multa_data = result_dict[0]
-                if multa_data.get('Fecha_multa'):
-                    multa_data['Fecha_multa'] = date.fromisoformat(multa_data['Fecha_multa'])
-                return multa_data
+        multa = await execute_query_one(sqlfind, params=params)
+        if multa:
+            return multa
         
         raise HTTPException(status_code=404, detail=f"Multa con ID {id_multa} no encontrada")
     except HTTPException:
@@ -44,27 +76,15 @@ async def obtener_multa(id_multa: int) -> Multa:
 
 # 1. Obtiene la multa asociada a un préstamo.
 async def obtener_multa_de_prestamo(id_prestamo: int) -> Multa:
-    sqlfind = """
-        SELECT 
-            M.[Id_multa], M.[Id_prestamo], M.[Fecha_multa], M.[Monto],
-            E.Nombre_estudiante,
-            L.Titulo
-        FROM [biblioteca].[multa] AS M
-        LEFT JOIN [biblioteca].[prestamo] AS P ON M.Id_prestamo = P.Id_prestamo
-        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
-        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+    sqlfind = f"""
+        SELECT {COLUMNAS_MULTA}{FROM_MULTA}
         WHERE M.[Id_prestamo] = ?;
     """
     params = [id_prestamo]
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        if result:
-            result_dict = json.loads(result)
-            if len(result_dict) > 0:
-                multa_data = result_dict[0]
-                if multa_data.get('Fecha_multa'):
-                    multa_data['Fecha_multa'] = date.fromisoformat(multa_data['Fecha_multa'])
-                return multa_data
+        multa = await execute_query_one(sqlfind, params=params)
+        if multa:
+            return multa
         
         raise HTTPException(status_code=404, detail=f"El préstamo {id_prestamo} no tiene una multa asociada")
     except HTTPException as e:
@@ -72,65 +92,156 @@ async def obtener_multa_de_prestamo(id_prestamo: int) -> Multa:
             raise e
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
-# 2. Obtiene todas las multas de la base de datos.
-async def obtener_todas_multas() -> List[Multa]:
-    sqlscript = """
-        SELECT 
-            M.[Id_multa], M.[Id_prestamo], M.[Fecha_multa], M.[Monto],
-            E.Nombre_estudiante,
-            L.Titulo
-        FROM [biblioteca].[multa] AS M
-        LEFT JOIN [biblioteca].[prestamo] AS P ON M.Id_prestamo = P.Id_prestamo
-        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
-        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
-        ORDER BY M.Fecha_multa DESC;
+# 2. Obtiene una página de multas, de la más reciente a la más antigua (paginación por cursor).
+async def obtener_todas_multas(limit: int = LIMITE_POR_DEFECTO, cursor: Optional[str] = None) -> dict:
+    filtro = ""
+    params = [limit + 1]
+    if cursor:
+        fecha, id_multa = decodificar_cursor(cursor, 2)
+        if fecha is None:
+            filtro = "WHERE M.[Fecha_multa] IS NULL AND M.[Id_multa] < ?"
+            params += [id_multa]
+        else:
+            filtro = """WHERE M.[Fecha_multa] < ?
+               OR (M.[Fecha_multa] = ? AND M.[Id_multa] < ?)
+               OR M.[Fecha_multa] IS NULL"""
+            params += [fecha, fecha, id_multa]
+    sqlscript = f"""
+        SELECT TOP (?) {COLUMNAS_MULTA}{FROM_MULTA}
+        {filtro}
+        ORDER BY M.Fecha_multa DESC, M.Id_multa DESC;
     """
     try:
-        result = await execute_query_json(sqlscript)
-        if result:
-            return json.loads(result)
-        return []
+        # Historial potencialmente grande: filas compactas (ver utils/filas.py).
+        filas = await execute_query(sqlscript, params=params, compacto=True)
+        return armar_pagina(filas, limit, ["Fecha_multa", "Id_multa"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
 # 3. Crea una nueva multa manualmente en la base de datos.
+# Las verificaciones y el INSERT comparten una transacción: la fila del préstamo queda
+# bloqueada, así dos solicitudes simultáneas no pueden crear dos multas para él.
 async def crear_multa_manual(multa: Multa) -> Multa:
-    
-    # Regla 2.1: Un préstamo solo puede tener UNA multa
-    try:
-        multa_existente = await obtener_multa_de_prestamo(multa.Id_prestamo)
-        if multa_existente:
-            raise HTTPException(status_code=409, detail="Conflicto: Este préstamo ya tiene una multa asociada")
-    except HTTPException as e:
-        if e.status_code != 404: # 404 es bueno (no hay multa)
-            raise e
-    except Exception as e:
-         raise HTTPException(status_code=500, detail=f"Error verificando multa: {str(e)}")
-
-    # Verificamos que el préstamo al que se asocia la multa exista
-    try:
-        await obtener_prestamo(multa.Id_prestamo)
-    except HTTPException as e:
-        if e.status_code == 404:
-            raise HTTPException(status_code=404, detail=f"El Préstamo con ID {multa.Id_prestamo} no existe")
-        raise e
-
+    sqlprestamo = f"""
+        SELECT [Id_prestamo]
+        FROM [biblioteca].[prestamo] {ROW_LOCK}
+        WHERE [Id_prestamo] = ?;
+    """
+    sqlexistente = f"""
+        SELECT [Id_multa]
+        FROM [biblioteca].[multa] {RANGE_LOCK}
+        WHERE [Id_prestamo] = ?;
+    """
     sqlscript = """
         INSERT INTO [biblioteca].[multa] ([Id_prestamo], [Fecha_multa], [Monto])
         OUTPUT INSERTED.Id_multa AS NuevoId
         VALUES (?, GETDATE(), ?);
     """
+    sqlfind = f"""
+        SELECT {COLUMNAS_MULTA}{FROM_MULTA}
+        WHERE M.[Id_multa] = ?;
+    """
     params = [multa.Id_prestamo, multa.Monto]
 
     try:
-        result = await execute_query_json(sqlscript, params, needs_commit=True)
-        if result:
-            nuevo_id = json.loads(result)[0]['NuevoId']
-            return await obtener_multa(nuevo_id) # Devuelve la versión "rica"
-        
-        raise HTTPException(status_code=500, detail="No se pudo crear la multa")
+        async with transaction() as tx:
+            # Verificamos que el préstamo al que se asocia la multa exista
+            if not await tx.execute_one(sqlprestamo, [multa.Id_prestamo]):
+                raise HTTPException(status_code=404, detail=f"El Préstamo con ID {multa.Id_prestamo} no existe")
+
+            # Regla 2.1: Un préstamo solo puede tener UNA multa
+            if await tx.execute_one(sqlexistente, [multa.Id_prestamo]):
+                raise HTTPException(status_code=409, detail="Conflicto: Este préstamo ya tiene una multa asociada")
+
+            result = await tx.execute_one(sqlscript, params)
+            if not result:
+                raise HTTPException(status_code=500, detail="No se pudo crear la multa")
+            return await tx.execute_one(sqlfind, [result['NuevoId']]) # Devuelve la versión "rica"
+    except HTTPException:
+        raise
     except Exception as e:
-        # Este error es ahora redundante porque ya lo validamos arriba, pero es buena práctica
         if "FOREIGN KEY" in str(e) and "prestamo" in str(e):
             raise HTTPException(status_code=404, detail=f"El Préstamo con ID {multa.Id_prestamo} no existe")
-        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
\ No newline at end of file
+        # Si la tabla tiene una restricción única por préstamo, una multa creada al mismo
+        # tiempo (por ejemplo, por la tarea de multas por atraso) llega como violación de clave.
+        if "PRIMARY KEY" in str(e) or "UNIQUE KEY" in str(e):
+            raise HTTPException(status_code=409, detail="Conflicto: Este préstamo ya tiene una multa asociada")
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    finally:
+        versiones.incrementar("multa")
+
+# 3.1 Genera las multas de todos los préstamos vencidos en un único INSERT ... SELECT.
+# El NOT EXISTS con RANGE_LOCK respeta la regla de una multa por préstamo también frente
+# a una multa manual simultánea (crear_multa_manual lee la misma fila con RANGE_LOCK).
+async def generar_multas_por_atraso() -> dict:
+    sqlscript = f"""
+        INSERT INTO [biblioteca].[multa] ([Id_prestamo], [Fecha_multa], [Monto])
+        OUTPUT INSERTED.Id_multa, INSERTED.Monto
+        SELECT P.[Id_prestamo], GETDATE(), {MONTO_ATRASO}
+        FROM [biblioteca].[prestamo] AS P
+{_filtro_atrasados(RANGE_LOCK)};
+    """
+    params = [DIAS_PRESTAMO, MONTO_DIARIO_ATRASO, DIAS_PRESTAMO]
+    try:
+        creadas = await execute_query(sqlscript, params, needs_commit=True, compacto=True)
+    except Exception as e:
+        logger.error(f"Error generando multas por atraso: {e}")
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    if creadas:
+        versiones.incrementar("multa")
+        logger.info(f"Multas por atraso generadas: {len(creadas)}")
+    return {
+        "multas_creadas": len(creadas),
+        "monto_total": float(sum(monto for _, monto in creadas.tuplas)),
+    }
+
+# Tarea en segundo plano que ejecuta generar_multas_por_atraso cada MULTAS_INTERVALO_SEGUNDOS.
+tarea_multas_atraso = TareaPeriodica("multas_por_atraso", generar_multas_por_atraso)
+
+# 3.2 Vista previa (sin escribir) de las multas que generaría la tarea: el total y el
+# monto total de todas, y el detalle de las `limit` más antiguas.
+async def previsualizar_multas_por_atraso(limit: int = LIMITE_POR_DEFECTO) -> VistaPreviaMultas:
+    sqldetalle = f"""
+        SELECT TOP (?)
+            P.[Id_prestamo], P.[Id_matricula_estudiante], E.Nombre_estudiante,
+            P.[ISBN], L.Titulo, P.[Fecha_prestamo],
+            {DIAS_ATRASO} AS Dias_atraso,
+            {MONTO_ATRASO} AS Monto
+        FROM [biblioteca].[prestamo] AS P
+        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
+        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+{_filtro_atrasados()}
+        ORDER BY P.[Fecha_prestamo], P.[Id_prestamo];
+    """
+    sqltotales = f"""
+        SELECT COUNT(P.[Id_prestamo]) AS total, SUM({MONTO_ATRASO}) AS monto_total
+        FROM [biblioteca].[prestamo] AS P
+{_filtro_atrasados()};
+    """
+    try:
+        elementos, totales = await asyncio.gather(
+            execute_query(sqldetalle, [limit, DIAS_PRESTAMO, DIAS_PRESTAMO, MONTO_DIARIO_ATRASO, DIAS_PRESTAMO]),
+            execute_query_one(sqltotales, [DIAS_PRESTAMO, MONTO_DIARIO_ATRASO, DIAS_PRESTAMO])
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    return {
+        "dias_prestamo": DIAS_PRESTAMO,
+        "monto_diario": MONTO_DIARIO_ATRASO,
+        "total": totales["total"],
+        "monto_total": float(totales["monto_total"] or 0),
+        "elementos": elementos,
+    }
+
+# 4. Exporta el historial completo de multas (NDJSON o CSV) leyendo por lotes,
+# de modo que la memoria usada no depende del tamaño de la tabla.
+async def exportar_multas(formato: str, tamano_lote: int = 1000):
+    sqlscript = f"""
+        SELECT {COLUMNAS_MULTA}{FROM_MULTA}
+        ORDER BY M.[Id_multa];
+    """
+    lotes = stream_query(sqlscript, batch_size=tamano_lote, nombre="Multas.exportar_multas")
+    try:
+        return await iniciar_flujo(exportar_lotes(lotes, formato, list(Multa.model_fields)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
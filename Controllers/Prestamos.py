@@ -1,42 +1,58 @@
 # Archivo: Controllers/Prestamos.py
 
-import json
 import logging
-from typing import List
+import os
+from typing import List, Optional
 from fastapi import HTTPException
-from datetime import date 
+from datetime import date
 
 from Models.Prestamos import Prestamo
-from utils.database import execute_query_json
+from utils.database import (
+    ROW_LOCK,
+    execute_query,
+    execute_query_one,
+    stream_query,
+    transaction
+)
+from utils.paginacion import LIMITE_POR_DEFECTO, armar_pagina, decodificar_cursor
+from utils.exportacion import exportar_lotes, iniciar_flujo
+from utils.etags import versiones
+from utils.contadores import IndiceContadores
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Función interna para obtener un préstamo por su ID.
-async def obtener_prestamo(id_prestamo: int) -> Prestamo:
-    sqlfind = """
-        SELECT 
+# Columnas y JOINs de la versión "rica" de un préstamo (con nombre del estudiante y
+# título del libro), compartidos por todas las consultas de lectura de este módulo.
+COLUMNAS_PRESTAMO = """
             P.[Id_prestamo], P.[Id_matricula_estudiante], P.[ISBN], 
             P.[Fecha_prestamo], P.[Fecha_devolucion],
             E.Nombre_estudiante,
             L.Titulo
-        FROM [biblioteca].[prestamo] AS P
+"""
+FROM_PRESTAMO = """        FROM [biblioteca].[prestamo] AS P
         LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
         LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+"""
+
+# Regla de negocio: máximo de préstamos activos (sin devolver) por estudiante.
+LIMITE_PRESTAMOS_ACTIVOS = 5
+
+# Máximo de préstamos por operación en lote (2 parámetros por fila en el INSERT,
+# por debajo del límite de 2100 parámetros por sentencia de SQL Server).
+MAXIMO_LOTE_PRESTAMOS = 1000
+
+# Función interna para obtener un préstamo por su ID.
+async def obtener_prestamo(id_prestamo: int) -> Prestamo:
+    sqlfind = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
         WHERE P.[Id_prestamo] = ?;
     """
     params = [id_prestamo]
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        if result:
-            result_dict = json.loads(result)
-            if len(result_dict) > 0:
-                prestamo_data = result_dict[0]
-                if prestamo_data.get('Fecha_prestamo'):
-                    prestamo_data['Fecha_prestamo'] = date.fromisoformat(prestamo_data['Fecha_prestamo'])
-                if prestamo_data.get('Fecha_devolucion'):
-                    prestamo_data['Fecha_devolucion'] = date.fromisoformat(prestamo_data['Fecha_devolucion'])
-                return prestamo_data
+        prestamo = await execute_query_one(sqlfind, params=params, prepared=True)
+        if prestamo:
+            return prestamo
         
         raise HTTPException(status_code=404, detail=f"Préstamo con ID {id_prestamo} no encontrado")
     except HTTPException:
@@ -44,48 +60,81 @@ async def obtener_prestamo(id_prestamo: int) -> Prestamo:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
-# Función interna para contar los préstamos activos de un estudiante.
-async def contar_prestamos_activos(id_estudiante: int) -> int:
-    sqlcount = """
-        SELECT COUNT(Id_prestamo) as total_activos
+# Función interna para cargar los préstamos activos de todos los estudiantes (índice en memoria).
+async def _cargar_prestamos_activos() -> dict:
+    sqlactivos = """
+        SELECT [Id_matricula_estudiante], COUNT(Id_prestamo) AS total_activos
         FROM [biblioteca].[prestamo]
-        WHERE [Id_matricula_estudiante] = ? AND [Fecha_devolucion] IS NULL;
+        WHERE [Fecha_devolucion] IS NULL
+        GROUP BY [Id_matricula_estudiante];
     """
-    params = [id_estudiante]
-    try:
-        result = await execute_query_json(sqlcount, params=params)
-        if result:
-            result_dict = json.loads(result)
-            return result_dict[0]['total_activos']
-        return 0
-    except Exception as e:
-        logger.error(f"Error contando préstamos: {e}")
-        return 99 
+    filas = await execute_query(sqlactivos, compacto=True)
+    return dict(filas.tuplas)
+
+# Préstamos activos por estudiante, en memoria (ver utils/contadores.py). Lo ajustan las
+# funciones de este módulo que crean o devuelven préstamos, y se reconcilia contra la
+# tabla cada PRESTAMOS_RECONCILIACION_SEGUNDOS.
+prestamos_activos = IndiceContadores("prestamos_activos", _cargar_prestamos_activos)
+INTERVALO_RECONCILIACION_PRESTAMOS = float(os.getenv("PRESTAMOS_RECONCILIACION_SEGUNDOS", "300"))
 
 # 1. Crea un nuevo préstamo en la base de datos.
+# El límite se decide en el índice en memoria, que reserva el lugar: si ya está alcanzado
+# se rechaza sin ir a la base de datos, y si no, el INSERT no vuelve a contar. Solo
+# mientras el índice no conoce al estudiante (antes de la primera carga) el INSERT exige
+# el límite contra la tabla, con la fila del estudiante bloqueada para que dos préstamos
+# simultáneos no puedan superarlo juntos. El índice ve las escrituras de este proceso: con
+# varios workers, las de los demás se incorporan en la siguiente reconciliación.
 async def crear_prestamo(prestamo: Prestamo) -> Prestamo:
-    
-    activos = await contar_prestamos_activos(prestamo.Id_matricula_estudiante)
-    if activos >= 5:
-        raise HTTPException(status_code=400, detail="Límite de 5 préstamos activos alcanzado")
-    
+    sqlestudiante = f"""
+        SELECT [id_matricula_estudiante]
+        FROM [biblioteca].[estudiante] {ROW_LOCK}
+        WHERE [id_matricula_estudiante] = ?;
+    """
     sqlscript = """
         INSERT INTO [biblioteca].[prestamo] 
             ([Id_matricula_estudiante], [ISBN], [Fecha_prestamo], [Fecha_devolucion])
         OUTPUT INSERTED.Id_prestamo AS NuevoId
         VALUES (?, ?, GETDATE(), NULL);
     """
-    
-    params = [prestamo.Id_matricula_estudiante, prestamo.ISBN]
+    sqlcontrolado = """
+        INSERT INTO [biblioteca].[prestamo] 
+            ([Id_matricula_estudiante], [ISBN], [Fecha_prestamo], [Fecha_devolucion])
+        OUTPUT INSERTED.Id_prestamo AS NuevoId
+        SELECT ?, ?, GETDATE(), NULL
+        WHERE (
+            SELECT COUNT(Id_prestamo)
+            FROM [biblioteca].[prestamo]
+            WHERE [Id_matricula_estudiante] = ? AND [Fecha_devolucion] IS NULL
+        ) < ?;
+    """
+    sqlfind = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+        WHERE P.[Id_prestamo] = ?;
+    """
+    id_estudiante = prestamo.Id_matricula_estudiante
 
+    if prestamos_activos.reservar({id_estudiante: 1}, LIMITE_PRESTAMOS_ACTIVOS):
+        raise HTTPException(status_code=400, detail=f"Límite de {LIMITE_PRESTAMOS_ACTIVOS} préstamos activos alcanzado")
+    if prestamos_activos.desconocidas([id_estudiante]):
+        sqlscript = sqlcontrolado
+        params = [id_estudiante, prestamo.ISBN, id_estudiante, LIMITE_PRESTAMOS_ACTIVOS]
+    else:
+        params = [id_estudiante, prestamo.ISBN]
+    creado = False
     try:
-        result = await execute_query_json(sqlscript, params, needs_commit=True)
-        if result:
-            result_dict = json.loads(result)
-            nuevo_id = result_dict[0]['NuevoId'] 
-            return await obtener_prestamo(nuevo_id) # Devuelve la versión "rica"
-        
-        raise HTTPException(status_code=500, detail="No se pudo crear el préstamo")
+        async with transaction() as tx:
+            estudiante = await tx.execute_one(sqlestudiante, [id_estudiante])
+            if not estudiante:
+                raise HTTPException(status_code=404, detail=f"El Estudiante con ID {id_estudiante} no existe")
+
+            result = await tx.execute_one(sqlscript, params)
+            if not result:
+                raise HTTPException(status_code=400, detail=f"Límite de {LIMITE_PRESTAMOS_ACTIVOS} préstamos activos alcanzado")
+            nuevo = await tx.execute_one(sqlfind, [result['NuevoId']]) # Devuelve la versión "rica"
+        creado = True
+        return nuevo
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creando préstamo: {e}")
         if "FOREIGN KEY" in str(e) and "estudiante" in str(e):
@@ -94,91 +143,276 @@ async def crear_prestamo(prestamo: Prestamo) -> Prestamo:
             raise HTTPException(status_code=404, detail=f"El Libro con ISBN {prestamo.ISBN} no existe")
         
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    finally:
+        # Sin commit, se devuelve el lugar reservado en el índice.
+        prestamos_activos.terminar([id_estudiante], None if creado else {id_estudiante: -1})
+        versiones.incrementar("prestamo")
 
 # 2. Registra la devolución de un préstamo.
+# La lectura bloquea la fila del préstamo hasta el commit, así dos devoluciones
+# simultáneas del mismo préstamo no pueden pisarse. Después del commit se descuenta
+# el préstamo del índice de préstamos activos.
 async def registrar_devolucion(id_prestamo: int, fecha_devolucion: date) -> Prestamo:
-    
-    prestamo_actual = await obtener_prestamo(id_prestamo)
-    if prestamo_actual['Fecha_devolucion'] is not None:
-        raise HTTPException(status_code=400, detail="Este préstamo ya fue devuelto")
-
+    sqlactual = f"""
+        SELECT [Id_prestamo], [Id_matricula_estudiante], [Fecha_devolucion]
+        FROM [biblioteca].[prestamo] {ROW_LOCK}
+        WHERE [Id_prestamo] = ?;
+    """
     sql_prestamo = """
         UPDATE [biblioteca].[prestamo]
         SET [Fecha_devolucion] = ?
         WHERE [Id_prestamo] = ?;
     """
+    sqlfind = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+        WHERE P.[Id_prestamo] = ?;
+    """
     params_prestamo = [fecha_devolucion, id_prestamo]
 
+    estudiantes, ajuste = [], None
     try:
-        await execute_query_json(sql_prestamo, params_prestamo, needs_commit=True)
+        async with transaction() as tx:
+            prestamo_actual = await tx.execute_one(sqlactual, [id_prestamo])
+            if not prestamo_actual:
+                raise HTTPException(status_code=404, detail=f"Préstamo con ID {id_prestamo} no encontrado")
+            if prestamo_actual['Fecha_devolucion'] is not None:
+                raise HTTPException(status_code=400, detail="Este préstamo ya fue devuelto")
+
+            estudiantes = [prestamo_actual['Id_matricula_estudiante']]
+            prestamos_activos.anunciar(estudiantes)
+            await tx.execute(sql_prestamo, params_prestamo)
+            devuelto = await tx.execute_one(sqlfind, [id_prestamo]) # Devuelve la versión "rica"
+        ajuste = {estudiantes[0]: -1}
+        return devuelto
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando préstamo: {str(e)}")
+    finally:
+        prestamos_activos.terminar(estudiantes, ajuste)
+        versiones.incrementar("prestamo")
 
-    return await obtener_prestamo(id_prestamo) # Devuelve la versión "rica"
+# Función interna: marcadores "?, ?, ..." para una cláusula IN con n valores.
+def _marcadores(n: int) -> str:
+    return ", ".join("?" for _ in range(n))
 
-# 3. Obtiene todos los préstamos de la base de datos.
-async def obtener_todos_prestamos() -> List[Prestamo]:
-    sqlscript = """
-        SELECT 
-            P.[Id_prestamo], P.[Id_matricula_estudiante], P.[ISBN], 
-            P.[Fecha_prestamo], P.[Fecha_devolucion],
-            E.Nombre_estudiante,
-            L.Titulo
-        FROM [biblioteca].[prestamo] AS P
-        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
-        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
-        ORDER BY P.Fecha_prestamo DESC;
+# Función interna para validar el tamaño de una operación en lote.
+def _validar_tamano_lote(cantidad: int):
+    if cantidad == 0:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if cantidad > MAXIMO_LOTE_PRESTAMOS:
+        raise HTTPException(status_code=413, detail=f"El lote admite como máximo {MAXIMO_LOTE_PRESTAMOS} préstamos")
+
+# 2.1 Crea varios préstamos en una sola transacción (todos o ninguno).
+# La regla de los préstamos activos se aplica por estudiante sumando los préstamos
+# del lote. Como en crear_prestamo, la decide el índice en memoria (que reserva los
+# lugares); solo los estudiantes que el índice todavía no conoce se cuentan en la tabla,
+# dentro de la transacción. Todas las verificaciones e inserciones son sentencias por
+# conjunto: el número de consultas no depende del tamaño del lote.
+async def crear_prestamos_lote(prestamos: List[Prestamo]) -> List[Prestamo]:
+    _validar_tamano_lote(len(prestamos))
+
+    nuevos_por_estudiante = {}
+    for prestamo in prestamos:
+        nuevos_por_estudiante[prestamo.Id_matricula_estudiante] = nuevos_por_estudiante.get(prestamo.Id_matricula_estudiante, 0) + 1
+    ids_estudiantes = list(nuevos_por_estudiante)
+    isbns = list(dict.fromkeys(prestamo.ISBN for prestamo in prestamos))
+
+    sqlestudiantes = f"""
+        SELECT [id_matricula_estudiante]
+        FROM [biblioteca].[estudiante] {ROW_LOCK}
+        WHERE [id_matricula_estudiante] IN ({_marcadores(len(ids_estudiantes))});
+    """
+    sqllibros = f"""
+        SELECT [ISBN]
+        FROM [biblioteca].[libro]
+        WHERE [ISBN] IN ({_marcadores(len(isbns))});
+    """
+    sqlscript = f"""
+        INSERT INTO [biblioteca].[prestamo] 
+            ([Id_matricula_estudiante], [ISBN], [Fecha_prestamo], [Fecha_devolucion])
+        OUTPUT INSERTED.Id_prestamo AS NuevoId
+        VALUES {", ".join("(?, ?, GETDATE(), NULL)" for _ in prestamos)};
     """
+    params = [valor for prestamo in prestamos for valor in (prestamo.Id_matricula_estudiante, prestamo.ISBN)]
+
+    excedidos = prestamos_activos.reservar(nuevos_por_estudiante, LIMITE_PRESTAMOS_ACTIVOS)
+    if excedidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Límite de {LIMITE_PRESTAMOS_ACTIVOS} préstamos activos superado para los estudiantes {excedidos}"
+        )
+    desconocidos = prestamos_activos.desconocidas(ids_estudiantes)
+    creados = False
     try:
-        result = await execute_query_json(sqlscript)
-        if result:
-            return json.loads(result)
-        return []
+        async with transaction() as tx:
+            # Bloqueamos las filas de los estudiantes, igual que en crear_prestamo
+            encontrados = {fila['id_matricula_estudiante'] for fila in await tx.execute(sqlestudiantes, ids_estudiantes)}
+            faltantes = [i for i in ids_estudiantes if i not in encontrados]
+            if faltantes:
+                raise HTTPException(status_code=404, detail=f"Los Estudiantes con ID {faltantes} no existen")
+
+            existentes = {fila['ISBN'] for fila in await tx.execute(sqllibros, isbns)}
+            faltantes = [isbn for isbn in isbns if isbn not in existentes]
+            if faltantes:
+                raise HTTPException(status_code=404, detail=f"Los Libros con ISBN {faltantes} no existen")
+
+            if desconocidos:
+                sqlactivos = f"""
+                    SELECT [Id_matricula_estudiante], COUNT(Id_prestamo) AS total_activos
+                    FROM [biblioteca].[prestamo]
+                    WHERE [Id_matricula_estudiante] IN ({_marcadores(len(desconocidos))})
+                      AND [Fecha_devolucion] IS NULL
+                    GROUP BY [Id_matricula_estudiante];
+                """
+                filas = await tx.execute(sqlactivos, desconocidos)
+                activos = {fila['Id_matricula_estudiante']: fila['total_activos'] for fila in filas}
+                excedidos = [
+                    i for i in desconocidos
+                    if activos.get(i, 0) + nuevos_por_estudiante[i] > LIMITE_PRESTAMOS_ACTIVOS
+                ]
+                if excedidos:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Límite de {LIMITE_PRESTAMOS_ACTIVOS} préstamos activos superado para los estudiantes {excedidos}"
+                    )
+
+            ids_nuevos = [fila['NuevoId'] for fila in await tx.execute(sqlscript, params)]
+            if len(ids_nuevos) != len(prestamos):
+                raise HTTPException(status_code=500, detail="No se pudieron crear los préstamos")
+            sqlfind = f"""
+                SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+                WHERE P.[Id_prestamo] IN ({_marcadores(len(ids_nuevos))})
+                ORDER BY P.[Id_prestamo];
+            """
+            nuevos = await tx.execute(sqlfind, ids_nuevos) # Devuelve la versión "rica"
+        creados = True
+        return nuevos
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creando préstamos en lote: {e}")
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    finally:
+        # Sin commit, se devuelven los lugares reservados en el índice.
+        prestamos_activos.terminar(
+            ids_estudiantes, None if creados else {i: -n for i, n in nuevos_por_estudiante.items()}
+        )
+        versiones.incrementar("prestamo")
+
+# 2.2 Registra la devolución de varios préstamos en una sola transacción (todos o ninguno).
+# Una lectura bloqueante valida el lote completo y un único UPDATE lo aplica. Después
+# del commit se descuentan los préstamos del índice de préstamos activos.
+async def registrar_devoluciones_lote(ids_prestamo: List[int], fecha_devolucion: date) -> List[Prestamo]:
+    ids = list(dict.fromkeys(ids_prestamo))
+    _validar_tamano_lote(len(ids))
+
+    sqlactual = f"""
+        SELECT [Id_prestamo], [Id_matricula_estudiante], [Fecha_devolucion]
+        FROM [biblioteca].[prestamo] {ROW_LOCK}
+        WHERE [Id_prestamo] IN ({_marcadores(len(ids))});
+    """
+    sql_prestamo = f"""
+        UPDATE [biblioteca].[prestamo]
+        SET [Fecha_devolucion] = ?
+        WHERE [Id_prestamo] IN ({_marcadores(len(ids))});
+    """
+    sqlfind = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+        WHERE P.[Id_prestamo] IN ({_marcadores(len(ids))})
+        ORDER BY P.[Id_prestamo];
+    """
+
+    devoluciones_por_estudiante, ajuste = {}, None
+    try:
+        async with transaction() as tx:
+            actuales = {fila['Id_prestamo']: fila for fila in await tx.execute(sqlactual, ids)}
+            faltantes = [i for i in ids if i not in actuales]
+            if faltantes:
+                raise HTTPException(status_code=404, detail=f"Préstamos con ID {faltantes} no encontrados")
+            devueltos = [i for i in ids if actuales[i]['Fecha_devolucion'] is not None]
+            if devueltos:
+                raise HTTPException(status_code=400, detail=f"Los préstamos {devueltos} ya fueron devueltos")
+
+            for fila in actuales.values():
+                estudiante = fila['Id_matricula_estudiante']
+                devoluciones_por_estudiante[estudiante] = devoluciones_por_estudiante.get(estudiante, 0) - 1
+            prestamos_activos.anunciar(devoluciones_por_estudiante)
+            await tx.execute(sql_prestamo, [fecha_devolucion] + ids)
+            devueltos = await tx.execute(sqlfind, ids) # Devuelve la versión "rica"
+        ajuste = devoluciones_por_estudiante
+        return devueltos
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error actualizando préstamos: {str(e)}")
+    finally:
+        prestamos_activos.terminar(devoluciones_por_estudiante, ajuste)
+        versiones.incrementar("prestamo")
+
+# 3. Obtiene una página de préstamos, del más reciente al más antiguo (paginación por cursor).
+# El orden (Fecha_prestamo DESC, Id_prestamo DESC) es total, así que la clave de la
+# última fila identifica exactamente dónde continuar sin usar OFFSET.
+async def obtener_todos_prestamos(limit: int = LIMITE_POR_DEFECTO, cursor: Optional[str] = None) -> dict:
+    filtro = ""
+    params = [limit + 1]
+    if cursor:
+        fecha, id_prestamo = decodificar_cursor(cursor, 2)
+        if fecha is None:
+            filtro = "WHERE P.[Fecha_prestamo] IS NULL AND P.[Id_prestamo] < ?"
+            params += [id_prestamo]
+        else:
+            filtro = """WHERE P.[Fecha_prestamo] < ?
+               OR (P.[Fecha_prestamo] = ? AND P.[Id_prestamo] < ?)
+               OR P.[Fecha_prestamo] IS NULL"""
+            params += [fecha, fecha, id_prestamo]
+    sqlscript = f"""
+        SELECT TOP (?) {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+        {filtro}
+        ORDER BY P.Fecha_prestamo DESC, P.Id_prestamo DESC;
+    """
+    try:
+        # Historial potencialmente grande: filas compactas (ver utils/filas.py).
+        filas = await execute_query(sqlscript, params=params, compacto=True)
+        return armar_pagina(filas, limit, ["Fecha_prestamo", "Id_prestamo"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
 # 4. Obtiene todos los préstamos de un estudiante específico.
 async def obtener_prestamos_de_estudiante(id_estudiante: int) -> List[Prestamo]:
-    sqlscript = """
-        SELECT 
-            P.[Id_prestamo], P.[Id_matricula_estudiante], P.[ISBN], 
-            P.[Fecha_prestamo], P.[Fecha_devolucion],
-            E.Nombre_estudiante,
-            L.Titulo
-        FROM [biblioteca].[prestamo] AS P
-        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
-        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+    sqlscript = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
         WHERE P.[id_matricula_estudiante] = ?
         ORDER BY P.Fecha_prestamo DESC;
     """
     params = [id_estudiante]
     try:
-        result = await execute_query_json(sqlscript, params=params)
-        if result:
-            return json.loads(result)
-        return []
+        return await execute_query(sqlscript, params=params, compacto=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
 # 5. Obtiene todos los préstamos de un libro específico.
 async def obtener_prestamos_de_libro(isbn: str) -> List[Prestamo]:
-    sqlscript = """
-        SELECT 
-            P.[Id_prestamo], P.[Id_matricula_estudiante], P.[ISBN], 
-            P.[Fecha_prestamo], P.[Fecha_devolucion],
-            E.Nombre_estudiante,
-            L.Titulo
-        FROM [biblioteca].[prestamo] AS P
-        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
-        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+    sqlscript = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
         WHERE P.[ISBN] = ?
         ORDER BY P.Fecha_prestamo DESC;
     """
     params = [isbn]
     try:
-        result = await execute_query_json(sqlscript, params=params)
-        if result:
-            return json.loads(result)
-        return []
+        return await execute_query(sqlscript, params=params, compacto=True)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+
+# 6. Exporta el historial completo de préstamos (NDJSON o CSV) leyendo por lotes,
+# de modo que la memoria usada no depende del tamaño de la tabla.
+async def exportar_prestamos(formato: str, tamano_lote: int = 1000):
+    sqlscript = f"""
+        SELECT {COLUMNAS_PRESTAMO}{FROM_PRESTAMO}
+        ORDER BY P.[Id_prestamo];
+    """
+    lotes = stream_query(sqlscript, batch_size=tamano_lote, nombre="Prestamos.exportar_prestamos")
+    try:
+        return await iniciar_flujo(exportar_lotes(lotes, formato, list(Prestamo.model_fields)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
@@ -0,0 +1,92 @@
+import logging
+import os
+from datetime import date
+from typing import List, Optional
+from fastapi import HTTPException
+
+from Models.Reportes import LibroMasPrestado, MultasPorEstudiante, PrestamosPorMes
+from utils.database import execute_query
+from utils.cache import MISS, TTLCache
+from utils.coalescing import SingleFlight
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Los reportes se calculan en la base de datos (GROUP BY) y se guardan en caché durante
+# REPORTES_TTL_SEGUNDOS: pueden reflejar los datos de hasta ese tiempo atrás.
+cache_reportes = TTLCache("reportes", maxsize=1000, ttl=float(os.getenv("REPORTES_TTL_SEGUNDOS", "300")))
+
+# Tableros abiertos al mismo tiempo comparten un solo cálculo (ver utils/coalescing.py).
+vuelos_reportes = SingleFlight("reportes")
+
+# Función interna: filtro por rango de Fecha_prestamo [desde, hasta] (ambos opcionales).
+def _filtro_fechas(desde: Optional[date], hasta: Optional[date]):
+    condiciones, params = [], []
+    if desde is not None:
+        condiciones.append("P.[Fecha_prestamo] >= ?")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append("P.[Fecha_prestamo] <= ?")
+        params.append(hasta)
+    filtro = "WHERE " + " AND ".join(condiciones) if condiciones else ""
+    return filtro, params
+
+# Función interna: ejecuta un reporte, o lo toma de la caché si se calculó hace menos del TTL.
+async def _reporte(clave: tuple, sqlscript: str, params: list) -> list:
+    filas = cache_reportes.get(clave)
+    if filas is not MISS:
+        return filas
+    try:
+        filas = await execute_query(sqlscript, params=params, nombre=f"Reportes.{clave[0]}")
+    except Exception as e:
+        logger.error(f"Error calculando el reporte {clave[0]}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    cache_reportes.set(clave, filas)
+    return filas
+
+# 1. Libros con más préstamos (opcionalmente, en un rango de fechas de préstamo).
+@vuelos_reportes
+async def obtener_libros_mas_prestados(limit: int, desde: Optional[date] = None,
+                                       hasta: Optional[date] = None) -> List[LibroMasPrestado]:
+    filtro, params = _filtro_fechas(desde, hasta)
+    sqlscript = f"""
+        SELECT TOP (?) P.[ISBN], L.Titulo,
+            COUNT(P.[Id_prestamo]) AS Total_prestamos,
+            SUM(CASE WHEN P.[Fecha_devolucion] IS NULL THEN 1 ELSE 0 END) AS Prestamos_activos
+        FROM [biblioteca].[prestamo] AS P
+        LEFT JOIN [biblioteca].[libro] AS L ON P.ISBN = L.ISBN
+        {filtro}
+        GROUP BY P.[ISBN], L.Titulo
+        ORDER BY Total_prestamos DESC, P.[ISBN];
+    """
+    return await _reporte(("libros_mas_prestados", limit, desde, hasta), sqlscript, [limit] + params)
+
+# 2. Estudiantes con mayor monto total de multas.
+@vuelos_reportes
+async def obtener_multas_por_estudiante(limit: int) -> List[MultasPorEstudiante]:
+    sqlscript = """
+        SELECT TOP (?) P.[Id_matricula_estudiante], E.Nombre_estudiante,
+            COUNT(M.[Id_multa]) AS Cantidad_multas,
+            SUM(M.[Monto]) AS Monto_total
+        FROM [biblioteca].[multa] AS M
+        INNER JOIN [biblioteca].[prestamo] AS P ON M.Id_prestamo = P.Id_prestamo
+        LEFT JOIN [biblioteca].[estudiante] AS E ON P.id_matricula_estudiante = E.id_matricula_estudiante
+        GROUP BY P.[Id_matricula_estudiante], E.Nombre_estudiante
+        ORDER BY Monto_total DESC, P.[Id_matricula_estudiante];
+    """
+    return await _reporte(("multas_por_estudiante", limit), sqlscript, [limit])
+
+# 3. Préstamos por mes (opcionalmente, en un rango de fechas de préstamo), en orden cronológico.
+@vuelos_reportes
+async def obtener_prestamos_por_mes(desde: Optional[date] = None, hasta: Optional[date] = None) -> List[PrestamosPorMes]:
+    filtro, params = _filtro_fechas(desde, hasta)
+    sqlscript = f"""
+        SELECT YEAR(P.[Fecha_prestamo]) AS [Año], MONTH(P.[Fecha_prestamo]) AS Mes,
+            COUNT(P.[Id_prestamo]) AS Total_prestamos,
+            SUM(CASE WHEN P.[Fecha_devolucion] IS NULL THEN 1 ELSE 0 END) AS Prestamos_activos
+        FROM [biblioteca].[prestamo] AS P
+        {filtro}
+        GROUP BY YEAR(P.[Fecha_prestamo]), MONTH(P.[Fecha_prestamo])
+        ORDER BY [Año], Mes;
+    """
+    return await _reporte(("prestamos_por_mes", desde, hasta), sqlscript, params)
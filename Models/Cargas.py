@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, TypeVar
+
+T = TypeVar("T")
+
+# Error de validación o de base de datos de una fila de una carga masiva.
+class ErrorFila(BaseModel):
+    # Posición de la fila en la lista enviada (empezando en 0).
+    fila: int = Field(
+        description="Índice de la fila en el payload (empezando en 0)"
+    )
+
+    # Motivo por el que la fila no se insertó.
+    detalle: str = Field(
+        description="Motivo por el que la fila no se insertó"
+    )
+
+# Resultado de una carga masiva: filas creadas (con sus IDs) y filas rechazadas.
+class ResultadoCarga(BaseModel, Generic[T]):
+    creados: List[T] = Field(
+        description="Filas insertadas, con los IDs generados"
+    )
+
+    errores: List[ErrorFila] = Field(
+        default_factory=list,
+        description="Filas rechazadas y el motivo de cada una"
+    )
@@ -33,4 +33,11 @@ class Estudiante(BaseModel):
     Esta_Activo: Optional[bool] = Field(
         default=None,
         description="Indica si el estudiante está activo (Borrado Lógico)"
-    )
\ No newline at end of file
+    )
+
+
+# Estudiante creado por una carga masiva, con la posición de su fila en el payload.
+class EstudianteCargado(Estudiante):
+    fila: int = Field(
+        description="Índice de la fila en el payload (empezando en 0)"
+    )
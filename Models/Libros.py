@@ -3,6 +3,9 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 
+from Models.Autores import Autor
+from Models.Prestamos import Prestamo
+
 
 class Libro(BaseModel):
     # Mapeado a: [ISBN]
@@ -27,4 +30,35 @@ class Libro(BaseModel):
         ge=1400,
         le=2025
     )
-    
\ No newline at end of file
+    
+
+
+# Libro con las relaciones pedidas en `?expand=` (solo aparecen las solicitadas).
+class LibroExpandido(Libro):
+    # Con expand=autores: autores del libro.
+    autores: Optional[List[Autor]] = Field(
+        default=None,
+        description="Autores del libro (con expand=autores)"
+    )
+
+    # Con expand=prestamo_activo: préstamo sin devolver más reciente, o null si está disponible.
+    prestamo_activo: Optional[Prestamo] = Field(
+        default=None,
+        description="Préstamo activo del libro (con expand=prestamo_activo); null si está disponible"
+    )
+
+
+# Resultado de la búsqueda de libros por título o autor (GET /libros/buscar).
+class LibroEncontrado(Libro):
+    # Nombres de los autores del libro.
+    Autores: List[str] = Field(
+        default_factory=list,
+        description="Nombres de los autores del libro"
+    )
+
+    # Parecido con la búsqueda, entre 0 y 1 (mayor es mejor).
+    Puntaje: float = Field(
+        default=0.0,
+        description="Parecido del título o de algún autor con la búsqueda, entre 0 y 1",
+        examples=[0.92]
+    )
@@ -1,6 +1,6 @@
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class Multa(BaseModel):
@@ -38,3 +38,70 @@ class Multa(BaseModel):
         default=None,
         description="Título del libro (traído con JOIN)"
     )
+
+
+# Multa que generaría la tarea de multas por atraso para un préstamo vencido (vista previa).
+class MultaPropuesta(BaseModel):
+    # Mapeado a: [Id_prestamo]
+    Id_prestamo: int = Field(
+        description="ID del préstamo vencido"
+    )
+
+    # Mapeado a: [Id_matricula_estudiante]
+    Id_matricula_estudiante: int = Field(
+        description="ID del estudiante que tiene el libro"
+    )
+
+    # Mapeado a: [Nombre_estudiante]
+    Nombre_estudiante: Optional[str] = Field(
+        default=None,
+        description="Nombre del estudiante (traído con JOIN)"
+    )
+
+    # Mapeado a: [ISBN]
+    ISBN: str = Field(
+        description="ISBN del libro prestado"
+    )
+
+    # Mapeado a: [Titulo]
+    Titulo: Optional[str] = Field(
+        default=None,
+        description="Título del libro (traído con JOIN)"
+    )
+
+    # Mapeado a: [Fecha_prestamo]
+    Fecha_prestamo: date = Field(
+        description="Fecha en que se realizó el préstamo"
+    )
+
+    # Calculado: días desde la fecha de préstamo menos los días de préstamo.
+    Dias_atraso: int = Field(
+        description="Días transcurridos desde el vencimiento"
+    )
+
+    # Calculado: días de atraso por el monto diario.
+    Monto: float = Field(
+        description="Monto que tendría la multa"
+    )
+
+# Vista previa de la tarea de multas por atraso: totales y detalle de las primeras multas.
+class VistaPreviaMultas(BaseModel):
+    dias_prestamo: int = Field(
+        description="Días de préstamo antes del vencimiento"
+    )
+
+    monto_diario: float = Field(
+        description="Monto por día de atraso"
+    )
+
+    total: int = Field(
+        description="Cantidad de multas que se generarían"
+    )
+
+    monto_total: float = Field(
+        description="Suma de los montos de todas esas multas"
+    )
+
+    elementos: List[MultaPropuesta] = Field(
+        description="Detalle de las multas de los préstamos vencidos más antiguos"
+    )
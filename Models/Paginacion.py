@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Modelo genérico para las respuestas de los listados paginados por cursor.
+class Pagina(BaseModel, Generic[T]):
+    # Filas de la página actual.
+    elementos: List[T] = Field(
+        description="Elementos de la página actual"
+    )
+
+    # Cursor opaco para pedir la página siguiente.
+    siguiente_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor para la página siguiente (null si es la última página)"
+    )
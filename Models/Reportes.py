@@ -0,0 +1,62 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# Fila del reporte de libros más prestados.
+class LibroMasPrestado(BaseModel):
+    # Mapeado a: [ISBN]
+    ISBN: str = Field(
+        description="ISBN del libro"
+    )
+
+    # Mapeado a: [Titulo] (traído con JOIN)
+    Titulo: Optional[str] = Field(
+        default=None,
+        description="Título del libro"
+    )
+
+    Total_prestamos: int = Field(
+        description="Cantidad de préstamos del libro en el período"
+    )
+
+    Prestamos_activos: int = Field(
+        description="Cuántos de esos préstamos siguen sin devolver"
+    )
+
+# Fila del reporte de multas por estudiante.
+class MultasPorEstudiante(BaseModel):
+    # Mapeado a: [Id_matricula_estudiante]
+    Id_matricula_estudiante: int = Field(
+        description="ID del estudiante"
+    )
+
+    # Mapeado a: [Nombre_estudiante] (traído con JOIN)
+    Nombre_estudiante: Optional[str] = Field(
+        default=None,
+        description="Nombre del estudiante"
+    )
+
+    Cantidad_multas: int = Field(
+        description="Cantidad de multas del estudiante"
+    )
+
+    Monto_total: float = Field(
+        description="Suma de los montos de sus multas"
+    )
+
+# Fila del reporte de préstamos por mes.
+class PrestamosPorMes(BaseModel):
+    Año: int = Field(
+        description="Año de la fecha de préstamo"
+    )
+
+    Mes: int = Field(
+        description="Mes de la fecha de préstamo (1 a 12)"
+    )
+
+    Total_prestamos: int = Field(
+        description="Cantidad de préstamos realizados en el mes"
+    )
+
+    Prestamos_activos: int = Field(
+        description="Cuántos de esos préstamos siguen sin devolver"
+    )
@@ -1,8 +1,12 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, status
 
 from Models.Autores import Autor
+from Models.Paginacion import Pagina
 from Models.Libros import Libro 
+from utils.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from utils.etags import RutaConEtag
+from utils.respuestas import respuesta_rapida
 
 from Controllers.Autores import (
     crear_autor,
@@ -12,12 +16,15 @@ from Controllers.Autores import (
     obtener_libros_de_autor 
 )
 
-router = APIRouter(prefix="/autores")
+router = APIRouter(prefix="/autores", route_class=RutaConEtag)
 
 # --- GET (Listar todos) ---
-@router.get("/", tags=["Autores"], response_model=List[Autor], status_code=status.HTTP_200_OK)
-async def listar_autores():
-    return await obtener_todos_autores()
+@router.get("/", tags=["Autores"], response_model=Pagina[Autor], status_code=status.HTTP_200_OK)
+async def listar_autores(
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None
+):
+    return respuesta_rapida(await obtener_todos_autores(limit, cursor), Autor)
 
 # --- GET /{id} (Buscar uno) ---
 @router.get("/{id}", tags=["Autores"], response_model=Autor, status_code=status.HTTP_200_OK)
@@ -39,4 +46,4 @@ async def actualizar_datos_autor(id: int, autor: Autor):
 @router.get("/{id}/libros", tags=["Autores (Relaciones)"], response_model=List[Libro])
 async def ver_libros_del_autor(id: int):
     """Obtiene la lista de libros ("respuesta rica") de un autor específico."""
-    return await obtener_libros_de_autor(id)
\ No newline at end of file
+    return respuesta_rapida(await obtener_libros_de_autor(id), Libro)
\ No newline at end of file
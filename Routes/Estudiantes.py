@@ -1,26 +1,65 @@
 # Archivo: Routes/Estudiantes.py
 
-from typing import List
-from fastapi import APIRouter, HTTPException, status 
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Body, HTTPException, Query, status
 
-from Models.Estudiantes import Estudiante
+from Models.Estudiantes import Estudiante, EstudianteCargado
+from Models.Paginacion import Pagina
+from Models.Cargas import ResultadoCarga
 from Models.Prestamos import Prestamo 
+from utils.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from utils.etags import RutaConEtag
+from utils.respuestas import respuesta_rapida
 from Controllers.Estudiantes import (
     crear_estudiante,
     obtener_estudiante,
     obtener_todos_estudiantes,
-    actualizar_estudiante
+    actualizar_estudiante,
+    crear_estudiantes_masivo,
+    buscar_estudiantes
 )
 from Controllers.Prestamos import obtener_prestamos_de_estudiante
 
-router = APIRouter(prefix="/estudiantes")
+router = APIRouter(prefix="/estudiantes", route_class=RutaConEtag)
 
 # --- Endpoints CRUD Básicos ---
 
-@router.get("/", tags=["Estudiantes"], response_model=List[Estudiante], status_code=status.HTTP_200_OK)
-async def listar_estudiantes():
-    """Obtiene una lista de todos los estudiantes ACTIVOS."""
-    return await obtener_todos_estudiantes()
+@router.get("/", tags=["Estudiantes"], response_model=Pagina[Estudiante], status_code=status.HTTP_200_OK)
+async def listar_estudiantes(
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None
+):
+    """
+    Obtiene una página de los estudiantes ACTIVOS. Use `siguiente_cursor` para pedir la siguiente.
+    Admite If-None-Match: si la página no cambió responde 304 sin cuerpo.
+    """
+    return respuesta_rapida(await obtener_todos_estudiantes(limit, cursor), Estudiante)
+
+# Se declara antes de las rutas con /{id}.
+@router.get("/buscar", tags=["Estudiantes"], response_model=List[Estudiante], status_code=status.HTTP_200_OK)
+async def buscar_estudiantes_por_nombre_o_correo(
+    nombre: Optional[str] = Query(None, min_length=1, max_length=255, description="Comienzo del nombre o de alguno de sus apellidos"),
+    correo: Optional[str] = Query(None, min_length=1, max_length=255, description="Correo completo"),
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    Busca estudiantes (activos o inactivos) por el comienzo del nombre o de un
+    apellido, sin distinguir mayúsculas ni tildes, o por correo exacto. Con los
+    dos, deben coincidir ambos. Se resuelve en memoria, sin consultar la base de datos.
+    """
+    if nombre is None and correo is None:
+        raise HTTPException(status_code=400, detail="Indique `nombre`, `correo` o ambos.")
+    return respuesta_rapida(await buscar_estudiantes(nombre, correo, limit), Estudiante)
+
+# Se declara antes de las rutas con /{id}.
+@router.post("/bulk", tags=["Estudiantes"], response_model=ResultadoCarga[EstudianteCargado], status_code=status.HTTP_201_CREATED)
+async def registrar_estudiantes_masivo(filas: List[Dict[str, Any]] = Body(...)):
+    """
+    Registra muchos estudiantes en una sola solicitud. Cada estudiante creado se
+    devuelve con el índice de su fila (`fila`) y la matrícula asignada; las filas
+    inválidas se devuelven en `errores` (con su índice) y no detienen al resto.
+    """
+    return await crear_estudiantes_masivo(filas)
 
 @router.get("/{id}", tags=["Estudiantes"], response_model=Estudiante, status_code=status.HTTP_200_OK)
 async def buscar_estudiante(id: int):
@@ -46,4 +85,4 @@ async def actualizar_datos_estudiante(id: int, estudiante: Estudiante):
 @router.get("/{id}/prestamos", tags=["Estudiantes (Relaciones)"], response_model=List[Prestamo])
 async def ver_prestamos_del_estudiante(id: int):
     """Obtiene la lista de todos los préstamos de un estudiante específico."""
-    return await obtener_prestamos_de_estudiante(id)
\ No newline at end of file
+    return respuesta_rapida(await obtener_prestamos_de_estudiante(id), Prestamo)
\ No newline at end of file
@@ -1,16 +1,27 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status
 
-from Models.Libros import Libro
+from Models.Libros import Libro, LibroEncontrado, LibroExpandido
+from Models.Paginacion import Pagina
+from Models.Cargas import ResultadoCarga
 from Models.Autores import Autor 
 from Models.Prestamos import Prestamo 
+from utils.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from utils.etags import RutaConEtag
+from utils.respuestas import respuesta_rapida
+from utils.instantaneas import respuesta_instantanea
 
 from Controllers.Libros import (
     crear_libro,
     obtener_libro,
+    obtener_libro_expandido,
     obtener_todos_libros,
+    parsear_expansiones,
     actualizar_libro,
     eliminar_libro,
+    crear_libros_masivo,
+    catalogo,
+    buscar_libros,
     
     asignar_autor_a_libro,
     obtener_autores_de_libro,
@@ -18,21 +29,73 @@ from Controllers.Libros import (
 )
 from Controllers.Prestamos import obtener_prestamos_de_libro
 
-router = APIRouter(prefix="/libros")
+router = APIRouter(prefix="/libros", route_class=RutaConEtag)
 
 # CRUD BÁSICO DE LIBROS
 
+DESCRIPCION_EXPAND = "Relaciones a incluir, separadas por comas: autores, prestamo_activo"
+
 # --- GET (Listar todos) ---
-@router.get("/", tags=["Libros"], response_model=List[Libro], status_code=status.HTTP_200_OK)
-async def listar_libros():
-    """Obtiene una lista de todos los libros en el catálogo."""
-    return await obtener_todos_libros()
+@router.get("/", tags=["Libros"], response_model=Pagina[LibroExpandido],
+            response_model_exclude_unset=True, status_code=status.HTTP_200_OK)
+async def listar_libros(
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = Query(None, description=DESCRIPCION_EXPAND)
+):
+    """
+    Obtiene una página del catálogo ordenada por ISBN. Use `siguiente_cursor` para pedir la siguiente.
+    Con `expand=autores,prestamo_activo` cada libro incluye esas relaciones, sin pedidos adicionales.
+    Admite If-None-Match: si la página no cambió responde 304 sin cuerpo.
+    """
+    expansiones = parsear_expansiones(expand)
+    return await obtener_todos_libros(limit, cursor, expansiones)
+
+# --- GET /catalogo (Catálogo completo desde memoria) ---
+# Se declara antes de las rutas con /{isbn}.
+@router.get("/catalogo", tags=["Libros"], response_model=List[LibroExpandido], status_code=status.HTTP_200_OK)
+async def ver_catalogo(request: Request):
+    """
+    Devuelve todos los libros con sus autores. Se sirve desde una copia en memoria
+    ya serializada y comprimida con gzip, que se rearma tras cada cambio de libros o
+    autores; admite If-None-Match.
+    """
+    return await respuesta_instantanea(request, catalogo)
+
+# --- GET /buscar (Búsqueda por título o autor) ---
+# Se declara antes de las rutas con /{isbn}.
+@router.get("/buscar", tags=["Libros"], response_model=List[LibroEncontrado], status_code=status.HTTP_200_OK)
+async def buscar_libros_por_texto(
+    q: str = Query(..., min_length=1, max_length=200, description="Parte del título o del nombre de un autor"),
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    Busca libros por título o por nombre de autor, sin distinguir mayúsculas ni
+    tildes y tolerando palabras incompletas o con errores menores. Los resultados
+    van del más parecido al menos parecido. Se resuelve en memoria, sin consultar
+    la base de datos.
+    """
+    return respuesta_rapida(await buscar_libros(q, limit), LibroEncontrado)
+
+# --- POST /bulk (Carga masiva) ---
+# Se declara antes de las rutas con /{isbn}.
+@router.post("/bulk", tags=["Libros"], response_model=ResultadoCarga[Libro], status_code=status.HTTP_201_CREATED)
+async def registrar_libros_masivo(filas: List[Dict[str, Any]] = Body(...)):
+    """
+    Registra muchos libros en una sola solicitud. Las filas inválidas o con ISBN
+    ya registrado se devuelven en `errores` (con su índice) y no detienen al resto.
+    """
+    return await crear_libros_masivo(filas)
 
 # --- GET /{isbn} (Buscar uno) ---
-@router.get("/{isbn}", tags=["Libros"], response_model=Libro, status_code=status.HTTP_200_OK)
-async def buscar_libro(isbn: str):
-    """Busca un libro específico por su ISBN."""
-    return await obtener_libro(isbn)
+@router.get("/{isbn}", tags=["Libros"], response_model=LibroExpandido,
+            response_model_exclude_unset=True, status_code=status.HTTP_200_OK)
+async def buscar_libro(isbn: str, expand: Optional[str] = Query(None, description=DESCRIPCION_EXPAND)):
+    """Busca un libro específico por su ISBN (con `expand` incluye autores y/o préstamo activo)."""
+    expansiones = parsear_expansiones(expand)
+    if not expansiones:
+        return await obtener_libro(isbn)
+    return await obtener_libro_expandido(isbn, expansiones)
 
 # --- POST (Crear) ---
 @router.post("/", tags=["Libros"], response_model=Libro, status_code=status.HTTP_201_CREATED)
@@ -65,7 +128,7 @@ async def asignar_autor(isbn: str, id_autor: int):
 @router.get("/{isbn}/autores", tags=["Libros (Relaciones)"], response_model=List[Autor])
 async def ver_autores_del_libro(isbn: str):
     """Obtiene la lista de autores de un libro específico."""
-    return await obtener_autores_de_libro(isbn)
+    return respuesta_rapida(await obtener_autores_de_libro(isbn), Autor)
 
 # --- DELETE /libros/{isbn}/autores/{id_autor} (Quitar) ---
 @router.delete("/{isbn}/autores/{id_autor}", 
@@ -80,4 +143,4 @@ async def quitar_autor(isbn: str, id_autor: int):
 @router.get("/{isbn}/prestamos", tags=["Libros (Relaciones)"], response_model=List[Prestamo])
 async def ver_prestamos_del_libro(isbn: str):
     """Obtiene el historial de préstamos de un libro específico."""
-    return await obtener_prestamos_de_libro(isbn)
\ No newline at end of file
+    return respuesta_rapida(await obtener_prestamos_de_libro(isbn), Prestamo)
\ No newline at end of file
@@ -1,21 +1,56 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
-from Models.Multas import Multa
+from Models.Multas import Multa, VistaPreviaMultas
+from Models.Paginacion import Pagina
+from utils.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from utils.exportacion import FORMATOS_EXPORTACION
+from utils.tiempos import RutaCronometrada
+from utils.respuestas import respuesta_rapida
 from Controllers.Multas import (
     obtener_multa,
     obtener_todas_multas,
     crear_multa_manual,
-    obtener_multa_de_prestamo
+    obtener_multa_de_prestamo,
+    exportar_multas,
+    previsualizar_multas_por_atraso
 )
 
-router = APIRouter(prefix="/multas")
+router = APIRouter(prefix="/multas", route_class=RutaCronometrada)
 
 # --- GET (Listar todas) ---
-@router.get("/", tags=["Multas"], response_model=List[Multa], status_code=status.HTTP_200_OK)
-async def listar_multas():
-    """Obtiene una lista de todas las multas registradas."""
-    return await obtener_todas_multas()
+@router.get("/", tags=["Multas"], response_model=Pagina[Multa], status_code=status.HTTP_200_OK)
+async def listar_multas(
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None
+):
+    """Obtiene una página de las multas registradas, de la más reciente a la más antigua."""
+    return respuesta_rapida(await obtener_todas_multas(limit, cursor), Multa)
+
+# --- GET /exportar (Historial completo en streaming) ---
+@router.get("/exportar", tags=["Multas"], status_code=status.HTTP_200_OK)
+async def exportar_historial_multas(formato: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Exporta todo el historial de multas como NDJSON o CSV.
+    Las filas se envían por lotes a medida que se leen de la base de datos.
+    """
+    contenido = await exportar_multas(formato)
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="multas.{formato}"'}
+    )
+
+# --- GET /atrasos (Vista previa de las multas automáticas) ---
+# Se declara antes de /{id}.
+@router.get("/atrasos", tags=["Multas"], response_model=VistaPreviaMultas, status_code=status.HTTP_200_OK)
+async def ver_multas_por_atraso(limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO)):
+    """
+    Muestra, sin registrar nada, las multas que generaría la tarea automática de multas
+    por atraso: cuántas son, su monto total y el detalle de las de préstamos más antiguos.
+    """
+    return await previsualizar_multas_por_atraso(limit)
 
 # --- GET /{id} (Buscar una) ---
 @router.get("/{id}", tags=["Multas"], response_model=Multa, status_code=status.HTTP_200_OK)
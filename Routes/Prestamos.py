@@ -1,26 +1,57 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field 
 from datetime import date     
 
 from Models.Prestamos import Prestamo
+from Models.Paginacion import Pagina
+from utils.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from utils.exportacion import FORMATOS_EXPORTACION
+from utils.tiempos import RutaCronometrada
+from utils.respuestas import respuesta_rapida
 from Controllers.Prestamos import (
     crear_prestamo,
     obtener_prestamo,
     obtener_todos_prestamos,
-    registrar_devolucion
+    registrar_devolucion,
+    crear_prestamos_lote,
+    registrar_devoluciones_lote,
+    exportar_prestamos
 )
 
-router = APIRouter(prefix="/prestamos")
+router = APIRouter(prefix="/prestamos", route_class=RutaCronometrada)
 
 class PayloadDevolucion(BaseModel):
     Fecha_devolucion: date = Field(..., example="2025-11-20")
 
+class PayloadDevolucionLote(BaseModel):
+    Ids_prestamo: List[int] = Field(..., min_length=1, example=[1, 2, 3])
+    Fecha_devolucion: date = Field(..., example="2025-11-20")
+
 
 # --- GET (Listar todos) ---
-@router.get("/", tags=["Préstamos"], response_model=List[Prestamo], status_code=status.HTTP_200_OK)
-async def listar_prestamos():
-    return await obtener_todos_prestamos()
+@router.get("/", tags=["Préstamos"], response_model=Pagina[Prestamo], status_code=status.HTTP_200_OK)
+async def listar_prestamos(
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None
+):
+    """Obtiene una página de préstamos, del más reciente al más antiguo."""
+    return respuesta_rapida(await obtener_todos_prestamos(limit, cursor), Prestamo)
+
+# --- GET /exportar (Historial completo en streaming) ---
+@router.get("/exportar", tags=["Préstamos"], status_code=status.HTTP_200_OK)
+async def exportar_historial_prestamos(formato: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Exporta todo el historial de préstamos como NDJSON o CSV.
+    Las filas se envían por lotes a medida que se leen de la base de datos.
+    """
+    contenido = await exportar_prestamos(formato)
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="prestamos.{formato}"'}
+    )
 
 # --- GET /{id} (Buscar uno) ---
 @router.get("/{id}", tags=["Préstamos"], response_model=Prestamo, status_code=status.HTTP_200_OK)
@@ -43,4 +74,23 @@ async def devolver_prestamo(id: int, payload: PayloadDevolucion):
     Marca un préstamo como devuelto usando la fecha manual provista.
     Payload esperado: { "Fecha_devolucion": "YYYY-MM-DD" }
     """
-    return await registrar_devolucion(id, payload.Fecha_devolucion)
\ No newline at end of file
+    return await registrar_devolucion(id, payload.Fecha_devolucion)
+
+# --- POST /lote (Varios préstamos en una operación) ---
+@router.post("/lote", tags=["Préstamos"], response_model=List[Prestamo], status_code=status.HTTP_201_CREATED)
+async def registrar_prestamos_lote(prestamos: List[Prestamo]):
+    """
+    Crea varios préstamos a la vez (todos o ninguno), respetando el límite de
+    préstamos activos de cada estudiante con los del lote incluidos.
+    Payload esperado: [ { "Id_matricula_estudiante": int, "ISBN": str }, ... ]
+    """
+    return await crear_prestamos_lote(prestamos)
+
+# --- PUT /devolucion (Devolución de varios préstamos) ---
+@router.put("/devolucion", tags=["Préstamos"], response_model=List[Prestamo], status_code=status.HTTP_200_OK)
+async def devolver_prestamos_lote(payload: PayloadDevolucionLote):
+    """
+    Marca varios préstamos como devueltos a la vez (todos o ninguno).
+    Payload esperado: { "Ids_prestamo": [int, ...], "Fecha_devolucion": "YYYY-MM-DD" }
+    """
+    return await registrar_devoluciones_lote(payload.Ids_prestamo, payload.Fecha_devolucion)
@@ -0,0 +1,46 @@
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Query, status
+
+from Models.Reportes import LibroMasPrestado, MultasPorEstudiante, PrestamosPorMes
+from utils.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from utils.tiempos import RutaCronometrada
+from utils.respuestas import respuesta_rapida
+from Controllers.Reportes import (
+    obtener_libros_mas_prestados,
+    obtener_multas_por_estudiante,
+    obtener_prestamos_por_mes
+)
+
+router = APIRouter(prefix="/reportes", route_class=RutaCronometrada)
+
+# --- GET /libros-mas-prestados ---
+@router.get("/libros-mas-prestados", tags=["Reportes"], response_model=List[LibroMasPrestado], status_code=status.HTTP_200_OK)
+async def reporte_libros_mas_prestados(
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+):
+    """
+    Libros con más préstamos, de mayor a menor, con cuántos siguen sin devolver.
+    `desde` y `hasta` limitan por fecha de préstamo. El resultado se guarda en caché unos minutos.
+    """
+    return respuesta_rapida(await obtener_libros_mas_prestados(limit, desde, hasta), LibroMasPrestado)
+
+# --- GET /multas-por-estudiante ---
+@router.get("/multas-por-estudiante", tags=["Reportes"], response_model=List[MultasPorEstudiante], status_code=status.HTTP_200_OK)
+async def reporte_multas_por_estudiante(limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO)):
+    """
+    Estudiantes con mayor monto total de multas, con la cantidad de multas de cada uno.
+    El resultado se guarda en caché unos minutos.
+    """
+    return respuesta_rapida(await obtener_multas_por_estudiante(limit), MultasPorEstudiante)
+
+# --- GET /prestamos-por-mes ---
+@router.get("/prestamos-por-mes", tags=["Reportes"], response_model=List[PrestamosPorMes], status_code=status.HTTP_200_OK)
+async def reporte_prestamos_por_mes(desde: Optional[date] = None, hasta: Optional[date] = None):
+    """
+    Cantidad de préstamos por mes, en orden cronológico, con cuántos siguen sin devolver.
+    `desde` y `hasta` limitan por fecha de préstamo. El resultado se guarda en caché unos minutos.
+    """
+    return respuesta_rapida(await obtener_prestamos_por_mes(desde, hasta), PrestamosPorMes)
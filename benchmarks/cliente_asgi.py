@@ -0,0 +1,67 @@
+"""Cliente ASGI mínimo en proceso: llama a la aplicación sin red ni servidor HTTP."""
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+
+async def solicitar(app, metodo, url, cuerpo=None, encabezados=None):
+    """
+    Envía una solicitud a la aplicación ASGI y devuelve un diccionario con
+    `status`, `headers` (nombres en minúscula) y `body` (bytes).
+    """
+    partes = urlsplit(url)
+    datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else b""
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(datos)).encode())]
+    headers += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (encabezados or {}).items()]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": metodo, "scheme": "http", "path": partes.path, "raw_path": partes.path.encode(),
+        "query_string": partes.query.encode(), "headers": headers, "root_path": "",
+        "client": ("127.0.0.1", 50000), "server": ("benchmark", 80),
+    }
+    enviado = False
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {"type": "http.request", "body": datos, "more_body": False}
+        # Sin más cuerpo: el cliente queda conectado hasta que la respuesta termine.
+        await asyncio.Event().wait()
+
+    respuesta = {"status": None, "headers": {}, "body": bytearray()}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            respuesta["status"] = message["status"]
+            respuesta["headers"] = {k.decode("latin-1"): v.decode("latin-1") for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            respuesta["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    respuesta["body"] = bytes(respuesta["body"])
+    return respuesta
+
+
+class CicloDeVida:
+    """Ejecuta los eventos lifespan (startup/shutdown) de la aplicación como `async with`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __aenter__(self):
+        self._entrada = asyncio.Queue()
+        self._salida = asyncio.Queue()
+        self._tarea = asyncio.create_task(
+            self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, self._entrada.get, self._salida.put)
+        )
+        await self._entrada.put({"type": "lifespan.startup"})
+        mensaje = await self._salida.get()
+        if mensaje["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"La aplicación no pudo iniciar: {mensaje.get('message')}")
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._entrada.put({"type": "lifespan.shutdown"})
+        await self._salida.get()
+        await self._tarea
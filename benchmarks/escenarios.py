@@ -0,0 +1,189 @@
+"""
+Datos sembrados y escenarios del benchmark: una o más solicitudes por cada
+ruta de Routes/*.
+
+Cada escenario recibe el número de repetición `i` y devuelve (url, cuerpo).
+Los datos sembrados están pensados para que cada repetición use filas
+distintas cuando la ruta modifica datos (un libro distinto para borrar, un
+préstamo activo distinto para devolver, etc.); alcanzan para REPETICIONES_MAXIMAS.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Tamaño de los datos sembrados.
+AUTORES = 200
+LIBROS = 2000
+ESTUDIANTES = 3000
+PRESTAMOS_DEVUELTOS = 6000
+ESTUDIANTES_CON_PRESTAMOS_ACTIVOS = 1000  # dos préstamos activos cada uno
+MULTAS = 1500
+REPETICIONES_MAXIMAS = 300
+
+# Autor sin libros, al que los escenarios asignan y quitan libros.
+AUTOR_LIBRE = AUTORES + 1
+PRIMER_PRESTAMO_ACTIVO = PRESTAMOS_DEVUELTOS + 1
+
+
+def isbn(n):
+    return f"978-{n:06d}"
+
+
+def letras(n):
+    """Número en letras de la A a la Z (los nombres de estudiante no admiten dígitos)."""
+    texto = ""
+    while True:
+        n, resto = divmod(n, 26)
+        texto = chr(ord("A") + resto) + texto
+        if not n:
+            return texto
+
+
+def sembrar(conn):
+    """Inserta los datos de prueba con una conexión SQLite directa."""
+    inicio = datetime.date(2024, 1, 1)
+    conn.executemany(
+        "INSERT INTO autor (Nombre_autor, Año_nacimiento) VALUES (?, ?)",
+        [(f"Autor {letras(a)}", 1900 + a % 100) for a in range(1, AUTORES + 2)],
+    )
+    conn.executemany(
+        "INSERT INTO libro (ISBN, Titulo, Año_publicacion) VALUES (?, ?, ?)",
+        [(isbn(n), f"Libro número {n}", 1900 + n % 120) for n in range(1, LIBROS + 1)]
+        + [(f"DEL-{n}", f"Libro para borrar {n}", 2000) for n in range(REPETICIONES_MAXIMAS)],
+    )
+    pares = set()
+    for n in range(1, LIBROS + 1):
+        pares.add((isbn(n), n % AUTORES + 1))
+        pares.add((isbn(n), n * 7 % AUTORES + 1))
+    conn.executemany("INSERT INTO libro_autor (ISBN, Id_autor) VALUES (?, ?)", sorted(pares))
+    conn.executemany(
+        "INSERT INTO estudiante (Nombre_estudiante, Correo_estudiante, Edad, Esta_Activo) VALUES (?, ?, ?, 1)",
+        [(f"Estudiante {letras(e)}", f"estudiante{e}@example.com", 18 + e % 10) for e in range(1, ESTUDIANTES + 1)],
+    )
+    prestamos = [
+        (k % ESTUDIANTES + 1, isbn(k % LIBROS + 1),
+         (inicio + datetime.timedelta(days=k % 600)).isoformat(),
+         (inicio + datetime.timedelta(days=k % 600 + 14)).isoformat())
+        for k in range(PRESTAMOS_DEVUELTOS)
+    ]
+    prestamos += [
+        (e, isbn((e * 2 + j) % LIBROS + 1), (inicio + datetime.timedelta(days=650)).isoformat(), None)
+        for e in range(1, ESTUDIANTES_CON_PRESTAMOS_ACTIVOS + 1) for j in range(2)
+    ]
+    conn.executemany(
+        "INSERT INTO prestamo (Id_matricula_estudiante, ISBN, Fecha_prestamo, Fecha_devolucion) VALUES (?, ?, ?, ?)",
+        prestamos,
+    )
+    conn.executemany(
+        "INSERT INTO multa (Id_prestamo, Fecha_multa, Monto) VALUES (?, ?, ?)",
+        [(p, (inicio + datetime.timedelta(days=p % 600 + 20)).isoformat(), 1.5 + p % 10) for p in range(1, MULTAS + 1)],
+    )
+    conn.commit()
+
+
+@dataclass
+class Escenario:
+    # Nombre en los reportes y en la baseline (método y URL de ejemplo).
+    nombre: str
+    metodo: str
+    # Plantilla de la ruta que cubre, tal como está declarada (por ejemplo "/libros/{isbn}").
+    ruta: str
+    generar: Callable[[int], tuple]
+    # Repeticiones para rutas pesadas (por ejemplo, exportaciones completas).
+    repeticiones: Optional[int] = None
+    # Código de estado esperado.
+    estado: int = 200
+    # Encabezados adicionales de cada solicitud (por ejemplo, Accept-Encoding).
+    encabezados: Optional[dict] = None
+
+
+def _get(url):
+    return lambda i: (url(i), None)
+
+
+ESCENARIOS = [
+    # --- Estudiantes ---
+    Escenario("GET /estudiantes/", "GET", "/estudiantes/", _get(lambda i: "/estudiantes/?limit=100")),
+    Escenario("GET /estudiantes/buscar", "GET", "/estudiantes/buscar",
+              _get(lambda i: f"/estudiantes/buscar?nombre={letras(i % ESTUDIANTES + 1)[:2]}&limit=20"
+                             if i % 2 else f"/estudiantes/buscar?correo=estudiante{i % ESTUDIANTES + 1}@example.com")),
+    Escenario("GET /estudiantes/{id}", "GET", "/estudiantes/{id}", _get(lambda i: f"/estudiantes/{i % ESTUDIANTES + 1}")),
+    Escenario("GET /estudiantes/{id}/prestamos", "GET", "/estudiantes/{id}/prestamos",
+              _get(lambda i: f"/estudiantes/{i % ESTUDIANTES + 1}/prestamos")),
+    Escenario("POST /estudiantes/", "POST", "/estudiantes/",
+              lambda i: ("/estudiantes/", {"Nombre_estudiante": "Nuevo Estudiante", "Correo_estudiante": f"nuevo{i}@example.com", "Edad": 20}),
+              estado=201),
+    Escenario("PUT /estudiantes/{id}", "PUT", "/estudiantes/{id}",
+              lambda i: (f"/estudiantes/{ESTUDIANTES - i}", {"Edad": 18 + i % 10})),
+    Escenario("POST /estudiantes/bulk", "POST", "/estudiantes/bulk",
+              lambda i: ("/estudiantes/bulk", [{"Nombre_estudiante": "Carga Masiva", "Edad": 19} for _ in range(50)]),
+              repeticiones=50, estado=201),
+
+    # --- Autores ---
+    Escenario("GET /autores/", "GET", "/autores/", _get(lambda i: "/autores/?limit=100")),
+    Escenario("GET /autores/{id}", "GET", "/autores/{id}", _get(lambda i: f"/autores/{i % AUTORES + 1}")),
+    Escenario("GET /autores/{id}/libros", "GET", "/autores/{id}/libros", _get(lambda i: f"/autores/{i % AUTORES + 1}/libros")),
+    Escenario("POST /autores/", "POST", "/autores/",
+              lambda i: ("/autores/", {"Nombre_autor": f"Autor Nuevo {letras(i)}", "Año_nacimiento": 1950}), estado=201),
+    Escenario("PUT /autores/{id}", "PUT", "/autores/{id}",
+              lambda i: (f"/autores/{i % AUTORES + 1}", {"Nombre_autor": f"Autor {letras(i % AUTORES + 1)}", "Año_nacimiento": 1900 + i % 100})),
+
+    # --- Libros ---
+    Escenario("GET /libros/", "GET", "/libros/", _get(lambda i: "/libros/?limit=100")),
+    Escenario("GET /libros/?expand=autores,prestamo_activo", "GET", "/libros/",
+              _get(lambda i: "/libros/?limit=100&expand=autores,prestamo_activo")),
+    Escenario("GET /libros/catalogo", "GET", "/libros/catalogo", _get(lambda i: "/libros/catalogo"),
+              encabezados={"Accept-Encoding": "gzip"}),
+    Escenario("GET /libros/buscar", "GET", "/libros/buscar",
+              _get(lambda i: f"/libros/buscar?q=libro%20numero%20{i % LIBROS + 1}&limit=20")),
+    Escenario("GET /libros/{isbn}", "GET", "/libros/{isbn}", _get(lambda i: f"/libros/{isbn(i % LIBROS + 1)}")),
+    Escenario("GET /libros/{isbn}/autores", "GET", "/libros/{isbn}/autores", _get(lambda i: f"/libros/{isbn(i % LIBROS + 1)}/autores")),
+    Escenario("GET /libros/{isbn}/prestamos", "GET", "/libros/{isbn}/prestamos", _get(lambda i: f"/libros/{isbn(i % LIBROS + 1)}/prestamos")),
+    Escenario("POST /libros/", "POST", "/libros/",
+              lambda i: ("/libros/", {"ISBN": f"NUEVO-{i}", "Titulo": "Libro nuevo", "Año_publicacion": 2020}), estado=201),
+    Escenario("PUT /libros/{isbn}", "PUT", "/libros/{isbn}",
+              lambda i: (f"/libros/{isbn(i % LIBROS + 1)}", {"Titulo": f"Título actualizado {i}"})),
+    Escenario("DELETE /libros/{isbn}", "DELETE", "/libros/{isbn}", _get(lambda i: f"/libros/DEL-{i}"), estado=204),
+    Escenario("POST /libros/{isbn}/autores/{id_autor}", "POST", "/libros/{isbn}/autores/{id_autor}",
+              _get(lambda i: f"/libros/{isbn(i + 1)}/autores/{AUTOR_LIBRE}"), estado=201),
+    Escenario("DELETE /libros/{isbn}/autores/{id_autor}", "DELETE", "/libros/{isbn}/autores/{id_autor}",
+              _get(lambda i: f"/libros/{isbn(i + 1)}/autores/{AUTOR_LIBRE}")),
+    Escenario("POST /libros/bulk", "POST", "/libros/bulk",
+              lambda i: ("/libros/bulk", [{"ISBN": f"MASIVO-{i}-{j}", "Titulo": "Carga masiva"} for j in range(50)]),
+              repeticiones=50, estado=201),
+
+    # --- Préstamos ---
+    Escenario("GET /prestamos/", "GET", "/prestamos/", _get(lambda i: "/prestamos/?limit=100")),
+    Escenario("GET /prestamos/{id}", "GET", "/prestamos/{id}", _get(lambda i: f"/prestamos/{i % PRESTAMOS_DEVUELTOS + 1}")),
+    Escenario("GET /prestamos/exportar", "GET", "/prestamos/exportar", _get(lambda i: "/prestamos/exportar?formato=ndjson"),
+              repeticiones=10),
+    Escenario("POST /prestamos/", "POST", "/prestamos/",
+              lambda i: ("/prestamos/", {"Id_matricula_estudiante": ESTUDIANTES_CON_PRESTAMOS_ACTIVOS + 1 + i,
+                                         "ISBN": isbn(i % LIBROS + 1)}), estado=201),
+    Escenario("PUT /prestamos/{id}/devolucion", "PUT", "/prestamos/{id}/devolucion",
+              lambda i: (f"/prestamos/{PRIMER_PRESTAMO_ACTIVO + i}/devolucion", {"Fecha_devolucion": "2025-11-20"})),
+    Escenario("POST /prestamos/lote", "POST", "/prestamos/lote",
+              lambda i: ("/prestamos/lote", [{"Id_matricula_estudiante": ESTUDIANTES - i, "ISBN": isbn(j + 1)} for j in range(3)]),
+              estado=201),
+    Escenario("PUT /prestamos/devolucion", "PUT", "/prestamos/devolucion",
+              lambda i: ("/prestamos/devolucion", {"Ids_prestamo": [PRIMER_PRESTAMO_ACTIVO + 1000 + 3 * i + j for j in range(3)],
+                                                   "Fecha_devolucion": "2025-11-20"})),
+
+    # --- Multas ---
+    Escenario("GET /multas/", "GET", "/multas/", _get(lambda i: "/multas/?limit=100")),
+    Escenario("GET /multas/atrasos", "GET", "/multas/atrasos", _get(lambda i: "/multas/atrasos?limit=100")),
+    Escenario("GET /multas/{id}", "GET", "/multas/{id}", _get(lambda i: f"/multas/{i % MULTAS + 1}")),
+    Escenario("GET /multas/prestamo/{id_prestamo}", "GET", "/multas/prestamo/{id_prestamo}",
+              _get(lambda i: f"/multas/prestamo/{i % MULTAS + 1}")),
+    Escenario("GET /multas/exportar", "GET", "/multas/exportar", _get(lambda i: "/multas/exportar?formato=csv"), repeticiones=10),
+    Escenario("POST /multas/", "POST", "/multas/",
+              lambda i: ("/multas/", {"Id_prestamo": MULTAS + 1 + i, "Monto": 2.5}), estado=201),
+
+    # --- Reportes ---
+    Escenario("GET /reportes/libros-mas-prestados", "GET", "/reportes/libros-mas-prestados",
+              _get(lambda i: "/reportes/libros-mas-prestados?limit=20")),
+    Escenario("GET /reportes/multas-por-estudiante", "GET", "/reportes/multas-por-estudiante",
+              _get(lambda i: "/reportes/multas-por-estudiante?limit=20")),
+    Escenario("GET /reportes/prestamos-por-mes", "GET", "/reportes/prestamos-por-mes",
+              _get(lambda i: "/reportes/prestamos-por-mes?desde=2024-01-01")),
+]
@@ -0,0 +1,321 @@
+"""
+Sustituto de pyodbc respaldado por SQLite, para correr la API sin SQL Server.
+
+Implementa la parte de la interfaz de pyodbc que usa el proyecto (connect,
+Connection, Cursor y la jerarquía de errores) y traduce el T-SQL de los
+controladores al dialecto de SQLite: hints de bloqueo, TOP (?), OUTPUT
+INSERTED/DELETED, GETDATE(), DATEDIFF(DAY, ...), YEAR/MONTH, tablas temporales #tabla y lotes de varias
+sentencias. Cada ida y vuelta al servidor (execute, executemany, commit,
+rollback) puede llevar una latencia inyectada para simular la red.
+
+Se instala antes de importar la aplicación:
+
+    sys.modules["pyodbc"] = pyodbc_falso
+    pyodbc_falso.configurar("/tmp/bench.sqlite", latencia=0.002)
+"""
+import datetime
+import functools
+import re
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+ESQUEMA = """
+CREATE TABLE biblioteca.estudiante (
+    id_matricula_estudiante INTEGER PRIMARY KEY AUTOINCREMENT,
+    Nombre_estudiante TEXT, Correo_estudiante TEXT, Edad INTEGER,
+    Esta_Activo BOOLEAN NOT NULL DEFAULT 1
+);
+CREATE TABLE biblioteca.autor (
+    Id_autor INTEGER PRIMARY KEY AUTOINCREMENT, Nombre_autor TEXT, Año_nacimiento INTEGER
+);
+CREATE TABLE biblioteca.libro (
+    ISBN TEXT PRIMARY KEY, Titulo TEXT, Año_publicacion INTEGER
+);
+CREATE TABLE biblioteca.libro_autor (
+    ISBN TEXT NOT NULL REFERENCES libro(ISBN),
+    Id_autor INTEGER NOT NULL REFERENCES autor(Id_autor),
+    PRIMARY KEY (ISBN, Id_autor)
+);
+CREATE TABLE biblioteca.prestamo (
+    Id_prestamo INTEGER PRIMARY KEY AUTOINCREMENT,
+    Id_matricula_estudiante INTEGER NOT NULL REFERENCES estudiante(id_matricula_estudiante),
+    ISBN TEXT NOT NULL REFERENCES libro(ISBN),
+    Fecha_prestamo DATE, Fecha_devolucion DATE
+);
+CREATE INDEX biblioteca.ix_prestamo_estudiante ON prestamo (Id_matricula_estudiante, Fecha_devolucion);
+CREATE INDEX biblioteca.ix_prestamo_libro ON prestamo (ISBN, Fecha_devolucion);
+CREATE INDEX biblioteca.ix_prestamo_fecha ON prestamo (Fecha_prestamo, Id_prestamo);
+CREATE TABLE biblioteca.multa (
+    Id_multa INTEGER PRIMARY KEY AUTOINCREMENT,
+    Id_prestamo INTEGER NOT NULL UNIQUE REFERENCES prestamo(Id_prestamo),
+    Fecha_multa DATE, Monto DECIMAL(10, 2)
+);
+CREATE INDEX biblioteca.ix_multa_fecha ON multa (Fecha_multa, Id_multa);
+"""
+
+# Conversión de tipos: SQLite guarda texto/números; pyodbc entrega date, bool y Decimal.
+sqlite3.register_converter("DATE", lambda b: datetime.date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("BOOLEAN", lambda b: bool(int(b)))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(bool, int)
+
+
+# --- Errores (misma jerarquía que pyodbc) ---
+
+class Error(Exception):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+# --- Configuración y contadores ---
+
+_config = {"ruta": None, "latencia": 0.0}
+_lock = threading.Lock()
+# SQLite admite un solo escritor: en lugar de reintentar con esperas crecientes
+# (busy timeout), las transacciones de escritura se encolan en este candado, como
+# lo harían en SQL Server al esperar un bloqueo. Así la latencia medida no depende
+# de la política de reintentos de SQLite.
+_escritor = threading.Lock()
+contadores = {"conexiones": 0, "consultas": 0, "commits": 0}
+
+
+def configurar(ruta, latencia=0.0):
+    """Crea la base de datos con el esquema `biblioteca` y fija la latencia por ida y vuelta (segundos)."""
+    _config["ruta"] = ruta
+    _config["latencia"] = latencia
+    conn = _abrir()
+    conn.executescript(ESQUEMA)
+    conn.commit()
+    conn.close()
+
+
+def fijar_latencia(latencia):
+    _config["latencia"] = latencia
+
+
+def conexion_directa():
+    """Conexión SQLite sin traducción ni latencia, para sembrar datos."""
+    return _abrir()
+
+
+def _abrir():
+    conn = sqlite3.connect(
+        _config["ruta"], timeout=30, check_same_thread=False,
+        detect_types=sqlite3.PARSE_DECLTYPES, isolation_level="IMMEDIATE"
+    )
+    conn.execute("ATTACH DATABASE ? AS biblioteca", (_config["ruta"] + ".biblioteca",))
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA biblioteca.journal_mode = WAL")
+    return conn
+
+
+def _contar(clave):
+    with _lock:
+        contadores[clave] += 1
+
+
+def _ida_y_vuelta():
+    if _config["latencia"]:
+        time.sleep(_config["latencia"])
+
+
+# --- Traducción de T-SQL ---
+
+_HINTS = re.compile(r"WITH\s*\(\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|NOLOCK|READPAST)(?:\s*,\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|NOLOCK|READPAST))*\s*\)", re.I)
+_TOP = re.compile(r"SELECT\s+TOP\s*\(?\s*(\?|\d+)\s*\)?", re.I)
+_ARGUMENTO = r"((?:[^(),]|\([^()]*\))+?)"
+_DATEDIFF = re.compile(rf"DATEDIFF\(\s*DAY\s*,\s*{_ARGUMENTO}\s*,\s*{_ARGUMENTO}\s*\)", re.I)
+_FORMATO_FECHA = {"YEAR": "%Y", "MONTH": "%m"}
+_PARTE_FECHA = re.compile(r"\b(YEAR|MONTH)\(\s*" + _ARGUMENTO + r"\s*\)", re.I)
+_OUTPUT = re.compile(r"OUTPUT\s+(.*?)\s+(VALUES|WHERE|SELECT|FROM|DEFAULT)\b", re.I | re.S)
+
+
+@functools.lru_cache(maxsize=1024)
+def traducir(sql):
+    """
+    Traduce una sentencia (o lote) de T-SQL a SQLite.
+
+    Returns:
+        tuple: (sentencias, indice_top), donde `sentencias` es la lista de
+        sentencias SQLite e `indice_top` la posición del parámetro de TOP (?)
+        que hay que pasar al final (LIMIT), o None.
+    """
+    s = _HINTS.sub("", sql)
+    s = re.sub(r"GETDATE\(\)", "date('now')", s, flags=re.I)
+    s = _DATEDIFF.sub(r"CAST(julianday(\2) - julianday(\1) AS INTEGER)", s)
+    s = _PARTE_FECHA.sub(lambda m: f"CAST(strftime('{_FORMATO_FECHA[m.group(1).upper()]}', {m.group(2)}) AS INTEGER)", s)
+    s = re.sub(r"CREATE\s+TABLE\s+#", "CREATE TEMP TABLE ", s, flags=re.I)
+    s = s.replace("#", "")
+    sentencias = [parte.strip() for parte in s.split(";") if parte.strip()]
+    indice_top = None
+    traducidas = []
+    for sentencia in sentencias:
+        limite = None
+        m = _TOP.search(sentencia)
+        if m:
+            limite = m.group(1)
+            if limite == "?":
+                indice_top = sentencia[:m.start()].count("?")
+            sentencia = sentencia[:m.start()] + "SELECT " + sentencia[m.end():]
+        retorno = None
+        m = _OUTPUT.search(sentencia)
+        if m:
+            retorno = re.sub(r"(INSERTED|DELETED)\.", "", m.group(1), flags=re.I)
+            sentencia = sentencia[:m.start()] + sentencia[m.start(2):]
+        if limite:
+            sentencia += f" LIMIT {limite}"
+        if retorno:
+            sentencia += f" RETURNING {retorno}"
+        traducidas.append(sentencia)
+    return traducidas, indice_top
+
+
+def _error(e):
+    mensaje = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if "UNIQUE" in mensaje:
+            return IntegrityError("23000", f"Violation of PRIMARY KEY constraint ({mensaje})")
+        if "FOREIGN KEY" in mensaje:
+            return IntegrityError("23000", f"The statement conflicted with the FOREIGN KEY constraint ({mensaje})")
+        return IntegrityError("23000", mensaje)
+    if isinstance(e, sqlite3.OperationalError):
+        return OperationalError("HY000", mensaje)
+    return ProgrammingError("42000", mensaje)
+
+
+# --- Conexión y cursor ---
+
+class Cursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self._cursor = conn._db.cursor()
+        self.description = None
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        params = list(params)
+        sentencias, indice_top = traducir(sql)
+        if indice_top is not None:
+            params.append(params.pop(indice_top))
+        _contar("consultas")
+        _ida_y_vuelta()
+        self.connection._iniciar_escritura(sentencias)
+        try:
+            if len(sentencias) > 1:
+                for sentencia in sentencias:
+                    self._cursor.execute(sentencia)
+            else:
+                self._cursor.execute(sentencias[0], params)
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sentencias, _ = traducir(sql)
+        _contar("consultas")
+        # Con fast_executemany todo el lote viaja en una sola ida y vuelta.
+        for _ in range(1 if self.fast_executemany else len(seq_of_params)):
+            _ida_y_vuelta()
+        self.connection._iniciar_escritura(sentencias)
+        try:
+            self._cursor.executemany(sentencias[0], [list(p) for p in seq_of_params])
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        self.description = None
+        self.rowcount = self._cursor.rowcount
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def nextset(self):
+        return False
+
+    def close(self):
+        self._cursor.close()
+
+
+_LECTURA = re.compile(r"\s*(SELECT|WITH)\b", re.I)
+
+
+class Connection:
+    def __init__(self):
+        self._db = _abrir()
+        self._escribiendo = False
+        self.closed = False
+
+    def cursor(self):
+        return Cursor(self)
+
+    def _iniciar_escritura(self, sentencias):
+        if not self._escribiendo and not all(_LECTURA.match(s) for s in sentencias):
+            _escritor.acquire()
+            self._escribiendo = True
+
+    def _terminar_escritura(self):
+        if self._escribiendo:
+            self._escribiendo = False
+            _escritor.release()
+
+    def commit(self):
+        _contar("commits")
+        _ida_y_vuelta()
+        try:
+            self._db.commit()
+        finally:
+            self._terminar_escritura()
+
+    def rollback(self):
+        _ida_y_vuelta()
+        try:
+            self._db.rollback()
+        finally:
+            self._terminar_escritura()
+
+    def close(self):
+        self.closed = True
+        try:
+            self._db.close()
+        finally:
+            self._terminar_escritura()
+
+
+def connect(connection_string, timeout=0, **kwargs):
+    if _config["ruta"] is None:
+        raise InterfaceError("IM002", "pyodbc_falso no está configurado: llame a configurar() primero")
+    _contar("conexiones")
+    return Connection()
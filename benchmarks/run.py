@@ -0,0 +1,208 @@
+"""
+Benchmark de los endpoints de la API contra una base de datos local de reemplazo.
+
+Levanta la aplicación en proceso con pyodbc sustituido por benchmarks/pyodbc_falso.py
+(SQLite con latencia inyectada por ida y vuelta), siembra datos de prueba y ejecuta
+cada escenario de benchmarks/escenarios.py con concurrencia fija. Por escenario
+reporta solicitudes por segundo, latencias p50/p99 y consultas por solicitud, y
+compara contra benchmarks/baseline.json.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.run                      # compara contra la baseline
+    python -m benchmarks.run --guardar-baseline   # reescribe la baseline
+    python -m benchmarks.run --solo libros        # solo escenarios que contengan "libros"
+    python -m benchmarks.run --exigir-tiempos     # los tiempos también hacen fallar
+
+Sale con código 1 si aumentan las consultas por solicitud, si algún escenario
+devuelve un estado inesperado o si alguna ruta de Routes/ no tiene escenario. Los
+tiempos (rps, p50, p99) dependen de la máquina y de su carga: por defecto, un
+empeoramiento se informa como aviso y solo hace fallar con --exigir-tiempos.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import pyodbc_falso
+
+RUTA_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Margen fijo para consultas por solicitud: el conteo es casi determinista, cualquier
+# consulta extra por solicitud es una regresión aunque los tiempos no cambien.
+MARGEN_CONSULTAS = 0.10
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+async def ejecutar_escenario(app, escenario, repeticiones, concurrencia, solicitar):
+    """Ejecuta `repeticiones` solicitudes del escenario con `concurrencia` trabajadores."""
+    n = min(escenario.repeticiones or repeticiones, repeticiones)
+    siguiente = iter(range(n))
+    latencias, errores = [], []
+
+    async def trabajador():
+        for i in siguiente:
+            url, cuerpo = escenario.generar(i)
+            inicio = time.perf_counter()
+            try:
+                respuesta = await solicitar(app, escenario.metodo, url, cuerpo, escenario.encabezados)
+            except Exception as e:
+                # Excepciones no manejadas (por ejemplo, validación de la respuesta).
+                respuesta = {"status": 500, "body": repr(e).encode()}
+            latencias.append(time.perf_counter() - inicio)
+            if respuesta["status"] != escenario.estado:
+                errores.append(f"{url} -> {respuesta['status']}: {respuesta['body'][:200].decode('utf-8', 'replace')}")
+
+    consultas_antes = pyodbc_falso.contadores["consultas"]
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    total = time.perf_counter() - inicio
+    return {
+        "solicitudes": n,
+        "rps": round(n / total, 1),
+        "p50_ms": round(_percentil(latencias, 0.50) * 1000, 2),
+        "p99_ms": round(_percentil(latencias, 0.99) * 1000, 2),
+        "consultas": round((pyodbc_falso.contadores["consultas"] - consultas_antes) / n, 2),
+    }, errores
+
+
+def rutas_sin_escenario(escenarios):
+    """Rutas declaradas en Routes/* que ningún escenario cubre."""
+    from Routes import Autores, Estudiantes, Libros, Multas, Prestamos, Reportes
+    cubiertas = {(e.metodo, e.ruta) for e in escenarios}
+    declaradas = {
+        (metodo, ruta.path)
+        for modulo in (Estudiantes, Autores, Libros, Prestamos, Multas, Reportes)
+        for ruta in modulo.router.routes
+        for metodo in ruta.methods
+    }
+    return sorted(declaradas - cubiertas)
+
+
+def comparar(nombre, actual, base):
+    """Devuelve la regresión en consultas por solicitud del escenario respecto de la baseline (o ninguna)."""
+    if actual["consultas"] > base["consultas"] * (1 + MARGEN_CONSULTAS) + 0.05:
+        return [f"{nombre}: consultas/solicitud {base['consultas']} -> {actual['consultas']}"]
+    return []
+
+
+def comparar_tiempos(nombre, actual, base, tolerancia, tolerancia_p99):
+    """Devuelve los empeoramientos de tiempos del escenario respecto de la baseline."""
+    empeoramientos = []
+    for clave, margen in (("p50_ms", tolerancia), ("p99_ms", tolerancia_p99)):
+        if actual[clave] > base[clave] * (1 + margen):
+            empeoramientos.append(f"{nombre}: {clave} {base[clave]} -> {actual[clave]}")
+    if actual["rps"] < base["rps"] * (1 - tolerancia):
+        empeoramientos.append(f"{nombre}: rps {base['rps']} -> {actual['rps']}")
+    return empeoramientos
+
+
+async def principal(args):
+    from benchmarks import escenarios as modulo_escenarios
+    from benchmarks.cliente_asgi import CicloDeVida, solicitar
+    from main import app
+    from utils.contadores import contadores
+    from utils.instantaneas import instantaneas
+    from utils.tareas import tareas
+
+    escenarios = [e for e in modulo_escenarios.ESCENARIOS if not args.solo or args.solo in e.nombre]
+    fallas, avisos = [], []
+    if not args.solo:
+        fallas += [f"Ruta sin escenario: {metodo} {ruta}" for metodo, ruta in rutas_sin_escenario(escenarios)]
+
+    base = {}
+    if not args.guardar_baseline and os.path.exists(RUTA_BASELINE):
+        with open(RUTA_BASELINE, encoding="utf-8") as f:
+            guardada = json.load(f)
+        if guardada["configuracion"] != _configuracion(args):
+            print(f"Aviso: la baseline se midió con {guardada['configuracion']}", file=sys.stderr)
+        base = guardada["escenarios"]
+
+    resultados = {}
+    async with CicloDeVida(app):
+        # Las tareas que el ciclo de vida lanza al arrancar (multas por atraso, carga de
+        # índices) terminan antes de medir, para no sumar sus consultas al primer escenario.
+        await asyncio.gather(
+            *(tarea.ejecutar() for tarea in tareas.values()),
+            *(indice.reconciliar() for indice in contadores.values())
+        )
+        print(f"{'escenario':<50} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'consultas':>9}")
+        for escenario in escenarios:
+            # Las reconstrucciones en segundo plano que dejó el escenario anterior (o el
+            # arranque) terminan antes de medir este, para no sumarle sus consultas.
+            await asyncio.gather(*(instantanea.esperar() for instantanea in instantaneas.values()))
+            resultado, errores = await ejecutar_escenario(
+                app, escenario, args.repeticiones, args.concurrencia, solicitar
+            )
+            resultados[escenario.nombre] = resultado
+            print(f"{escenario.nombre:<50} {resultado['rps']:>8} {resultado['p50_ms']:>8} "
+                  f"{resultado['p99_ms']:>8} {resultado['consultas']:>9}")
+            fallas += [f"{escenario.nombre}: {error}" for error in errores[:3]]
+            if escenario.nombre in base:
+                fallas += comparar(escenario.nombre, resultado, base[escenario.nombre])
+                tiempos = comparar_tiempos(
+                    escenario.nombre, resultado, base[escenario.nombre], args.tolerancia, args.tolerancia_p99
+                )
+                if args.exigir_tiempos:
+                    fallas += tiempos
+                else:
+                    avisos += tiempos
+
+    if args.guardar_baseline:
+        with open(RUTA_BASELINE, "w", encoding="utf-8") as f:
+            json.dump({"configuracion": _configuracion(args), "escenarios": resultados}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Baseline guardada en {RUTA_BASELINE}")
+
+    for aviso in avisos:
+        print(f"AVISO {aviso}", file=sys.stderr)
+    for falla in fallas:
+        print(f"FALLA {falla}", file=sys.stderr)
+    return 1 if fallas else 0
+
+
+def _configuracion(args):
+    return {"latencia_ms": args.latencia_ms, "concurrencia": args.concurrencia, "repeticiones": args.repeticiones}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latencia-ms", type=float, default=2.0, help="Latencia simulada por ida y vuelta a la base de datos.")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Solicitudes simultáneas por escenario.")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Solicitudes por escenario.")
+    parser.add_argument("--tolerancia", type=float, default=0.30, help="Empeoramiento relativo admitido en rps y p50.")
+    parser.add_argument("--tolerancia-p99", type=float, default=1.0,
+                        help="Empeoramiento relativo admitido en p99 (la cola es más ruidosa que la mediana).")
+    parser.add_argument("--exigir-tiempos", action="store_true",
+                        help="Un empeoramiento de rps, p50 o p99 hace fallar (por defecto solo se avisa).")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Reescribe benchmarks/baseline.json con esta corrida.")
+    parser.add_argument("--solo", help="Ejecuta solo los escenarios cuyo nombre contenga este texto.")
+    args = parser.parse_args()
+
+    from benchmarks.escenarios import REPETICIONES_MAXIMAS, sembrar
+    if args.repeticiones > REPETICIONES_MAXIMAS:
+        parser.error(f"--repeticiones admite como máximo {REPETICIONES_MAXIMAS} (datos sembrados)")
+
+    # La aplicación importa pyodbc al cargar utils/database.py: el sustituto debe
+    # estar registrado antes de importar main.
+    sys.modules["pyodbc"] = pyodbc_falso
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directorio:
+        pyodbc_falso.configurar(os.path.join(directorio, "bench.sqlite"))
+        conn = pyodbc_falso.conexion_directa()
+        sembrar(conn)
+        conn.close()
+        pyodbc_falso.fijar_latencia(args.latencia_ms / 1000)
+        sys.exit(asyncio.run(principal(args)))
+
+
+if __name__ == "__main__":
+    main()
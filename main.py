@@ -1,27 +1,83 @@
+import asyncio
 import uvicorn
 
 # Importaciones necesarias de FastAPI y los routers de cada módulo.
+from contextlib import asynccontextmanager
 from typing import Union
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from utils.database import pool, db_executor
+from utils.cache import caches
+from utils.coalescing import grupos
+from utils.sentencias import sentencias
+from utils.etags import versiones
+from utils.instantaneas import instantaneas
+from utils.contadores import contadores
+from utils.tareas import tareas as tareas_periodicas
+from utils.busqueda import indices
+from utils.metricas import CONTENT_TYPE_PROMETHEUS, MetricsMiddleware, render_prometheus
+from utils.tiempos import RespuestaJSONCronometrada, ServerTimingMiddleware
 from Routes.Estudiantes import router as router_estudiantes
 from Routes.Autores import router as router_autores
 from Routes.Libros import router as router_libros
 from Routes.Prestamos import router as router_prestamos
 from Routes.Multas import router as router_multas
+from Routes.Reportes import router as router_reportes
+from Controllers.Libros import (
+    INTERVALO_RECARGA_BUSQUEDA,
+    INTERVALO_REFRESCO_CATALOGO,
+    catalogo,
+    tarea_indice_busqueda
+)
+from Controllers.Prestamos import INTERVALO_RECONCILIACION_PRESTAMOS, prestamos_activos
+from Controllers.Multas import INTERVALO_MULTAS_ATRASO, tarea_multas_atraso
+from Controllers.Estudiantes import INTERVALO_RECARGA_ESTUDIANTES, tarea_indice_estudiantes
+
+# Ciclo de vida de la aplicación: abre el pool de conexiones al iniciar y lo cierra al apagar.
+# Abrir y cerrar el pool y detener el executor son llamadas bloqueantes: van en un hilo
+# aparte para no frenar el event loop. Al apagar, las tareas en segundo plano se cancelan
+# y se espera que terminen antes de detener el executor que usan.
+# Mientras tanto, en segundo plano, el catálogo materializado se arma y se refresca, el
+# índice de préstamos activos se carga y se reconcilia, se generan las multas por atraso y
+# se cargan los índices de búsqueda de libros y de estudiantes.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(pool.open)
+    tareas = [
+        asyncio.create_task(catalogo.refrescar_periodicamente(INTERVALO_REFRESCO_CATALOGO)),
+        asyncio.create_task(prestamos_activos.reconciliar_periodicamente(INTERVALO_RECONCILIACION_PRESTAMOS)),
+        asyncio.create_task(tarea_multas_atraso.correr_periodicamente(INTERVALO_MULTAS_ATRASO)),
+        asyncio.create_task(tarea_indice_busqueda.correr_periodicamente(INTERVALO_RECARGA_BUSQUEDA)),
+        asyncio.create_task(tarea_indice_estudiantes.correr_periodicamente(INTERVALO_RECARGA_ESTUDIANTES)),
+    ]
+    yield
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
+    await asyncio.to_thread(db_executor.shutdown)
+    await asyncio.to_thread(pool.close)
 
 # Creación de la instancia de la aplicación FastAPI con título, descripción y versión.
 app = FastAPI(
     title="API de Biblioteca",
     description="API para gestionar la tabla de estudiantes.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespuestaJSONCronometrada
 )
 
+# Middlewares: latencia de cada ruta para /metrics y desglose por solicitud en el
+# encabezado Server-Timing (base de datos, endpoint, validación y serialización).
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Inclusión de los routers para cada recurso de la API.
 app.include_router(router_estudiantes)
 app.include_router(router_autores)
 app.include_router(router_libros)
 app.include_router(router_prestamos)
 app.include_router(router_multas)
+app.include_router(router_reportes)
 
 # Definición de la ruta raíz que devuelve un mensaje de bienvenida.
 @app.get("/")
@@ -31,6 +87,58 @@ def read_root():
     """
     return {"API": "Biblioteca de Estudiantes - Funcionando Correctamente"}
 
+# Estado de cada subsistema para diagnóstico: nombre -> función que devuelve sus estadísticas.
+ESTADO = {
+    # Tamaño actual del pool de conexiones y sus contadores de uso.
+    "pool": pool.stats,
+    # Tareas en cola, hilos ocupados y tiempos de espera del executor de base de datos.
+    "executor": db_executor.stats,
+    # Tamaño, aciertos, fallos y desalojos de cada caché de entidades.
+    "cache": lambda: {nombre: cache.stats() for nombre, cache in caches.items()},
+    # Por grupo, lecturas ejecutadas y las que reutilizaron una consulta en curso.
+    "coalescing": lambda: {nombre: grupo.stats() for nombre, grupo in grupos.items()},
+    # Plantillas SQL generadas por el registro de sentencias y sus reutilizaciones.
+    "sentencias": sentencias.stats,
+    # GET condicionales respondidos con 304 o completos, y la versión de cada tabla en este proceso.
+    "etags": versiones.stats,
+    # Por instantánea materializada (catálogo): tamaño JSON y gzip, vigencia y reconstrucciones.
+    "instantaneas": lambda: {nombre: instantanea.stats() for nombre, instantanea in instantaneas.items()},
+    # Por índice de conteo (préstamos activos): carga, claves y correcciones de la reconciliación.
+    "contadores": lambda: {nombre: indice.stats() for nombre, indice in contadores.items()},
+    # Por tarea periódica: ejecuciones, fallas, duración y resultado de la última.
+    "tareas": lambda: {nombre: tarea.stats() for nombre, tarea in tareas_periodicas.items()},
+    # Por índice de búsqueda (libros y estudiantes): documentos, búsquedas y actualizaciones.
+    "busqueda": lambda: {nombre: indice.stats() for nombre, indice in indices.items()},
+}
+
+# Ruta de diagnóstico con el estado de todos los subsistemas.
+@app.get("/estado", tags=["Diagnóstico"])
+def estado():
+    """
+    Devuelve las estadísticas de cada subsistema (pool, executor, cachés, índices, tareas...), una entrada por nombre.
+    """
+    return {nombre: obtener() for nombre, obtener in ESTADO.items()}
+
+# Ruta de diagnóstico con el estado de un solo subsistema.
+@app.get("/estado/{componente}", tags=["Diagnóstico"])
+def estado_componente(componente: str):
+    """
+    Devuelve las estadísticas de un subsistema (los mismos nombres que las claves de /estado).
+    """
+    obtener = ESTADO.get(componente)
+    if obtener is None:
+        raise HTTPException(status_code=404, detail=f"Componente desconocido: {componente}. Use: {', '.join(ESTADO)}")
+    return obtener()
+
+# Métricas en formato de texto de Prometheus: histogramas de latencia por consulta y por
+# ruta, filas por consulta y espera por conexiones del pool.
+@app.get("/metrics", tags=["Diagnóstico"], response_class=PlainTextResponse)
+def metricas():
+    """
+    Devuelve los histogramas de consultas, conexiones y rutas en formato Prometheus.
+    """
+    return PlainTextResponse(render_prometheus(), media_type=CONTENT_TYPE_PROMETHEUS)
+
 # Ruta de ejemplo para leer un item con un ID y un parámetro opcional.
 @app.get("/items/{item_id}")
 def read_item(item_id: int, q: Union[str, None] = None):
@@ -0,0 +1,47 @@
+"""
+Base de datos de reemplazo para las pruebas que pasan por los controladores.
+
+Registra benchmarks/pyodbc_falso.py (SQLite con el esquema `biblioteca`) como pyodbc,
+igual que el benchmark, y crea la base en un directorio temporal. Los módulos de
+pruebas que lo usan lo importan antes que a utils/database.py o a los controladores.
+"""
+import atexit
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks import pyodbc_falso
+
+sys.modules["pyodbc"] = pyodbc_falso
+logging.disable(logging.ERROR)
+
+_directorio = tempfile.mkdtemp(prefix="biblioteca-tests-")
+atexit.register(shutil.rmtree, _directorio, True)
+pyodbc_falso.configurar(os.path.join(_directorio, "tests.sqlite"))
+
+# Tablas en orden de borrado (primero las que referencian a otras).
+TABLAS = ["multa", "prestamo", "libro_autor", "libro", "autor", "estudiante"]
+
+
+def ejecutar(sql, params=()):
+    """Ejecuta SQL de SQLite con una conexión directa (sin traducción) y hace commit."""
+    conn = pyodbc_falso.conexion_directa()
+    try:
+        filas = conn.execute(sql, params).fetchall()
+        conn.commit()
+        return filas
+    finally:
+        conn.close()
+
+
+def vaciar():
+    """Borra todas las filas de las tablas de `biblioteca`."""
+    conn = pyodbc_falso.conexion_directa()
+    try:
+        for tabla in TABLAS:
+            conn.execute(f"DELETE FROM {tabla}")
+        conn.commit()
+    finally:
+        conn.close()
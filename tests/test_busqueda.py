@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+
+from tests import base_falsa  # noqa: F401  (Controllers.Libros importa utils.database)
+from Controllers import Libros
+from utils import busqueda
+from utils.busqueda import IndiceTrigramas, trigramas
+
+
+def ordenar(puntajes, limite=None):
+    """Claves de mayor a menor puntaje, empates por clave (como buscar_libros)."""
+    return [clave for clave, _ in sorted(puntajes.items(), key=lambda par: (-par[1], par[0]))][:limite]
+
+
+def indice(textos):
+    nuevo = IndiceTrigramas("test_busqueda")
+    nuevo.cargar((clave, texto, {"ISBN": clave, "Titulo": texto}) for clave, texto in textos.items())
+    return nuevo
+
+
+class TestIndiceTrigramas(unittest.TestCase):
+
+    def test_sin_tildes_ni_mayusculas(self):
+        titulos = indice({"a": "Cien años de soledad", "b": "El amor en los tiempos del cólera"})
+        self.assertEqual(ordenar(titulos.puntuar(trigramas("CIEN ANOS"))), ["a"])
+        self.assertEqual(ordenar(titulos.puntuar(trigramas("colera"))), ["b"])
+
+    def test_a_igual_cobertura_gana_el_texto_mas_corto(self):
+        titulos = indice({"a": "Historia de la guerra", "b": "Guerra", "c": "Paz"})
+        puntajes = titulos.puntuar(trigramas("guerra"))
+        self.assertEqual(ordenar(puntajes), ["b", "a"])
+        self.assertEqual(puntajes["b"], 1.0)
+
+    def test_debajo_de_la_cobertura_minima_no_es_resultado(self):
+        titulos = indice({"a": "Rayuela"})
+        self.assertEqual(titulos.puntuar(trigramas("rayuela de cortazar y borges")), {})
+        self.assertEqual(titulos.puntuar(frozenset()), {})
+
+    def test_con_limite_da_los_mismos_mejores(self):
+        titulos = indice({f"{n:05d}": f"Libro número {n}" for n in range(1, 3001)})
+        for consulta in ("libro numero 17", "numero 1999", "libro 250", "numro 42"):
+            gramas = trigramas(consulta)
+            completo = titulos.puntuar(gramas)
+            for limite in (1, 5, 20):
+                with self.subTest(consulta=consulta, limite=limite):
+                    acotado = titulos.puntuar(gramas, limite)
+                    self.assertEqual(ordenar(acotado, limite), ordenar(completo, limite))
+                    # Se deja de buscar antes de puntuar todo lo que cumple la cobertura.
+                    self.assertLess(len(acotado), len(completo))
+
+    def test_maximo_de_candidatos(self):
+        titulos = indice({f"{n:05d}": f"Libro número {n}" for n in range(1, 301)})
+        with mock.patch.object(busqueda, "MAXIMO_CANDIDATOS", 50):
+            self.assertEqual(len(titulos.puntuar(trigramas("libro"))), 50)
+
+    def test_poner_y_quitar(self):
+        titulos = indice({"a": "Rayuela"})
+        titulos.poner("b", "Rayuela ilustrada", {})
+        titulos.poner("a", "Ficciones", {})
+        self.assertEqual(ordenar(titulos.puntuar(trigramas("rayuela"))), ["b"])
+        titulos.quitar("b")
+        self.assertEqual(titulos.puntuar(trigramas("rayuela")), {})
+
+
+class TestBuscarLibros(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        titulos = indice({"L-1": "Ficciones", "L-2": "El Aleph", "L-3": "Rayuela", "L-4": "Ficciones"})
+        autores = IndiceTrigramas("test_busqueda_autores")
+        autores.cargar([(1, "Jorge Luis Borges", {"Id_autor": 1, "Nombre_autor": "Jorge Luis Borges"}),
+                        (2, "Julio Cortázar", {"Id_autor": 2, "Nombre_autor": "Julio Cortázar"})])
+        for nombre, valor in (("indice_titulos", titulos), ("indice_autores", autores),
+                              ("_autores_de_libro", {}), ("_libros_de_autor", {})):
+            parche = mock.patch.object(Libros, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+        for isbn, id_autor in (("L-1", 1), ("L-2", 1), ("L-3", 2)):
+            Libros._relacionar(isbn, id_autor)
+
+    async def test_por_autor_cuenta_para_todos_sus_libros(self):
+        resultados = await Libros.buscar_libros("borges", 10)
+        self.assertEqual([libro["ISBN"] for libro in resultados], ["L-1", "L-2"])
+        self.assertEqual(resultados[0]["Autores"], ["Jorge Luis Borges"])
+
+    async def test_empates_por_isbn_y_limite(self):
+        resultados = await Libros.buscar_libros("ficciones", 1)
+        self.assertEqual([(libro["ISBN"], libro["Puntaje"]) for libro in resultados], [("L-1", 1.0)])
+
+    async def test_mejor_puntaje_entre_titulo_y_autor(self):
+        resultados = await Libros.buscar_libros("cortazar rayuela", 10)
+        self.assertEqual(resultados[0]["ISBN"], "L-3")
+        self.assertEqual(resultados[0]["Autores"], ["Julio Cortázar"])
+
+
+if __name__ == "__main__":
+    unittest.main()
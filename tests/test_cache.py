@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from tests import base_falsa
+
+from Controllers import Libros
+from utils import cache as modulo_cache
+from utils.cache import MISS, TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TTLCache("test_cache", maxsize=2, ttl=10)
+
+    def test_entrega_copias(self):
+        fila = {"ISBN": "L-1", "Titulo": "Rayuela"}
+        self.cache.set("L-1", fila)
+        fila["Titulo"] = "cambiado por quien la guardó"
+        leida = self.cache.get("L-1")
+        leida["Titulo"] = "cambiado por quien la leyó"
+        self.assertEqual(self.cache.get("L-1")["Titulo"], "Rayuela")
+
+    def test_invalidacion_durante_la_lectura_descarta_el_valor(self):
+        marca = self.cache.marca()
+        # Una escritura sobre cualquier clave mientras se consultaba la base de datos.
+        self.cache.invalidate("otra")
+        self.cache.set("L-1", {"Titulo": "viejo"}, marca)
+        self.assertIs(self.cache.get("L-1"), MISS)
+        self.assertEqual(self.cache.stats()["stale_skips"], 1)
+
+        marca = self.cache.marca()
+        self.cache.clear()
+        self.cache.set("L-1", {"Titulo": "viejo"}, marca)
+        self.assertIs(self.cache.get("L-1"), MISS)
+
+        marca = self.cache.marca()
+        self.cache.set("L-1", {"Titulo": "nuevo"}, marca)
+        self.assertEqual(self.cache.get("L-1"), {"Titulo": "nuevo"})
+
+    def test_expira_por_ttl(self):
+        with mock.patch.object(modulo_cache.time, "monotonic", return_value=100.0):
+            self.cache.set("L-1", {"Titulo": "Rayuela"})
+        with mock.patch.object(modulo_cache.time, "monotonic", return_value=109.9):
+            self.assertIsNot(self.cache.get("L-1"), MISS)
+        with mock.patch.object(modulo_cache.time, "monotonic", return_value=110.0):
+            self.assertIs(self.cache.get("L-1"), MISS)
+        self.assertEqual(self.cache.stats()["expired"], 1)
+
+    def test_desaloja_la_menos_usada(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertIs(self.cache.get("b"), MISS)
+        self.assertEqual((self.cache.get("a"), self.cache.get("c")), (1, 3))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_ttl_cero_desactiva(self):
+        apagada = TTLCache("test_cache_apagada", ttl=0)
+        apagada.set("a", 1)
+        self.assertIs(apagada.get("a"), MISS)
+
+
+class TestCacheLibros(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        base_falsa.vaciar()
+        base_falsa.ejecutar("INSERT INTO libro (ISBN, Titulo, Año_publicacion) VALUES ('L-1', 'Rayuela', 1963)")
+        Libros.cache_libros.clear()
+
+    async def test_lectura_que_cruza_una_escritura_no_queda_en_cache(self):
+        original = Libros.execute_query_one
+
+        async def leer_mientras_escriben(*args, **kwargs):
+            fila = await original(*args, **kwargs)
+            Libros.cache_libros.invalidate("L-1")
+            return fila
+
+        with mock.patch.object(Libros, "execute_query_one", leer_mientras_escriben):
+            self.assertEqual((await Libros.obtener_libro("L-1"))["Titulo"], "Rayuela")
+        self.assertIs(Libros.cache_libros.get("L-1"), MISS)
+
+        # Sin escrituras de por medio, la siguiente lectura sí se guarda.
+        await Libros.obtener_libro("L-1")
+        self.assertEqual(Libros.cache_libros.get("L-1")["Titulo"], "Rayuela")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+from utils.coalescing import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.grupo = SingleFlight("test_coalescing")
+        self.liberar = asyncio.Event()
+        self.llamadas = []
+
+        @self.grupo
+        async def leer(clave, fallar=False):
+            self.llamadas.append(clave)
+            await self.liberar.wait()
+            if fallar:
+                raise RuntimeError("falló la consulta")
+            return [{"clave": clave, "Titulo": "Ficciones"}]
+
+        self.leer = leer
+
+    async def esperando(self, *corrutinas):
+        tareas = [asyncio.ensure_future(c) for c in corrutinas]
+        await asyncio.sleep(0)
+        return tareas
+
+    async def test_una_sola_consulta_y_una_copia_por_llamador(self):
+        tareas = await self.esperando(self.leer(1), self.leer(1), self.leer(2))
+        self.liberar.set()
+        primero, segundo, otro = await asyncio.gather(*tareas)
+
+        self.assertEqual(self.llamadas, [1, 2])
+        self.assertEqual(primero, segundo)
+        primero[0]["clave"] = "modificada"
+        primero.append({})
+        self.assertEqual(segundo, [{"clave": 1, "Titulo": "Ficciones"}])
+        self.assertEqual(otro[0]["clave"], 2)
+        stats = self.grupo.stats()
+        self.assertEqual((stats["calls"], stats["flights"], stats["shared"], stats["in_flight"]), (3, 2, 1, 0))
+
+    async def test_terminada_no_se_reutiliza(self):
+        self.liberar.set()
+        await self.leer(1)
+        await self.leer(1)
+        self.assertEqual(self.llamadas, [1, 1])
+
+    async def test_despues_de_clear_se_consulta_de_nuevo(self):
+        antes = await self.esperando(self.leer(1))
+        self.grupo.clear()
+        despues = await self.esperando(self.leer(1))
+        self.liberar.set()
+        await asyncio.gather(*antes, *despues)
+        self.assertEqual(self.llamadas, [1, 1])
+
+    async def test_cancelar_al_que_inicio_no_afecta_a_los_demas(self):
+        iniciador, otro = await self.esperando(self.leer(1), self.leer(1))
+        iniciador.cancel()
+        await asyncio.sleep(0)
+        self.liberar.set()
+        self.assertEqual((await otro)[0]["clave"], 1)
+        self.assertTrue(iniciador.cancelled())
+        self.assertEqual(self.llamadas, [1])
+
+    async def test_el_error_llega_a_todos_y_no_queda_guardado(self):
+        tareas = await self.esperando(self.leer(1, fallar=True), self.leer(1, fallar=True))
+        self.liberar.set()
+        for resultado in await asyncio.gather(*tareas, return_exceptions=True):
+            self.assertIsInstance(resultado, RuntimeError)
+        self.assertEqual((await self.leer(1))[0]["clave"], 1)
+        self.assertEqual(self.llamadas, [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
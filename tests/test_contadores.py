@@ -0,0 +1,276 @@
+import asyncio
+import random
+import threading
+import unittest
+
+from utils.contadores import IndiceContadores
+
+LIMITE = 5
+
+
+class TablaFalsa:
+    """
+    Préstamos activos por estudiante, como los tendría la tabla: solo cambia
+    cuando una escritura "hace commit". `cargar` es la función de carga del
+    índice; con `pausa` espera ese evento después de leer y antes de devolver,
+    para que la lectura quede vieja mientras otras escrituras avanzan.
+    """
+
+    def __init__(self, valores=None):
+        self.valores = dict(valores or {})
+        self.lock = threading.RLock()
+        self.pausa = None
+        self.leida = asyncio.Event()
+
+    def sumar(self, clave, delta):
+        with self.lock:
+            valor = self.valores.get(clave, 0) + delta
+            if valor > 0:
+                self.valores[clave] = valor
+            else:
+                self.valores.pop(clave, None)
+
+    def devolver(self, clave) -> bool:
+        # Como la devolución real (que bloquea la fila del préstamo): descuenta solo si hay un préstamo activo.
+        with self.lock:
+            if self.valores.get(clave, 0) <= 0:
+                return False
+            self.sumar(clave, -1)
+            return True
+
+    def get(self, clave):
+        with self.lock:
+            return self.valores.get(clave, 0)
+
+    def copia(self):
+        with self.lock:
+            return {clave: n for clave, n in self.valores.items() if n > 0}
+
+    async def cargar(self):
+        leidos = self.copia()
+        self.leida.set()
+        if self.pausa is not None:
+            await self.pausa.wait()
+        await asyncio.sleep(0)
+        return leidos
+
+
+def nuevo_indice(tabla, nombre):
+    indice = IndiceContadores(nombre, tabla.cargar)
+    asyncio.run(indice.reconciliar())
+    return indice
+
+
+class TestIndiceContadores(unittest.TestCase):
+
+    def test_desconocido_antes_de_la_primera_carga(self):
+        indice = IndiceContadores("test_sin_cargar", TablaFalsa().cargar)
+        self.assertIsNone(indice.get(1))
+        # Sin datos no se rechaza nada: decide la guarda de la base de datos.
+        self.assertEqual(indice.reservar({1: LIMITE + 1}, LIMITE), [])
+
+    def test_reservar_es_todo_o_nada(self):
+        indice = nuevo_indice(TablaFalsa({1: LIMITE - 1, 2: 0}), "test_todo_o_nada")
+        self.assertEqual(indice.reservar({1: 2, 2: 1}, LIMITE), [1])
+        self.assertEqual((indice.get(1), indice.get(2)), (LIMITE - 1, 0))
+        self.assertEqual(indice.reservar({1: 1, 2: 1}, LIMITE), [])
+        self.assertEqual((indice.get(1), indice.get(2)), (LIMITE, 1))
+
+    def test_terminar_con_commit_y_con_rollback(self):
+        tabla = TablaFalsa({1: 2})
+        indice = nuevo_indice(tabla, "test_commit_rollback")
+
+        # Commit: la reserva ya sumó, terminar no ajusta nada.
+        self.assertEqual(indice.reservar({1: 1}, LIMITE), [])
+        tabla.sumar(1, 1)
+        indice.terminar([1])
+        self.assertEqual(indice.get(1), tabla.get(1))
+
+        # Rollback: se devuelve lo reservado.
+        self.assertEqual(indice.reservar({1: 1}, LIMITE), [])
+        self.assertEqual(indice.get(1), 4)
+        indice.terminar([1], {1: -1})
+        self.assertEqual(indice.get(1), tabla.get(1))
+
+        # Devolución: se anuncia sin cambiar el valor y se ajusta al terminar.
+        indice.anunciar([1])
+        tabla.sumar(1, -1)
+        self.assertEqual(indice.get(1), 3)
+        indice.terminar([1], {1: -1})
+        self.assertEqual(indice.get(1), tabla.get(1))
+        self.assertEqual(indice.stats()["en_curso"], 0)
+
+    def test_hilos_nunca_superan_el_limite_ni_se_desvian(self):
+        claves = [1, 2, 3]
+        tabla = TablaFalsa({1: 3})
+        indice = nuevo_indice(tabla, "test_hilos")
+        excesos = []
+        barrera = threading.Barrier(8)
+
+        def trabajar(semilla):
+            azar = random.Random(semilla)
+            barrera.wait()
+            for _ in range(2000):
+                clave = azar.choice(claves)
+                if azar.random() < 0.6:
+                    if indice.reservar({clave: 1}, LIMITE):
+                        continue
+                    # Entre la reserva y el commit la tabla nunca puede quedar por encima del índice.
+                    if indice.get(clave) > LIMITE:
+                        excesos.append(clave)
+                    if azar.random() < 0.7:
+                        tabla.sumar(clave, 1)
+                        indice.terminar([clave])
+                    else:
+                        indice.terminar([clave], {clave: -1})
+                else:
+                    indice.anunciar([clave])
+                    if azar.random() < 0.9 and tabla.devolver(clave):
+                        indice.terminar([clave], {clave: -1})
+                    else:
+                        indice.terminar([clave])
+
+        def reconciliar():
+            # Otro hilo, con su propio event loop, reconcilia mientras tanto.
+            barrera.wait()
+            for _ in range(200):
+                asyncio.run(indice.reconciliar())
+
+        hilos = [threading.Thread(target=trabajar, args=(n,)) for n in range(7)]
+        hilos.append(threading.Thread(target=reconciliar))
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(excesos, [])
+        for clave in claves:
+            self.assertLessEqual(tabla.get(clave), LIMITE)
+            self.assertEqual(indice.get(clave), tabla.get(clave))
+        self.assertEqual(indice.stats()["en_curso"], 0)
+
+        # Ni durante ni después la reconciliación encuentra nada que corregir.
+        asyncio.run(indice.reconciliar())
+        self.assertEqual(indice.stats()["corrections"], 0)
+
+    def test_reconciliar_corrige_cambios_externos(self):
+        tabla = TablaFalsa({1: LIMITE})
+        indice = nuevo_indice(tabla, "test_externos")
+        # Una devolución hecha por otro proceso: el índice queda alto hasta reconciliar.
+        tabla.sumar(1, -2)
+        self.assertEqual(indice.reservar({1: 1}, LIMITE), [1])
+        asyncio.run(indice.reconciliar())
+        self.assertEqual(indice.get(1), tabla.get(1))
+        self.assertEqual(indice.stats()["corrections"], 1)
+
+    def test_desconocidas_hasta_cargar(self):
+        tabla = TablaFalsa({1: LIMITE})
+        indice = IndiceContadores("test_desconocidas", tabla.cargar)
+        self.assertEqual(indice.desconocidas([1, 2]), [1, 2])
+        asyncio.run(indice.reconciliar())
+        # Una clave sin filas en la tabla también se conoce: tiene 0.
+        self.assertEqual(indice.desconocidas([1, 2]), [])
+        self.assertEqual(indice.reservar({1: 1}, LIMITE), [1])
+
+
+class TestReconciliacionConcurrente(unittest.IsolatedAsyncioTestCase):
+
+    async def test_anunciar_durante_la_lectura_no_se_pisa(self):
+        tabla = TablaFalsa({1: 3, 2: 1})
+        indice = IndiceContadores("test_anunciar_lectura", tabla.cargar)
+        await indice.reconciliar()
+
+        tabla.pausa = asyncio.Event()
+        tabla.leida.clear()
+        reconciliacion = asyncio.create_task(indice.reconciliar())
+        await tabla.leida.wait()
+
+        # La lectura ya se hizo con {1: 3}; una devolución termina antes de que llegue.
+        indice.anunciar([1])
+        tabla.sumar(1, -1)
+        indice.terminar([1], {1: -1})
+        # Y otra queda en curso mientras la reconciliación aplica lo leído.
+        indice.anunciar([2])
+        tabla.sumar(2, -1)
+
+        tabla.pausa.set()
+        await reconciliacion
+        self.assertEqual(indice.get(1), 2)
+        self.assertEqual(indice.get(2), 1)
+
+        indice.terminar([2], {2: -1})
+        self.assertEqual(indice.get(2), tabla.get(2))
+        await indice.reconciliar()
+        self.assertEqual(indice.stats()["corrections"], 0)
+
+    async def test_primera_carga_con_escrituras_en_curso(self):
+        tabla = TablaFalsa({1: 2})
+        indice = IndiceContadores("test_primera_carga", tabla.cargar)
+        tabla.pausa = asyncio.Event()
+        carga = asyncio.create_task(indice.reconciliar())
+        await tabla.leida.wait()
+
+        self.assertEqual(indice.reservar({1: 1}, LIMITE), [])
+        tabla.sumar(1, 1)
+        tabla.pausa.set()
+        await carga
+        # Lo tocado durante la primera carga queda desconocido hasta la próxima.
+        self.assertIsNone(indice.get(1))
+        self.assertEqual(indice.desconocidas([1]), [1])
+        indice.terminar([1])
+        tabla.pausa = None
+        await indice.reconciliar()
+        self.assertEqual(indice.get(1), tabla.get(1))
+
+    async def test_reconciliar_compitiendo_con_reservas(self):
+        claves = [1, 2, 3, 4]
+        tabla = TablaFalsa({1: 4, 2: 1})
+        indice = IndiceContadores("test_compitiendo", tabla.cargar)
+        await indice.reconciliar()
+        excesos = []
+
+        async def escrituras(semilla):
+            azar = random.Random(semilla)
+            for _ in range(300):
+                clave = azar.choice(claves)
+                if azar.random() < 0.6:
+                    if indice.reservar({clave: 1}, LIMITE):
+                        await asyncio.sleep(0)
+                        continue
+                    if indice.get(clave) > LIMITE:
+                        excesos.append(clave)
+                    await asyncio.sleep(0)
+                    if azar.random() < 0.7:
+                        tabla.sumar(clave, 1)
+                        await asyncio.sleep(0)
+                        indice.terminar([clave])
+                    else:
+                        indice.terminar([clave], {clave: -1})
+                else:
+                    indice.anunciar([clave])
+                    await asyncio.sleep(0)
+                    if tabla.devolver(clave):
+                        await asyncio.sleep(0)
+                        indice.terminar([clave], {clave: -1})
+                    else:
+                        indice.terminar([clave])
+
+        async def reconciliaciones():
+            for _ in range(50):
+                await indice.reconciliar()
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(escrituras(n) for n in range(6)), reconciliaciones(), reconciliaciones())
+
+        self.assertEqual(excesos, [])
+        self.assertEqual(indice.stats()["en_curso"], 0)
+        # Reconciliar nunca tuvo que corregir nada: el índice solo ve escrituras de este proceso.
+        self.assertEqual(indice.stats()["corrections"], 0)
+        await indice.reconciliar()
+        for clave in claves:
+            self.assertLessEqual(tabla.get(clave), LIMITE)
+            self.assertEqual(indice.get(clave), tabla.get(clave))
+
+
+if __name__ == "__main__":
+    unittest.main()
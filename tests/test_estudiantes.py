@@ -0,0 +1,51 @@
+import unittest
+
+from tests import base_falsa
+from fastapi import HTTPException
+
+from Controllers import Estudiantes
+from Models.Estudiantes import Estudiante
+
+
+def esta_activo(id_estudiante):
+    return base_falsa.ejecutar(
+        "SELECT Esta_Activo FROM estudiante WHERE id_matricula_estudiante = ?", (id_estudiante,)
+    )[0][0]
+
+
+class TestDesactivarEstudiante(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        base_falsa.vaciar()
+        base_falsa.ejecutar("INSERT INTO estudiante (id_matricula_estudiante, Nombre_estudiante, Edad) VALUES (1, 'Ana', 20)")
+        base_falsa.ejecutar("INSERT INTO libro (ISBN, Titulo, Año_publicacion) VALUES ('L-1', 'Libro', 2000)")
+
+    async def test_con_prestamos_activos_no_se_desactiva(self):
+        # El préstamo lo crea otro proceso: ningún índice en memoria lo conoce.
+        base_falsa.ejecutar(
+            "INSERT INTO prestamo (Id_matricula_estudiante, ISBN, Fecha_prestamo) VALUES (1, 'L-1', date('now'))"
+        )
+        with self.assertRaises(HTTPException) as error:
+            await Estudiantes.actualizar_estudiante(Estudiante(id_matricula_estudiante=1, Esta_Activo=False, Edad=21))
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertIn("1 préstamos activos", error.exception.detail)
+        self.assertTrue(esta_activo(1))
+
+    async def test_sin_prestamos_activos_se_desactiva(self):
+        base_falsa.ejecutar(
+            "INSERT INTO prestamo (Id_matricula_estudiante, ISBN, Fecha_prestamo, Fecha_devolucion) "
+            "VALUES (1, 'L-1', date('now'), date('now'))"
+        )
+        actualizado = await Estudiantes.actualizar_estudiante(Estudiante(id_matricula_estudiante=1, Esta_Activo=False))
+        self.assertIs(actualizado["Esta_Activo"], False)
+        self.assertFalse(esta_activo(1))
+
+    async def test_estudiante_inexistente(self):
+        for activo in (False, True):
+            with self.assertRaises(HTTPException) as error:
+                await Estudiantes.actualizar_estudiante(Estudiante(id_matricula_estudiante=99, Esta_Activo=activo))
+            self.assertEqual(error.exception.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
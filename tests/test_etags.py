@@ -0,0 +1,90 @@
+import unittest
+
+from tests import base_falsa
+from benchmarks.cliente_asgi import solicitar
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import Response
+
+from Routes import Estudiantes as RutasEstudiantes
+from utils.etags import RutaConEtag
+
+
+def aplicacion(datos):
+    """Aplicación nueva (como la de otro worker) con rutas que devuelven `datos`."""
+    router = APIRouter(route_class=RutaConEtag)
+
+    @router.get("/datos")
+    async def leer():
+        return datos
+
+    @router.post("/datos")
+    async def escribir():
+        return datos
+
+    @router.get("/propio")
+    async def propio():
+        return Response(b"{}", headers={"ETag": '"propio"'})
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+class TestRutaConEtag(unittest.IsolatedAsyncioTestCase):
+
+    async def test_304_si_el_contenido_no_cambio(self):
+        datos = {"valor": 1}
+        app = aplicacion(datos)
+        primera = await solicitar(app, "GET", "/datos")
+        etag = primera["headers"]["etag"]
+        self.assertEqual(primera["status"], 200)
+
+        for if_none_match in (etag, f'W/{etag}', f'"otro", {etag}', "*"):
+            with self.subTest(if_none_match=if_none_match):
+                repetida = await solicitar(app, "GET", "/datos", encabezados={"If-None-Match": if_none_match})
+                self.assertEqual((repetida["status"], repetida["body"]), (304, b""))
+                self.assertEqual(repetida["headers"]["etag"], etag)
+
+        datos["valor"] = 2
+        cambiada = await solicitar(app, "GET", "/datos", encabezados={"If-None-Match": etag})
+        self.assertEqual(cambiada["status"], 200)
+        self.assertNotEqual(cambiada["headers"]["etag"], etag)
+
+    async def test_el_mismo_etag_en_todos_los_workers(self):
+        etags = [(await solicitar(aplicacion({"valor": 1}), "GET", "/datos"))["headers"]["etag"] for _ in range(2)]
+        self.assertEqual(etags[0], etags[1])
+        otra = await solicitar(aplicacion({"valor": 1}), "GET", "/datos", encabezados={"If-None-Match": etags[0]})
+        self.assertEqual(otra["status"], 304)
+
+    async def test_solo_lecturas_200_sin_etag_propio(self):
+        app = aplicacion({"valor": 1})
+        escritura = await solicitar(app, "POST", "/datos", encabezados={"If-None-Match": "*"})
+        self.assertEqual(escritura["status"], 200)
+        self.assertNotIn("etag", escritura["headers"])
+        propio = await solicitar(app, "GET", "/propio")
+        self.assertEqual(propio["headers"]["etag"], '"propio"')
+
+
+class TestEtagEstudiantes(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        base_falsa.vaciar()
+        base_falsa.ejecutar("INSERT INTO estudiante (id_matricula_estudiante, Nombre_estudiante, Edad) VALUES (1, 'Ana', 20)")
+        self.app = FastAPI()
+        self.app.include_router(RutasEstudiantes.router)
+
+    async def test_una_escritura_cambia_el_etag(self):
+        primera = await solicitar(self.app, "GET", "/estudiantes/1")
+        etag = primera["headers"]["etag"]
+        repetida = await solicitar(self.app, "GET", "/estudiantes/1", encabezados={"If-None-Match": etag})
+        self.assertEqual(repetida["status"], 304)
+
+        actualizada = await solicitar(self.app, "PUT", "/estudiantes/1", {"id_matricula_estudiante": 1, "Edad": 21})
+        self.assertEqual(actualizada["status"], 200)
+        despues = await solicitar(self.app, "GET", "/estudiantes/1", encabezados={"If-None-Match": etag})
+        self.assertEqual(despues["status"], 200)
+        self.assertNotEqual(despues["headers"]["etag"], etag)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from tests import base_falsa  # noqa: F401  (utils.database importa pyodbc)
+from utils import database
+from utils.executor import DatabaseExecutor, ExecutorSaturatedError
+
+
+async def ocupar(executor, liberar):
+    """Ocupa un hilo del executor hasta que se active `liberar`; devuelve la tarea."""
+    empezo = threading.Event()
+
+    def bloquear():
+        empezo.set()
+        liberar.wait(5)
+        return "listo"
+
+    tarea = asyncio.create_task(executor.run(bloquear))
+    await asyncio.to_thread(empezo.wait, 5)
+    return tarea
+
+
+class PruebaExecutor(unittest.IsolatedAsyncioTestCase):
+    """Executor de un hilo con lugar para una sola tarea en cola."""
+
+    def setUp(self):
+        self.executor = DatabaseExecutor(max_workers=1, max_queue=1, name="test")
+        self.liberar = threading.Event()
+        # Las limpiezas corren en orden inverso: primero se libera el hilo y después se apaga.
+        self.addCleanup(self.executor.shutdown)
+        self.addCleanup(self.liberar.set)
+
+
+class TestDatabaseExecutor(PruebaExecutor):
+
+    async def test_corre_fuera_del_event_loop(self):
+        hilo = await self.executor.run(threading.get_ident)
+        self.assertNotEqual(hilo, threading.get_ident())
+
+    async def test_con_la_cola_llena_rechaza(self):
+        ocupada = await ocupar(self.executor, self.liberar)
+        en_cola = asyncio.create_task(self.executor.run(lambda: "en cola"))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(ExecutorSaturatedError):
+            await self.executor.run(lambda: "rechazada")
+        stats = self.executor.stats()
+        self.assertEqual((stats["queued"], stats["running"], stats["rejected"]), (1, 1, 1))
+
+        self.liberar.set()
+        self.assertEqual(await ocupada, "listo")
+        self.assertEqual(await en_cola, "en cola")
+        self.assertEqual(self.executor.stats()["queued"], 0)
+
+    async def test_cancelar_en_cola_libera_el_lugar_sin_ejecutar(self):
+        ocupada = await ocupar(self.executor, self.liberar)
+        corridas = []
+        en_cola = asyncio.create_task(self.executor.run(corridas.append, 1))
+        await asyncio.sleep(0)
+
+        en_cola.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await en_cola
+        self.assertEqual(self.executor.stats()["queued"], 0)
+
+        # El lugar liberado admite otra tarea, y la cancelada nunca llega a ejecutarse.
+        otra = asyncio.create_task(self.executor.run(corridas.append, 2))
+        self.liberar.set()
+        await ocupada
+        await otra
+        self.assertEqual(corridas, [2])
+
+    async def test_cancelar_en_curso_espera_a_que_termine(self):
+        ocupada = await ocupar(self.executor, self.liberar)
+        ocupada.cancel()
+        await asyncio.sleep(0.05)
+        # El hilo no se puede interrumpir: la tarea sigue esperándolo.
+        self.assertFalse(ocupada.done())
+        self.liberar.set()
+        with self.assertRaises(asyncio.CancelledError):
+            await ocupada
+        self.assertEqual(self.executor.stats()["running"], 0)
+
+
+class ConexionFalsa:
+    """
+    Conexión que registra cada uso y cuenta los que se solapan (pyodbc no admite dos
+    hilos sobre una conexión). La ejecución de una sentencia espera a `liberar`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.usos = []
+        self.solapados = 0
+        self.empezo = threading.Event()
+        self.liberar = threading.Event()
+
+    def _usar(self, nombre, bloquear=False):
+        if not self.lock.acquire(blocking=False):
+            self.solapados += 1
+            self.lock.acquire()
+        try:
+            if bloquear:
+                self.empezo.set()
+                self.liberar.wait(5)
+            self.usos.append(nombre)
+        finally:
+            self.lock.release()
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def commit(self):
+        self._usar("commit")
+
+    def close(self):
+        self._usar("close")
+
+    def mark_broken(self):
+        pass
+
+    def mark_dirty(self):
+        pass
+
+
+class CursorFalso:
+    description = None
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *params):
+        self.conn._usar(sql, bloquear=True)
+
+    def close(self):
+        pass
+
+
+class TestCancelacionConConexion(unittest.IsolatedAsyncioTestCase):
+
+    async def test_la_limpieza_espera_a_la_sentencia_cancelada(self):
+        conn = ConexionFalsa()
+
+        async def conexion():
+            return conn
+
+        async def escribir():
+            async with database.transaction() as tx:
+                await tx.execute("UPDATE")
+
+        with mock.patch.object(database, "get_db_connection", conexion):
+            tarea = asyncio.create_task(escribir())
+            await asyncio.to_thread(conn.empezo.wait, 5)
+            tarea.cancel()
+            await asyncio.sleep(0.05)
+            conn.liberar.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+
+        # La conexión se devuelve (sin commit) después de que termina la sentencia, nunca a la vez.
+        self.assertEqual(conn.usos, ["UPDATE", "close"])
+        self.assertEqual(conn.solapados, 0)
+
+
+class TestLimpiezaConExecutorSaturado(PruebaExecutor):
+
+    async def test_la_limpieza_no_corre_en_el_event_loop(self):
+        ocupada = await ocupar(self.executor, self.liberar)
+        en_cola = asyncio.create_task(self.executor.run(lambda: None))
+        await asyncio.sleep(0)
+
+        with mock.patch.object(database, "db_executor", self.executor):
+            hilo = await database._run_shielded(threading.get_ident)
+        self.assertNotEqual(hilo, threading.get_ident())
+        self.assertEqual(self.executor.stats()["rejected"], 1)
+
+        self.liberar.set()
+        await ocupada
+        await en_cola
+
+
+if __name__ == "__main__":
+    unittest.main()
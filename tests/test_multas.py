@@ -0,0 +1,87 @@
+import datetime
+import unittest
+from decimal import Decimal
+
+from tests import base_falsa
+from fastapi import HTTPException
+
+from Controllers import Multas
+from Models.Multas import Multa
+
+HOY = datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def prestamo(dias, devuelto=False):
+    """Inserta un préstamo hecho hace `dias` días y devuelve su ID."""
+    fecha = HOY - datetime.timedelta(days=dias)
+    filas = base_falsa.ejecutar(
+        "INSERT INTO prestamo (Id_matricula_estudiante, ISBN, Fecha_prestamo, Fecha_devolucion) "
+        "VALUES (1, 'L-1', ?, ?) RETURNING Id_prestamo",
+        (fecha, HOY if devuelto else None),
+    )
+    return filas[0][0]
+
+
+def montos():
+    return {id_prestamo: monto for id_prestamo, monto in base_falsa.ejecutar("SELECT Id_prestamo, Monto FROM multa")}
+
+
+class TestMultasPorAtraso(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        base_falsa.vaciar()
+        base_falsa.ejecutar("INSERT INTO estudiante (id_matricula_estudiante, Nombre_estudiante, Edad) VALUES (1, 'Ana', 20)")
+        base_falsa.ejecutar("INSERT INTO libro (ISBN, Titulo, Año_publicacion) VALUES ('L-1', 'Libro', 2000)")
+        atraso = Multas.DIAS_PRESTAMO
+        self.vencido = prestamo(atraso + 6)
+        self.con_multa_manual = prestamo(atraso + 6)
+        self.con_multa_menor = prestamo(atraso + 20)
+        self.devuelto = prestamo(atraso + 30, devuelto=True)
+        self.al_dia = prestamo(atraso - 1)
+
+    async def test_crea_solo_las_multas_que_faltan(self):
+        await Multas.crear_multa_manual(Multa(Id_prestamo=self.con_multa_manual, Monto=50))
+        await Multas.crear_multa_manual(Multa(Id_prestamo=self.con_multa_menor, Monto=0.10))
+
+        resultado = await Multas.generar_multas_por_atraso()
+
+        monto = Decimal("6") * Decimal(str(Multas.MONTO_DIARIO_ATRASO))
+        self.assertEqual(resultado, {"multas_creadas": 1, "monto_total": float(monto)})
+        self.assertEqual(montos(), {
+            self.vencido: monto,
+            # Las multas manuales no se tocan, aunque su monto sea menor que el atraso acumulado.
+            self.con_multa_manual: Decimal("50"),
+            self.con_multa_menor: Decimal("0.1"),
+        })
+
+    async def test_una_segunda_ejecucion_no_crea_nada(self):
+        await Multas.generar_multas_por_atraso()
+        antes = montos()
+        resultado = await Multas.generar_multas_por_atraso()
+        self.assertEqual(resultado, {"multas_creadas": 0, "monto_total": 0.0})
+        self.assertEqual(montos(), antes)
+
+    async def test_la_vista_previa_coincide_con_la_tarea(self):
+        await Multas.crear_multa_manual(Multa(Id_prestamo=self.con_multa_manual, Monto=50))
+
+        vista = await Multas.previsualizar_multas_por_atraso(limit=1)
+        self.assertEqual(montos(), {self.con_multa_manual: Decimal("50")})
+        resultado = await Multas.generar_multas_por_atraso()
+
+        self.assertEqual(vista["total"], resultado["multas_creadas"])
+        self.assertEqual(vista["monto_total"], resultado["monto_total"])
+        # El detalle empieza por el préstamo más antiguo y respeta `limit`.
+        self.assertEqual([fila["Id_prestamo"] for fila in vista["elementos"]], [self.con_multa_menor])
+        creadas = montos()
+        for fila in vista["elementos"]:
+            self.assertEqual(creadas[fila["Id_prestamo"]], fila["Monto"])
+
+    async def test_la_multa_manual_despues_de_la_tarea_es_conflicto(self):
+        await Multas.generar_multas_por_atraso()
+        with self.assertRaises(HTTPException) as error:
+            await Multas.crear_multa_manual(Multa(Id_prestamo=self.vencido, Monto=5))
+        self.assertEqual(error.exception.status_code, 409)
+
+
+if __name__ == "__main__":
+    unittest.main()
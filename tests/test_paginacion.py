@@ -0,0 +1,83 @@
+import unittest
+from datetime import date, datetime
+
+from tests import base_falsa
+from fastapi import HTTPException
+
+from Controllers import Multas, Prestamos
+from utils.filas import Filas
+from utils.paginacion import armar_pagina, codificar_cursor, decodificar_cursor
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_ida_y_vuelta_conserva_los_tipos(self):
+        valores = [date(2024, 2, 29), datetime(2024, 2, 29, 13, 5, 7), 42, "978-ñ", None]
+        cursor = codificar_cursor(valores)
+        self.assertEqual(decodificar_cursor(cursor, len(valores)), valores)
+        # Apto para la query string tal cual: base64 url-safe y sin relleno.
+        self.assertNotRegex(cursor, r"[+/=]")
+
+    def test_cursor_invalido_es_400(self):
+        for cursor in ("no es base64!", codificar_cursor([1]), "e30", codificar_cursor([1, 2])[:-3]):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(HTTPException) as error:
+                    decodificar_cursor(cursor, 2)
+                self.assertEqual(error.exception.status_code, 400)
+
+    def test_armar_pagina(self):
+        filas = Filas(["Id"], [(1,), (2,), (3,)])
+        pagina = armar_pagina(filas, 2, ["Id"])
+        self.assertEqual(list(pagina["elementos"]), [{"Id": 1}, {"Id": 2}])
+        self.assertEqual(decodificar_cursor(pagina["siguiente_cursor"], 1), [2])
+        self.assertIsNone(armar_pagina(filas, 3, ["Id"])["siguiente_cursor"])
+
+
+class TestRecorridoConNulos(unittest.IsolatedAsyncioTestCase):
+    """Recorre página a página listados ordenados por (fecha DESC, id DESC) con fechas repetidas y NULL."""
+
+    FECHAS = [date(2024, 1, 10), None, date(2024, 1, 12), date(2024, 1, 10), None,
+              date(2024, 1, 11), date(2024, 1, 10), None]
+
+    def setUp(self):
+        base_falsa.vaciar()
+        base_falsa.ejecutar("INSERT INTO estudiante (id_matricula_estudiante, Nombre_estudiante, Edad) VALUES (1, 'Ana', 20)")
+        base_falsa.ejecutar("INSERT INTO libro (ISBN, Titulo, Año_publicacion) VALUES ('L-1', 'Libro', 2000)")
+        self.prestamos = []
+        for fecha in self.FECHAS:
+            id_prestamo = base_falsa.ejecutar(
+                "INSERT INTO prestamo (Id_matricula_estudiante, ISBN, Fecha_prestamo) VALUES (1, 'L-1', ?) "
+                "RETURNING Id_prestamo", (fecha,)
+            )[0][0]
+            self.prestamos.append((fecha, id_prestamo))
+            base_falsa.ejecutar("INSERT INTO multa (Id_prestamo, Fecha_multa, Monto) VALUES (?, ?, 1)", (id_prestamo, fecha))
+
+    @staticmethod
+    def orden_esperado(pares):
+        # Como SQL Server: en DESC los NULL van al final.
+        con_fecha = sorted((p for p in pares if p[0] is not None), reverse=True)
+        sin_fecha = sorted((p for p in pares if p[0] is None), key=lambda p: p[1], reverse=True)
+        return con_fecha + sin_fecha
+
+    async def recorrer(self, listar, claves):
+        vistas, cursor = [], None
+        for _ in range(len(self.FECHAS) + 1):
+            pagina = await listar(limit=3, cursor=cursor)
+            vistas += [(fila[claves[0]], fila[claves[1]]) for fila in pagina["elementos"]]
+            cursor = pagina["siguiente_cursor"]
+            if cursor is None:
+                return vistas
+        self.fail("La paginación no termina")
+
+    async def test_prestamos(self):
+        vistas = await self.recorrer(Prestamos.obtener_todos_prestamos, ["Fecha_prestamo", "Id_prestamo"])
+        self.assertEqual(vistas, self.orden_esperado(self.prestamos))
+
+    async def test_multas(self):
+        multas = [(fecha, id_multa) for id_multa, fecha in base_falsa.ejecutar("SELECT Id_multa, Fecha_multa FROM multa")]
+        vistas = await self.recorrer(Multas.obtener_todas_multas, ["Fecha_multa", "Id_multa"])
+        self.assertEqual(vistas, self.orden_esperado(multas))
+
+
+if __name__ == "__main__":
+    unittest.main()
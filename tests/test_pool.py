@@ -0,0 +1,176 @@
+import unittest
+from unittest import mock
+
+from tests import base_falsa
+from benchmarks import pyodbc_falso
+from fastapi import HTTPException
+
+from utils import database
+from utils import pool as modulo_pool
+from utils.pool import ConnectionPool, PoolTimeoutError
+
+
+class ConexionCruda:
+    """Conexión pyodbc de reemplazo que cuenta commits, rollbacks y cierres."""
+
+    def __init__(self, falla_rollback=False):
+        self.commits = self.rollbacks = 0
+        self.cerrada = False
+        self.cursores = []
+        self.falla_rollback = falla_rollback
+
+    def cursor(self):
+        cursor = mock.Mock()
+        self.cursores.append(cursor)
+        return cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        if self.falla_rollback:
+            raise pyodbc_falso.Error("08S01", "Enlace de comunicación caído")
+        self.rollbacks += 1
+
+    def close(self):
+        self.cerrada = True
+
+
+class PruebaPool(unittest.TestCase):
+    """Pool sin conexiones precalentadas ni hilo de mantenimiento, sobre ConexionCruda."""
+
+    def setUp(self):
+        self.creadas = []
+        parche = mock.patch.object(modulo_pool.pyodbc, "connect", self.conectar)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.pool = ConnectionPool("falsa", name="test", min_size=0, max_size=2, reap_interval=0,
+                                   health_check_interval=3600, statement_cache_size=2)
+        self.pool.open()
+        self.addCleanup(self.pool.close)
+
+    def conectar(self, *args, **kwargs):
+        conexion = ConexionCruda()
+        self.creadas.append(conexion)
+        return conexion
+
+
+class TestDevolucion(PruebaPool):
+
+    def test_una_lectura_no_hace_rollback(self):
+        conn = self.pool.acquire()
+        conn.close()
+        self.assertEqual(self.creadas[0].rollbacks, 0)
+        self.assertEqual(self.pool.stats()["rollbacks_on_release"], 0)
+
+    def test_sin_commit_hace_rollback_una_vez(self):
+        conn = self.pool.acquire()
+        conn.mark_dirty()
+        conn.close()
+        # La misma conexión vuelve limpia: la siguiente lectura no repite el rollback.
+        otra = self.pool.acquire()
+        self.assertIs(otra, conn)
+        otra.close()
+        self.assertEqual(self.creadas[0].rollbacks, 1)
+        self.assertEqual(self.pool.stats()["rollbacks_on_release"], 1)
+
+    def test_commit_o_rollback_limpian(self):
+        conn = self.pool.acquire()
+        conn.mark_dirty()
+        conn.commit()
+        conn.mark_dirty()
+        conn.rollback()
+        conn.close()
+        self.assertEqual((self.creadas[0].commits, self.creadas[0].rollbacks), (1, 1))
+        self.assertEqual(self.pool.stats()["rollbacks_on_release"], 0)
+
+    def test_rollback_fallido_descarta_la_conexion(self):
+        conn = self.pool.acquire()
+        self.creadas[0].falla_rollback = True
+        conn.mark_dirty()
+        conn.close()
+        self.assertTrue(self.creadas[0].cerrada)
+        self.assertIsNot(self.pool.acquire(), conn)
+        stats = self.pool.stats()
+        self.assertEqual((stats["discarded_broken"], stats["connections_created"]), (1, 2))
+
+    def test_rota_no_vuelve_ni_hace_rollback(self):
+        conn = self.pool.acquire()
+        conn.mark_dirty()
+        conn.mark_broken()
+        conn.close()
+        self.assertEqual(self.creadas[0].rollbacks, 0)
+        self.assertTrue(self.creadas[0].cerrada)
+        self.assertEqual(self.pool.stats()["size"], 0)
+
+    def test_vencida_se_cierra_al_devolverla(self):
+        self.pool.max_lifetime = 0.001
+        conn = self.pool.acquire()
+        conn.created_at -= 1
+        conn.close()
+        self.assertTrue(self.creadas[0].cerrada)
+        self.assertEqual(self.pool.stats()["expired"], 1)
+
+
+class TestCapacidad(PruebaPool):
+
+    def test_sin_lugar_espera_y_se_agota(self):
+        tomadas = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.acquire(timeout=0.05)
+        tomadas[0].close()
+        # La devuelta se reutiliza (la más reciente primero) sin abrir otra.
+        self.assertIs(self.pool.acquire(timeout=0.05), tomadas[0])
+        stats = self.pool.stats()
+        self.assertEqual((stats["timeouts"], stats["connections_created"], stats["in_use"]), (1, 2, 2))
+
+    def test_cursores_de_sentencia_lru(self):
+        conn = self.pool.acquire()
+        uno = conn.statement_cursor("SELECT 1")
+        conn.statement_cursor("SELECT 2")
+        self.assertIs(conn.statement_cursor("SELECT 1"), uno)
+        conn.statement_cursor("SELECT 3")
+        # Con lugar para dos, se cierra el menos usado recientemente ("SELECT 2").
+        cerrados = [cursor for cursor in self.creadas[0].cursores if cursor.close.called]
+        self.assertEqual(len(cerrados), 1)
+        self.assertIsNot(conn.statement_cursor("SELECT 2"), cerrados[0])
+        stats = self.pool.stats()
+        self.assertEqual((stats["statement_cursor_hits"], stats["statement_cursor_misses"]), (1, 4))
+
+
+class TestRollbackDesdeDatabase(unittest.IsolatedAsyncioTestCase):
+    """Qué operaciones de utils/database.py dejan la conexión para rollback (sobre pyodbc_falso)."""
+
+    def setUp(self):
+        base_falsa.vaciar()
+        base_falsa.ejecutar("INSERT INTO autor (Id_autor, Nombre_autor) VALUES (1, 'Borges')")
+
+    def rollbacks(self):
+        return database.pool.stats()["rollbacks_on_release"]
+
+    async def test_lecturas_y_escrituras_confirmadas_no_hacen_rollback(self):
+        antes = self.rollbacks()
+        await database.execute_query("SELECT [Nombre_autor] FROM [biblioteca].[autor]")
+        await database.execute_query("UPDATE [biblioteca].[autor] SET [Nombre_autor] = 'J. L. Borges'", needs_commit=True)
+        async with database.transaction() as tx:
+            await tx.execute("SELECT [Nombre_autor] FROM [biblioteca].[autor]")
+        self.assertEqual(self.rollbacks(), antes)
+
+    async def test_transaccion_fallida_hace_rollback(self):
+        antes = self.rollbacks()
+        with self.assertRaises(HTTPException):
+            async with database.transaction() as tx:
+                await tx.execute("UPDATE [biblioteca].[autor] SET [Nombre_autor] = 'Otro'")
+                raise HTTPException(status_code=400)
+        self.assertEqual(self.rollbacks(), antes + 1)
+        self.assertEqual(base_falsa.ejecutar("SELECT Nombre_autor FROM autor"), [("Borges",)])
+
+    async def test_escritura_sin_commit_se_deshace(self):
+        antes = self.rollbacks()
+        await database.execute_query("UPDATE [biblioteca].[autor] SET [Nombre_autor] = 'Otro'")
+        self.assertEqual(self.rollbacks(), antes + 1)
+        self.assertEqual(base_falsa.ejecutar("SELECT Nombre_autor FROM autor"), [("Borges",)])
+
+
+if __name__ == "__main__":
+    unittest.main()
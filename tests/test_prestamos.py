@@ -0,0 +1,190 @@
+import asyncio
+import unittest
+from datetime import date
+from unittest import mock
+
+from tests import base_falsa
+from benchmarks import pyodbc_falso
+from fastapi import HTTPException
+
+from Controllers import Prestamos
+from Models.Prestamos import Prestamo
+from utils.contadores import IndiceContadores
+
+LIMITE = Prestamos.LIMITE_PRESTAMOS_ACTIVOS
+
+
+def activos(id_estudiante):
+    filas = base_falsa.ejecutar(
+        "SELECT COUNT(*) FROM prestamo WHERE Id_matricula_estudiante = ? AND Fecha_devolucion IS NULL",
+        (id_estudiante,),
+    )
+    return filas[0][0]
+
+
+def prestamos_sin_app(id_estudiante, cantidad):
+    """Préstamos activos insertados por fuera de la aplicación (otro proceso)."""
+    for _ in range(cantidad):
+        base_falsa.ejecutar(
+            "INSERT INTO prestamo (Id_matricula_estudiante, ISBN, Fecha_prestamo) VALUES (?, 'L-1', date('now'))",
+            (id_estudiante,),
+        )
+
+
+class PruebaPrestamos(unittest.IsolatedAsyncioTestCase):
+    """Base con estudiantes 1 a 3 y libros L-1 a L-3, y un índice de préstamos activos nuevo por prueba."""
+
+    cargar_indice = True
+
+    async def asyncSetUp(self):
+        base_falsa.vaciar()
+        for n in (1, 2, 3):
+            base_falsa.ejecutar(
+                "INSERT INTO estudiante (id_matricula_estudiante, Nombre_estudiante, Edad) VALUES (?, 'Ana', 20)", (n,)
+            )
+            base_falsa.ejecutar("INSERT INTO libro (ISBN, Titulo, Año_publicacion) VALUES (?, 'Libro', 2000)", (f"L-{n}",))
+        self.indice = IndiceContadores("test_prestamos_activos", Prestamos._cargar_prestamos_activos)
+        parche = mock.patch.object(Prestamos, "prestamos_activos", self.indice)
+        parche.start()
+        self.addCleanup(parche.stop)
+        if self.cargar_indice:
+            await self.indice.reconciliar()
+
+    def consultas(self):
+        return pyodbc_falso.contadores["consultas"]
+
+
+class TestCrearPrestamo(PruebaPrestamos):
+
+    async def test_el_indice_rechaza_sin_ir_a_la_base(self):
+        for _ in range(LIMITE):
+            await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=1, ISBN="L-1"))
+        self.assertEqual(self.indice.get(1), LIMITE)
+
+        antes = self.consultas()
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=1, ISBN="L-1"))
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(self.consultas(), antes)
+        self.assertEqual(activos(1), LIMITE)
+
+    async def test_simultaneos_no_superan_el_limite(self):
+        resultados = await asyncio.gather(
+            *(Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=2, ISBN="L-2")) for _ in range(LIMITE * 3)),
+            return_exceptions=True
+        )
+        self.assertEqual(sum(not isinstance(r, Exception) for r in resultados), LIMITE)
+        self.assertEqual(activos(2), LIMITE)
+        self.assertEqual(self.indice.get(2), LIMITE)
+
+    async def test_un_error_devuelve_la_reserva(self):
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=99, ISBN="L-1"))
+        self.assertEqual(error.exception.status_code, 404)
+        with self.assertRaises(HTTPException):
+            await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=1, ISBN="NO-EXISTE"))
+        self.assertEqual(self.indice.get(1), 0)
+        self.assertEqual(self.indice.stats()["en_curso"], 0)
+
+    async def test_la_devolucion_libera_el_lugar(self):
+        ids = [
+            (await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=1, ISBN="L-1")))["Id_prestamo"]
+            for _ in range(LIMITE)
+        ]
+        await Prestamos.registrar_devolucion(ids[0], date.today())
+        self.assertEqual(self.indice.get(1), LIMITE - 1)
+        await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=1, ISBN="L-1"))
+        self.assertEqual(activos(1), LIMITE)
+
+
+class TestCrearPrestamoSinIndice(PruebaPrestamos):
+    """Antes de la primera carga del índice, el límite lo decide la tabla."""
+
+    cargar_indice = False
+
+    async def test_la_tabla_decide_mientras_el_indice_no_carga(self):
+        prestamos_sin_app(3, LIMITE)
+        self.assertEqual(self.indice.desconocidas([3]), [3])
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=3, ISBN="L-3"))
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(activos(3), LIMITE)
+
+        # Una vez cargado, el índice ya conoce al estudiante y rechaza él mismo.
+        await self.indice.reconciliar()
+        antes = self.consultas()
+        with self.assertRaises(HTTPException):
+            await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=3, ISBN="L-3"))
+        self.assertEqual(self.consultas(), antes)
+
+
+def lote(*pares):
+    return [Prestamo(Id_matricula_estudiante=estudiante, ISBN=isbn) for estudiante, isbn in pares]
+
+
+class TestCrearPrestamosLote(PruebaPrestamos):
+
+    async def test_crea_todo_con_consultas_fijas(self):
+        consultas = []
+        for pares in ([(1, "L-1")], [(2, "L-1"), (2, "L-2"), (3, "L-3")]):
+            antes = self.consultas()
+            creados = await Prestamos.crear_prestamos_lote(lote(*pares))
+            consultas.append(self.consultas() - antes)
+            self.assertEqual([(p["Id_matricula_estudiante"], p["ISBN"]) for p in creados], list(pares))
+        # El número de consultas no depende del tamaño del lote.
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual((self.indice.get(1), self.indice.get(2), self.indice.get(3)), (1, 2, 1))
+
+    async def test_el_limite_suma_los_prestamos_del_lote(self):
+        await Prestamos.crear_prestamo(Prestamo(Id_matricula_estudiante=1, ISBN="L-1"))
+        pares = [(2, "L-2")] + [(1, "L-1")] * LIMITE
+
+        antes = self.consultas()
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamos_lote(lote(*pares))
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertIn("[1]", error.exception.detail)
+        # Lo rechaza el índice, sin ir a la base, y no se crea ninguno (tampoco el del estudiante 2).
+        self.assertEqual(self.consultas(), antes)
+        self.assertEqual((activos(1), activos(2)), (1, 0))
+        self.assertEqual((self.indice.get(1), self.indice.get(2)), (1, 0))
+
+        await Prestamos.crear_prestamos_lote(lote(*pares[:LIMITE]))
+        self.assertEqual((activos(1), activos(2)), (LIMITE, 1))
+
+    async def test_un_error_no_crea_nada_y_devuelve_las_reservas(self):
+        for pares, estado in (([(1, "L-1"), (1, "NO-EXISTE")], 404), ([(1, "L-1"), (99, "L-1")], 404)):
+            with self.assertRaises(HTTPException) as error:
+                await Prestamos.crear_prestamos_lote(lote(*pares))
+            self.assertEqual(error.exception.status_code, estado)
+        self.assertEqual(activos(1), 0)
+        self.assertEqual(self.indice.get(1), 0)
+        self.assertEqual(self.indice.stats()["en_curso"], 0)
+
+    async def test_tamano_del_lote(self):
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamos_lote([])
+        self.assertEqual(error.exception.status_code, 400)
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamos_lote(lote(*[(1, "L-1")] * (Prestamos.MAXIMO_LOTE_PRESTAMOS + 1)))
+        self.assertEqual(error.exception.status_code, 413)
+
+
+class TestCrearPrestamosLoteSinIndice(PruebaPrestamos):
+    """Antes de la primera carga del índice, el lote se cuenta contra la tabla."""
+
+    cargar_indice = False
+
+    async def test_la_tabla_decide_por_los_desconocidos(self):
+        prestamos_sin_app(3, LIMITE - 1)
+        with self.assertRaises(HTTPException) as error:
+            await Prestamos.crear_prestamos_lote(lote((3, "L-1"), (3, "L-2")))
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(activos(3), LIMITE - 1)
+
+        await Prestamos.crear_prestamos_lote(lote((3, "L-1")))
+        self.assertEqual(activos(3), LIMITE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,285 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from itertools import islice
+from typing import Optional
+
+# Registro de todos los índices de búsqueda creados, para exponer sus estadísticas.
+indices = {}
+
+# Fracción mínima de los trigramas de la consulta que un texto debe contener para ser resultado.
+COBERTURA_MINIMA = 0.5
+
+# Máximo de documentos que puntúa una búsqueda (acota el trabajo de las consultas poco selectivas).
+MAXIMO_CANDIDATOS = 2000
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto: str) -> str:
+    """
+    Minúsculas, sin tildes ni diéresis (á -> a, ü -> u, ñ -> n) y con cualquier
+    signo o espacio repetido reducido a un solo espacio.
+    """
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    sin_marcas = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_marcas).strip()
+
+
+def trigramas(texto: str) -> frozenset:
+    """Trigramas de cada palabra del texto normalizado (con relleno, así las palabras cortas también tienen)."""
+    resultado = set()
+    for palabra in normalizar(texto).split():
+        relleno = f"  {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return frozenset(resultado)
+
+
+def _puntaje(coincidencias: int, total: int, tamano: int) -> float:
+    """0.75 por la cobertura de los `total` trigramas de la consulta y 0.25 por el coeficiente de Dice."""
+    return 0.75 * coincidencias / total + 0.5 * coincidencias / (total + tamano)
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas en memoria para búsqueda aproximada de texto
+    (títulos, nombres): tolera tildes, mayúsculas, palabras incompletas y
+    errores de tipeo menores, y no consulta la base de datos.
+
+    Cada documento es una clave con un texto y datos asociados (lo que se
+    devuelve en los resultados). `cargar` reemplaza todo el contenido de una
+    vez; `poner` y `quitar` lo mantienen al día documento por documento.
+
+    El puntaje combina qué parte de los trigramas de la consulta aparece en el
+    texto (cobertura) y cuánto se parecen en tamaño (coeficiente de Dice), así
+    que ante la misma cobertura gana el texto más corto.
+
+    Args:
+        name (str): Nombre del índice (para estadísticas).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._documentos = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "updates": 0, "loads": 0}
+        indices[name] = self
+
+    @property
+    def cargado(self) -> bool:
+        return self._stats["loads"] > 0
+
+    def cargar(self, documentos):
+        """Reemplaza el contenido por `documentos`, una secuencia de (clave, texto, datos)."""
+        nuevos, postings = {}, {}
+        for clave, texto, datos in documentos:
+            gramas = trigramas(texto or "")
+            nuevos[clave] = (gramas, datos)
+            for grama in gramas:
+                postings.setdefault(grama, set()).add(clave)
+        with self._lock:
+            self._documentos, self._postings = nuevos, postings
+            self._stats["loads"] += 1
+
+    def poner(self, clave, texto, datos):
+        """Agrega el documento `clave`, o lo reemplaza si ya existía."""
+        gramas = trigramas(texto or "")
+        with self._lock:
+            self._quitar(clave)
+            self._documentos[clave] = (gramas, datos)
+            for grama in gramas:
+                self._postings.setdefault(grama, set()).add(clave)
+            self._stats["updates"] += 1
+
+    def quitar(self, clave):
+        """Elimina el documento `clave` (si existe)."""
+        with self._lock:
+            self._quitar(clave)
+            self._stats["updates"] += 1
+
+    def _quitar(self, clave):
+        anterior = self._documentos.pop(clave, None)
+        if anterior is None:
+            return
+        for grama in anterior[0]:
+            claves = self._postings.get(grama)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._postings[grama]
+
+    def datos(self, clave):
+        """Datos del documento `clave`, o None si no está."""
+        with self._lock:
+            documento = self._documentos.get(clave)
+        return None if documento is None else documento[1]
+
+    def puntuar(self, gramas_consulta: frozenset, limite: Optional[int] = None) -> dict:
+        """
+        Puntaje (0 a 1] de los documentos que cubren al menos COBERTURA_MINIMA de la
+        consulta: 0.75 por la cobertura y 0.25 por el coeficiente de Dice. Sin
+        redondear: quien lo muestra lo redondea solo para los resultados que devuelve.
+
+        Recorre los trigramas de la consulta del menos al más frecuente y puntúa
+        entero cada documento que aparece por primera vez. Uno que no apareció en
+        los primeros i trigramas comparte a lo sumo los restantes, así que la
+        búsqueda termina cuando eso ya no alcanza la cobertura mínima o, con
+        `limite`, el puntaje del resultado número `limite`: entonces devuelve solo
+        los que llegan a ese puntaje (los empates incluidos). Se puntúan como mucho
+        MAXIMO_CANDIDATOS documentos: en una consulta que coincide con casi todo el
+        índice (una palabra muy común), el resultado es aproximado.
+        """
+        if not gramas_consulta:
+            return {}
+        total = len(gramas_consulta)
+        minimo = COBERTURA_MINIMA * total
+        # `mejores`: montículo con los `limite` mejores puntajes; `umbral`, el peor de ellos
+        # una vez completo (0 mientras tanto: todos los puntajes son mayores).
+        puntajes, vistos, mejores, umbral = {}, set(), [], 0.0
+        with self._lock:
+            self._stats["searches"] += 1
+            documentos = self._documentos
+            listas = sorted((self._postings.get(grama, frozenset()) for grama in gramas_consulta), key=len)
+            for restantes, claves in zip(range(total, 0, -1), listas):
+                # Un documento que todavía no apareció tiene a lo sumo `restantes` trigramas en común.
+                if restantes < minimo or _puntaje(restantes, total, restantes) < umbral:
+                    break
+                nuevos = list(islice(claves - vistos, MAXIMO_CANDIDATOS - len(vistos)))
+                vistos.update(nuevos)
+                for clave in nuevos:
+                    gramas = documentos[clave][0]
+                    # Con su tamaño ya se sabe si podría llegar al umbral, antes de contar.
+                    if _puntaje(min(restantes, len(gramas)), total, len(gramas)) < umbral:
+                        continue
+                    n = len(gramas_consulta & gramas)
+                    if n < minimo:
+                        continue
+                    puntaje = puntajes[clave] = _puntaje(n, total, len(gramas))
+                    if not limite:
+                        continue
+                    if len(mejores) < limite:
+                        heapq.heappush(mejores, puntaje)
+                    elif puntaje > mejores[0]:
+                        heapq.heapreplace(mejores, puntaje)
+                    if len(mejores) == limite:
+                        umbral = mejores[0]
+                if len(vistos) >= MAXIMO_CANDIDATOS:
+                    break
+        if umbral:
+            return {clave: puntaje for clave, puntaje in puntajes.items() if puntaje >= umbral}
+        return puntajes
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({"name": self.name, "documentos": len(self._documentos), "trigramas": len(self._postings)})
+        return data
+
+
+class IndicePrefijos:
+    """
+    Índice en memoria para buscar por el comienzo de un texto (por ejemplo, un
+    nombre mientras se escribe), sin distinguir tildes ni mayúsculas y sin
+    consultar la base de datos.
+
+    Guarda una lista ordenada con el texto normalizado a partir de cada una de
+    sus palabras ("juan perez" y "perez"), así "per" encuentra a "Juan Pérez".
+    Buscar es una búsqueda binaria más recorrer solo las entradas que
+    coinciden. `cargar` reemplaza todo el contenido de una vez; `poner` y
+    `quitar` lo mantienen al día documento por documento.
+
+    Args:
+        name (str): Nombre del índice (para estadísticas).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._entradas = []
+        self._documentos = {}
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "updates": 0, "loads": 0}
+        indices[name] = self
+
+    @property
+    def cargado(self) -> bool:
+        return self._stats["loads"] > 0
+
+    @staticmethod
+    def _sufijos(texto):
+        palabras = normalizar(texto or "").split()
+        return [" ".join(palabras[i:]) for i in range(len(palabras))]
+
+    def cargar(self, documentos):
+        """Reemplaza el contenido por `documentos`, una secuencia de (clave, texto, datos)."""
+        nuevos, entradas = {}, []
+        for clave, texto, datos in documentos:
+            sufijos = self._sufijos(texto)
+            nuevos[clave] = (sufijos, datos)
+            entradas.extend((sufijo, clave) for sufijo in sufijos)
+        entradas.sort()
+        with self._lock:
+            self._documentos, self._entradas = nuevos, entradas
+            self._stats["loads"] += 1
+
+    def poner(self, clave, texto, datos):
+        """Agrega el documento `clave`, o lo reemplaza si ya existía."""
+        sufijos = self._sufijos(texto)
+        with self._lock:
+            self._quitar(clave)
+            self._documentos[clave] = (sufijos, datos)
+            for sufijo in sufijos:
+                bisect.insort(self._entradas, (sufijo, clave))
+            self._stats["updates"] += 1
+
+    def quitar(self, clave):
+        """Elimina el documento `clave` (si existe)."""
+        with self._lock:
+            self._quitar(clave)
+            self._stats["updates"] += 1
+
+    def _quitar(self, clave):
+        anterior = self._documentos.pop(clave, None)
+        if anterior is None:
+            return
+        for sufijo in anterior[0]:
+            posicion = bisect.bisect_left(self._entradas, (sufijo, clave))
+            if posicion < len(self._entradas) and self._entradas[posicion] == (sufijo, clave):
+                del self._entradas[posicion]
+
+    def datos(self, clave):
+        """Datos del documento `clave`, o None si no está."""
+        with self._lock:
+            documento = self._documentos.get(clave)
+        return None if documento is None else documento[1]
+
+    def buscar(self, prefijo: str, limit: int) -> list:
+        """Hasta `limit` claves cuyo texto tiene alguna palabra desde la que empieza con `prefijo`."""
+        prefijo = normalizar(prefijo)
+        if not prefijo:
+            return []
+        claves = {}
+        with self._lock:
+            self._stats["searches"] += 1
+            entradas = self._entradas
+            for posicion in range(bisect.bisect_left(entradas, (prefijo,)), len(entradas)):
+                sufijo, clave = entradas[posicion]
+                if not sufijo.startswith(prefijo) or len(claves) >= limit:
+                    break
+                claves[clave] = None
+        return list(claves)
+
+    def coincide(self, clave, prefijo: str) -> bool:
+        """True si el documento `clave` se encontraría buscando `prefijo`."""
+        prefijo = normalizar(prefijo)
+        with self._lock:
+            documento = self._documentos.get(clave)
+        return documento is not None and bool(prefijo) and any(sufijo.startswith(prefijo) for sufijo in documento[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({"name": self.name, "documentos": len(self._documentos), "entradas": len(self._entradas)})
+        return data
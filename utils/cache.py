@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Valores por defecto de las cachés de entidades; se pueden ajustar por variables de entorno.
+CACHE_TTL = float(os.getenv("CACHE_TTL_SEGUNDOS", "60"))
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "10000"))
+
+# Valor centinela para distinguir "no está en caché" de un valor guardado.
+MISS = object()
+
+# Registro de todas las cachés creadas, para exponer sus estadísticas.
+caches = {}
+
+
+class TTLCache:
+    """
+    Caché en memoria con tamaño acotado, expiración por TTL y desalojo LRU.
+
+    Los valores son filas (diccionarios planos); se guarda y se entrega una
+    copia para que quien la reciba pueda modificarla sin alterar la caché.
+
+    Para evitar repoblar la caché con datos viejos cuando una escritura ocurre
+    mientras se leía de la base de datos, la lectura toma una `marca()` antes
+    de consultar y la pasa a `set()`: si hubo alguna invalidación entre medio,
+    el valor se descarta.
+
+    Args:
+        name (str): Nombre de la caché (para estadísticas).
+        maxsize (int): Máximo de entradas antes de desalojar la menos usada.
+        ttl (float): Segundos de validez de cada entrada.
+    """
+
+    def __init__(self, name, maxsize=CACHE_MAX_ENTRADAS, ttl=CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "stale_skips": 0}
+        caches[name] = self
+
+    def get(self, key):
+        """Devuelve una copia del valor guardado, o MISS si no está o ya expiró."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return MISS
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return MISS
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+        return copiar(value)
+
+    def marca(self):
+        """Marca a pasar a `set()` para detectar invalidaciones ocurridas durante la lectura."""
+        with self._lock:
+            return self._epoch
+
+    def set(self, key, value, marca=None):
+        """Guarda una copia del valor, salvo que haya habido una invalidación desde `marca`."""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if marca is not None and marca != self._epoch:
+                self._stats["stale_skips"] += 1
+                return
+            self._data[key] = (time.monotonic() + self.ttl, copiar(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key):
+        """Elimina una entrada (si existe) e invalida las lecturas en curso."""
+        with self._lock:
+            self._epoch += 1
+            self._stats["invalidations"] += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({"name": self.name, "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl})
+        consultas = data["hits"] + data["misses"]
+        data["hit_ratio"] = data["hits"] / consultas if consultas else 0.0
+        return data
+
+
+def copiar(value):
+    """Copia superficial de una fila o de una lista de filas."""
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [copiar(v) for v in value]
+    return value
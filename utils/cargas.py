@@ -0,0 +1,43 @@
+import os
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+# Límites de las cargas masivas; se pueden ajustar por variables de entorno.
+# El tamaño de lote se mantiene por debajo de los 2100 parámetros por sentencia de SQL Server.
+MAXIMO_FILAS_CARGA = int(os.getenv("CARGA_MAXIMO_FILAS", "10000"))
+TAMANO_LOTE_CARGA = min(int(os.getenv("CARGA_TAMANO_LOTE", "1000")), 2000)
+
+
+def describir_error_validacion(error: ValidationError) -> str:
+    """Resume los errores de pydantic en una línea: "campo: mensaje; campo: mensaje"."""
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'fila'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def validar_filas(filas, modelo):
+    """
+    Valida cada fila del payload contra el modelo.
+
+    Returns:
+        tuple: (validas, errores), donde `validas` es una lista de pares
+        (índice, instancia del modelo) y `errores` una lista de diccionarios
+        {"fila", "detalle"} listos para la respuesta.
+    """
+    if len(filas) > MAXIMO_FILAS_CARGA:
+        raise HTTPException(status_code=413, detail=f"La carga admite como máximo {MAXIMO_FILAS_CARGA} filas")
+    validas = []
+    errores = []
+    for indice, fila in enumerate(filas):
+        try:
+            validas.append((indice, modelo.model_validate(fila)))
+        except ValidationError as e:
+            errores.append({"fila": indice, "detalle": describir_error_validacion(e)})
+    return validas, errores
+
+
+def en_lotes(elementos, tamano=TAMANO_LOTE_CARGA):
+    """Divide una lista en sublistas consecutivas de a lo sumo `tamano` elementos."""
+    for inicio in range(0, len(elementos), tamano):
+        yield elementos[inicio:inicio + tamano]
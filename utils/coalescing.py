@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import threading
+
+from utils.cache import copiar
+
+# Registro de todos los grupos creados, para exponer sus estadísticas.
+grupos = {}
+
+
+class SingleFlight:
+    """
+    Agrupa lecturas idénticas concurrentes: mientras una llamada con la misma
+    función y los mismos argumentos está en curso, las demás esperan ese mismo
+    resultado en lugar de repetir la consulta.
+
+    No hay ventana de datos viejos: una llamada solo se comparte mientras está
+    en curso, y las escrituras llaman a `clear()` después del commit para que
+    las lecturas que lleguen desde ese momento no se unan a una consulta que
+    empezó antes de la escritura.
+
+    La consulta compartida corre en su propia tarea, así que si se cancela la
+    solicitud que la inició (por ejemplo, porque el cliente se desconectó) las
+    demás siguen esperando el resultado normalmente. Cada llamador recibe su
+    propia copia del resultado.
+
+    Se usa como decorador de funciones asíncronas:
+
+        vuelos_libros = SingleFlight("libros")
+
+        @vuelos_libros
+        async def obtener_libro(isbn): ...
+
+    Args:
+        name (str): Nombre del grupo (para estadísticas).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "flights": 0, "shared": 0, "clears": 0}
+        grupos[name] = self
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            return await self.do(key, func, *args, **kwargs)
+        return wrapper
+
+    async def do(self, key, func, *args, **kwargs):
+        """Ejecuta `func(*args, **kwargs)` o se une a la ejecución en curso con la misma clave."""
+        with self._lock:
+            self._stats["calls"] += 1
+            task = self._inflight.get(key)
+            if task is None:
+                self._stats["flights"] += 1
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                self._inflight[key] = task
+                task.add_done_callback(functools.partial(self._terminar, key))
+            else:
+                self._stats["shared"] += 1
+        return copiar(await asyncio.shield(task))
+
+    def _terminar(self, key, task):
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        # Marca la excepción como recuperada aunque ningún llamador siga esperando.
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self):
+        """Desvincula las llamadas en curso: las siguientes lecturas consultan de nuevo."""
+        with self._lock:
+            self._stats["clears"] += 1
+            self._inflight.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({"name": self.name, "in_flight": len(self._inflight)})
+        data["shared_ratio"] = data["shared"] / data["calls"] if data["calls"] else 0.0
+        return data
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Registro de todos los índices creados, para exponer sus estadísticas.
+contadores = {}
+
+
+class IndiceContadores:
+    """
+    Conteo por clave (por ejemplo, préstamos activos por estudiante) mantenido
+    en memoria: se carga una vez desde la base de datos, los controladores lo
+    ajustan en cada escritura y se reconcilia periódicamente contra la tabla.
+    Consultarlo es una búsqueda en un diccionario, sin ir a la base de datos.
+
+    Cada escritura avisa antes de empezar (`reservar` o `anunciar`) y al
+    terminar (`terminar`, con el ajuste que corresponda si hizo commit). Una
+    reconciliación no pisa las claves con escrituras en curso ni las que se
+    tocaron mientras leía la tabla: en esas el valor en memoria es el correcto
+    (o el más conservador) y se corrigen en la reconciliación siguiente.
+
+    Antes de la primera carga, y para las claves que se tocaron durante ella,
+    el valor es desconocido: `get` devuelve None, `reservar` no rechaza nada y
+    `desconocidas` las informa para que quien escribe decida contra la tabla.
+    Solo refleja las escrituras de este proceso hasta la próxima reconciliación.
+
+    Args:
+        name (str): Nombre del índice (para estadísticas).
+        cargar: Función asíncrona sin argumentos que devuelve {clave: cantidad} desde la tabla.
+    """
+
+    def __init__(self, name, cargar):
+        self.name = name
+        self._cargar = cargar
+        self._valores = None
+        self._desconocidas = set()
+        self._en_curso = {}
+        # Claves tocadas durante cada reconciliación en curso (puede haber más de una).
+        self._ventanas = []
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "rejected": 0, "reconciliations": 0, "corrections": 0, "errors": 0}
+        contadores[name] = self
+
+    @property
+    def cargado(self) -> bool:
+        return self._valores is not None
+
+    def _conocida(self, clave) -> bool:
+        return self._valores is not None and clave not in self._desconocidas
+
+    def get(self, clave):
+        """Cantidad actual para `clave`, o None si todavía no se conoce."""
+        with self._lock:
+            if not self._conocida(clave):
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return self._valores.get(clave, 0)
+
+    def reservar(self, cantidades: dict, limite: int) -> list:
+        """
+        Suma `cantidades` ({clave: n}) si ninguna clave conocida supera `limite`
+        con ellas, y deja las claves como escritura en curso. Es todo o nada:
+        devuelve las claves que lo superarían (sin reservar nada) o una lista vacía.
+        """
+        with self._lock:
+            excedidas = [
+                clave for clave, cantidad in cantidades.items()
+                if self._conocida(clave) and self._valores.get(clave, 0) + cantidad > limite
+            ]
+            if excedidas:
+                self._stats["rejected"] += 1
+                return excedidas
+            self._ajustar(cantidades)
+            self._marcar_en_curso(cantidades)
+            return []
+
+    def anunciar(self, claves):
+        """Marca `claves` como escritura en curso, sin cambiar su valor (el ajuste va en `terminar`)."""
+        with self._lock:
+            self._marcar_en_curso(claves)
+
+    def desconocidas(self, claves) -> list:
+        """
+        Las `claves` cuyo valor todavía no se conoce. Con una escritura en curso sobre
+        una clave, la respuesta no cambia hasta `terminar`: la reconciliación no la toca.
+        """
+        with self._lock:
+            return [clave for clave in claves if not self._conocida(clave)]
+
+    def terminar(self, claves, ajuste: dict = None):
+        """Cierra la escritura en curso de `claves`, aplicando antes `ajuste` ({clave: delta}) si lo hay."""
+        with self._lock:
+            if ajuste:
+                self._ajustar(ajuste)
+            for clave in claves:
+                restantes = self._en_curso.get(clave, 0) - 1
+                if restantes > 0:
+                    self._en_curso[clave] = restantes
+                else:
+                    self._en_curso.pop(clave, None)
+                for tocadas in self._ventanas:
+                    tocadas.add(clave)
+
+    def _marcar_en_curso(self, claves):
+        for clave in claves:
+            self._en_curso[clave] = self._en_curso.get(clave, 0) + 1
+            for tocadas in self._ventanas:
+                tocadas.add(clave)
+
+    def _ajustar(self, deltas):
+        # Solo se ajustan las claves conocidas; las desconocidas se resuelven al reconciliar.
+        for clave, delta in deltas.items():
+            if self._conocida(clave):
+                valor = self._valores.get(clave, 0) + delta
+                if valor > 0:
+                    self._valores[clave] = valor
+                else:
+                    self._valores.pop(clave, None)
+
+    async def reconciliar(self):
+        """Vuelve a leer la tabla y corrige las claves sin escrituras en curso ni recientes."""
+        tocadas = set()
+        with self._lock:
+            self._ventanas.append(tocadas)
+        try:
+            leidos = await self._cargar()
+        except BaseException:
+            with self._lock:
+                self._ventanas.remove(tocadas)
+            raise
+        # Se cierra la ventana y se aplica lo leído sin soltar el lock: una escritura que
+        # terminara entre medio no quedaría en `tocadas` y se pisaría con el valor viejo.
+        with self._lock:
+            self._ventanas.remove(tocadas)
+            respetar = tocadas | set(self._en_curso)
+            if self._valores is None:
+                # Primera carga: lo tocado mientras se leía queda desconocido hasta la próxima.
+                self._valores = {clave: n for clave, n in leidos.items() if n > 0 and clave not in respetar}
+                self._desconocidas = set(respetar)
+            else:
+                correcciones = 0
+                for clave in set(self._valores) | set(leidos) | self._desconocidas:
+                    if clave in respetar:
+                        continue
+                    nuevo = leidos.get(clave, 0)
+                    if clave not in self._desconocidas and self._valores.get(clave, 0) != nuevo:
+                        correcciones += 1
+                    if nuevo > 0:
+                        self._valores[clave] = nuevo
+                    else:
+                        self._valores.pop(clave, None)
+                self._desconocidas &= respetar
+                self._stats["corrections"] += correcciones
+                if correcciones:
+                    logger.warning(f"Índice {self.name}: {correcciones} claves corregidas al reconciliar")
+            self._stats["reconciliations"] += 1
+
+    async def reconciliar_periodicamente(self, intervalo: float):
+        """Carga el índice al iniciar y lo reconcilia cada `intervalo` segundos (hasta ser cancelado)."""
+        while True:
+            try:
+                await self.reconciliar()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                logger.error(f"No se pudo reconciliar el índice {self.name}: {e}")
+            await asyncio.sleep(intervalo)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                "name": self.name,
+                "cargado": self._valores is not None,
+                "claves": len(self._valores or {}),
+                "desconocidas": len(self._desconocidas),
+                "en_curso": len(self._en_curso),
+            })
+        return data
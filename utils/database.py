@@ -4,6 +4,14 @@ import pyodbc
 import logging
 import json
 import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from utils.pool import ConnectionPool, PoolTimeoutError, es_error_de_conexion
+from utils.executor import DatabaseExecutor, ExecutorSaturatedError
+from utils.filas import Filas
+from utils.metricas import adquisicion_conexiones, duracion_consultas, filas_consultas, nombre_consulta
+from utils.tiempos import medir, registrar_consulta
 
 # Carga las variables de entorno desde el archivo .env para la configuración de la base de datos.
 load_dotenv()
@@ -22,33 +30,223 @@ password: str = os.getenv("SQL_PASSWORD")
 # Construcción de la cadena de conexión para pyodbc.
 connection_string = f"DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}"
 
-async def get_db_connection():
+# Pool de conexiones compartido por todas las consultas. Los tamaños y tiempos
+# (en segundos) se pueden ajustar por variables de entorno.
+pool = ConnectionPool(
+    connection_string,
+    name="biblioteca",
+    min_size=int(os.getenv("SQL_POOL_MIN_SIZE", "1")),
+    max_size=int(os.getenv("SQL_POOL_MAX_SIZE", "10")),
+    max_lifetime=float(os.getenv("SQL_POOL_MAX_LIFETIME", "1800")),
+    idle_timeout=float(os.getenv("SQL_POOL_IDLE_TIMEOUT", "300")),
+    acquire_timeout=float(os.getenv("SQL_POOL_ACQUIRE_TIMEOUT", "30")),
+    health_check_interval=float(os.getenv("SQL_POOL_HEALTH_CHECK_INTERVAL", "30")),
+    connect_timeout=10,
+    statement_cache_size=int(os.getenv("SQL_POOL_STATEMENT_CACHE_SIZE", "32")),
+)
+
+# Hints de bloqueo para lecturas dentro de una transacción que preceden a una escritura:
+# ROW_LOCK bloquea las filas leídas; RANGE_LOCK además impide insertar filas nuevas en el rango.
+ROW_LOCK = "WITH (UPDLOCK, ROWLOCK)"
+RANGE_LOCK = "WITH (UPDLOCK, HOLDLOCK)"
+
+# Hilos dedicados a las llamadas bloqueantes de pyodbc, para no congelar el event loop.
+# Por defecto hay tantos hilos como conexiones máximas en el pool.
+db_executor = DatabaseExecutor(
+    max_workers=int(os.getenv("SQL_EXECUTOR_WORKERS", str(pool.max_size))),
+    max_queue=int(os.getenv("SQL_EXECUTOR_MAX_QUEUE", "100")),
+    name="db",
+)
+
+def _acquire_connection():
     """
-    Establece y devuelve una conexión a la base de datos de manera asíncrona.
-    Utiliza la cadena de conexión global y maneja errores de conexión.
-    
-    Returns:
-        pyodbc.Connection: Objeto de conexión a la base de datos.
+    Obtiene una conexión del pool (llamada bloqueante, se ejecuta en el executor).
     
     Raises:
         Exception: Si ocurre un error al intentar conectar a la base de datos.
     """
+    inicio = time.perf_counter()
     try:
-        logger.info(f"Intentando conectar a la base de datos...")
-        conn = pyodbc.connect(connection_string, timeout=10)
-        logger.info("Conexión exitosa a la base de datos.")
-        return conn
+        return pool.acquire()
+    except PoolTimeoutError as e:
+        logger.error(str(e))
+        raise Exception(f"Error de conexión a la base de datos: {str(e)}")
     except pyodbc.Error as e:
         logger.error(f"Error de conexión a la base de datos: {str(e)}")
         raise Exception(f"Error de conexión a la base de datos: {str(e)}")
     except Exception as e:
          logger.error(f"Error inesperado durante la conexión: {str(e)}")
          raise
+    finally:
+        adquisicion_conexiones.observe(time.perf_counter() - inicio)
+
+
+def _release_abandoned(future):
+    # Devuelve al pool una conexión obtenida para una corrutina que ya fue cancelada.
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+async def get_db_connection():
+    """
+    Obtiene una conexión del pool de manera asíncrona.
+    La espera por una conexión libre ocurre en el executor de base de datos; al
+    llamar `close()` sobre la conexión se devuelve al pool en lugar de cerrarse.
+    
+    Returns:
+        PooledConnection: Conexión del pool (misma interfaz que pyodbc.Connection).
+    
+    Raises:
+        Exception: Si ocurre un error al intentar conectar a la base de datos.
+    """
+    future = asyncio.ensure_future(db_executor.run(_acquire_connection))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_release_abandoned)
+        raise
+
+
+async def execute_query(sql_template, params=None, needs_commit=False, prepared=False, nombre=None, compacto=False):
+    """
+    Ejecuta una consulta SQL de forma asíncrona y devuelve las filas con tipos nativos de Python.
+    El trabajo bloqueante de pyodbc (conexión, ejecución y fetch) se delega al
+    executor de base de datos, por lo que el event loop queda libre mientras tanto.
+
+    Args:
+        sql_template (str): La consulta SQL a ejecutar.
+        params (tuple, optional): Parámetros para la consulta SQL para prevenir inyección SQL. Defaults to None.
+        needs_commit (bool, optional): True si la consulta modifica datos (INSERT, UPDATE, DELETE). Defaults to False.
+        prepared (bool, optional): True para sentencias frecuentes de texto estable: se
+            ejecutan con el cursor reservado para ellas en la conexión, de modo que se
+            preparan una sola vez por conexión. Defaults to False.
+        nombre (str, optional): Nombre estable de la consulta para las métricas. Por
+            defecto, "<Módulo>.<función>" de quien la ejecuta. Defaults to None.
+        compacto (bool, optional): True para listados grandes: devuelve un Filas
+            (columnas una sola vez y una tupla por fila) en lugar de un diccionario
+            por fila. Defaults to False.
+
+    Returns:
+        list[dict]: Una lista de diccionarios columna -> valor (date, Decimal, bool, etc.
+        tal como los entrega el driver), o un Filas con `compacto=True`. Vacía si la
+        consulta no devuelve filas.
+    
+    Raises:
+        Exception: Si ocurre un error durante la ejecución de la consulta.
+    """
+    nombre = nombre_consulta(nombre)
+    inicio = time.perf_counter()
+    try:
+        return await db_executor.run(_execute_query_sync, sql_template, params, needs_commit, prepared, nombre, compacto)
+    finally:
+        registrar_consulta(time.perf_counter() - inicio)
+
+
+async def execute_query_one(sql_template, params=None, needs_commit=False, prepared=False, nombre=None):
+    """
+    Igual que execute_query, pero devuelve solo la primera fila o None si no hay resultados.
+    """
+    rows = await execute_query(sql_template, params, needs_commit, prepared, nombre_consulta(nombre))
+    return rows[0] if rows else None
 
 
 async def execute_query_json(sql_template, params=None, needs_commit=False):
     """
     Ejecuta una consulta SQL de forma asíncrona y devuelve los resultados en formato JSON.
+    Se conserva por compatibilidad; el código nuevo debe usar execute_query, que
+    evita el viaje de ida y vuelta por JSON.
+
+    Returns:
+        str: Una cadena JSON que representa los resultados de la consulta.
+    """
+    rows = await execute_query(sql_template, params, needs_commit, nombre=nombre_consulta())
+    with medir("serialize"):
+        return json.dumps(rows, default=str)
+
+
+async def stream_query(sql_template, params=None, batch_size=500, nombre=None):
+    """
+    Ejecuta una consulta de lectura y entrega sus filas por lotes con `fetchmany`,
+    sin cargar el resultado completo en memoria.
+
+    Es un generador asíncrono: cada iteración produce una lista de hasta
+    `batch_size` diccionarios columna -> valor. La conexión se mantiene tomada
+    del pool mientras dura la iteración y se devuelve al terminar o al cancelarse.
+
+    Args:
+        sql_template (str): La consulta SQL a ejecutar.
+        params (tuple, optional): Parámetros para la consulta SQL. Defaults to None.
+        batch_size (int, optional): Filas por lote. Defaults to 500.
+        nombre (str, optional): Nombre estable de la consulta para las métricas. Conviene
+            indicarlo: al ser un generador, el nombre por defecto sería el de la función
+            que lo consume y no el de la que lo creó. Defaults to None.
+
+    Raises:
+        Exception: Si ocurre un error durante la ejecución de la consulta.
+    """
+    nombre = nombre_consulta(nombre)
+    # Para las métricas se suma solo el tiempo de ejecución y fetch, no el que tarda el cliente en leer.
+    medicion = {"segundos": 0.0, "filas": 0}
+    inicio = time.perf_counter()
+    conn = await get_db_connection()
+    cursor = None
+    try:
+        cursor = await db_executor.run(_medir_sync, medicion, _open_cursor_sync, conn, sql_template, params)
+        registrar_consulta(time.perf_counter() - inicio)
+        columns = [column[0] for column in cursor.description] if cursor.description else []
+        while columns:
+            with medir("db"):
+                rows = await db_executor.run(_medir_sync, medicion, cursor.fetchmany, batch_size)
+            if not rows:
+                break
+            medicion["filas"] += len(rows)
+            yield [dict(zip(columns, row)) for row in rows]
+    except pyodbc.Error as e:
+        logger.error(f"Error leyendo consulta por lotes (SQLSTATE: {e.args[0]}): {str(e)}")
+        if es_error_de_conexion(e):
+            conn.mark_broken()
+        raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+    finally:
+        duracion_consultas.observe(medicion["segundos"], nombre)
+        filas_consultas.observe(medicion["filas"], nombre)
+        # El cierre se protege de la cancelación para no perder la conexión del pool.
+        await _run_shielded(_close_cursor_sync, conn, cursor)
+
+
+def _medir_sync(medicion, func, *args):
+    inicio = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        medicion["segundos"] += time.perf_counter() - inicio
+
+
+def _open_cursor_sync(conn, sql_template, params):
+    cursor = conn.cursor()
+    param_info = "(sin parámetros)" if not params else f"(con {len(params)} parámetros)"
+    logger.info(f"Ejecutando consulta por lotes {param_info}: {sql_template}")
+    if params:
+        cursor.execute(sql_template, params)
+    else:
+        cursor.execute(sql_template)
+    return cursor
+
+
+def _close_cursor_sync(conn, cursor):
+    try:
+        if cursor:
+            cursor.close()
+    except pyodbc.Error as e:
+        logger.warning(f"Error cerrando cursor: {e}")
+        conn.mark_broken()
+    finally:
+        conn.close()
+        logger.info("Conexión devuelta al pool.")
+
+
+def _execute_query_sync(sql_template, params=None, needs_commit=False, prepared=False, nombre=None, compacto=False):
+    """
+    Versión bloqueante de execute_query; siempre se ejecuta en un hilo del executor.
     Maneja la conexión, ejecución, y el commit o rollback de transacciones.
 
     Args:
@@ -57,47 +255,28 @@ async def execute_query_json(sql_template, params=None, needs_commit=False):
         needs_commit (bool, optional): True si la consulta modifica datos (INSERT, UPDATE, DELETE). Defaults to False.
 
     Returns:
-        str: Una cadena JSON que representa los resultados de la consulta.
+        list[dict]: Las filas obtenidas, con tipos nativos de Python.
     
     Raises:
         Exception: Si ocurre un error durante la ejecución de la consulta.
     """
     conn = None
-    cursor = None
     try:
-        conn = await get_db_connection()
-        cursor = conn.cursor()
-        param_info = "(sin parámetros)" if not params else f"(con {len(params)} parámetros)"
-        logger.info(f"Ejecutando consulta {param_info}: {sql_template}")
-
-        # Ejecuta la consulta con o sin parámetros.
-        if params:
-            cursor.execute(sql_template, params)
-        else:
-            cursor.execute(sql_template)
-
-        results = []
-        # Si la consulta es un SELECT, procesa los resultados.
-        if cursor.description:
-            columns = [column[0] for column in cursor.description]
-            logger.info(f"Columnas obtenidas: {columns}")
-            for row in cursor.fetchall():
-                # Convierte tipos de datos no serializables (como bytes) a string.
-                processed_row = [str(item) if isinstance(item, (bytes, bytearray)) else item for item in row]
-                results.append(dict(zip(columns, processed_row)))
-        else:
-             logger.info("La consulta no devolvió columnas (posiblemente INSERT/UPDATE/DELETE).")
+        conn = _acquire_connection()
+        results = _run_statement_sync(conn, sql_template, params, prepared, nombre, compacto)
 
         # Si la operación requiere un commit, lo realiza.
         if needs_commit:
             logger.info("Realizando commit de la transacción.")
             conn.commit()
 
-        # Devuelve los resultados como una cadena JSON.
-        return json.dumps(results, default=str)
+        return results
 
     except pyodbc.Error as e:
         logger.error(f"Error ejecutando la consulta (SQLSTATE: {e.args[0]}): {str(e)}")
+        # Una conexión rota no debe volver al pool.
+        if conn and es_error_de_conexion(e):
+            conn.mark_broken()
         # Si hay un error y se necesitaba commit, hace rollback.
         if conn and needs_commit:
             try:
@@ -111,9 +290,204 @@ async def execute_query_json(sql_template, params=None, needs_commit=False):
         logger.error(f"Error inesperado durante la ejecución de la consulta: {str(e)}")
         raise # Relanza el error inesperado
     finally:
-        # Asegura que la conexión y el cursor se cierren correctamente.
-        if cursor:
-            cursor.close()
+        # Asegura que la conexión vuelva al pool.
         if conn:
             conn.close()
-            logger.info("Conexión cerrada.")
\ No newline at end of file
+            logger.info("Conexión devuelta al pool.")
+
+
+def _es_lectura(sql_template):
+    # Un SELECT suelto no deja nada que deshacer; cualquier otra sentencia (INSERT,
+    # UPDATE, MERGE, EXEC, un WITH que termine en escritura...) se trata como escritura.
+    return sql_template.lstrip()[:6].upper() == "SELECT"
+
+
+def _run_statement_sync(conn, sql_template, params=None, prepared=False, nombre=None, compacto=False):
+    """
+    Ejecuta una sentencia sobre una conexión ya obtenida y devuelve sus filas
+    como diccionarios (o como Filas con `compacto=True`). No hace commit ni
+    devuelve la conexión al pool.
+    Con `prepared=True` usa el cursor reservado para la sentencia y no lo cierra.
+    Si recibe `nombre`, registra la duración y las filas en las métricas.
+    """
+    cursor = conn.statement_cursor(sql_template) if prepared else conn.cursor()
+    inicio = time.perf_counter()
+    filas = 0
+    if not _es_lectura(sql_template):
+        # Puede dejar cambios sin confirmar: el pool hará rollback si nadie hace commit.
+        conn.mark_dirty()
+    try:
+        param_info = "(sin parámetros)" if not params else f"(con {len(params)} parámetros)"
+        logger.info(f"Ejecutando consulta {param_info}: {sql_template}")
+
+        # Ejecuta la consulta con o sin parámetros.
+        if params:
+            cursor.execute(sql_template, params)
+        else:
+            cursor.execute(sql_template)
+
+        # Si la consulta es un SELECT, procesa los resultados.
+        if cursor.description:
+            columns = [column[0] for column in cursor.description]
+            logger.info(f"Columnas obtenidas: {columns}")
+            if compacto:
+                resultado = Filas(columns, [tuple(row) for row in cursor.fetchall()])
+            else:
+                resultado = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            filas = len(resultado)
+            return resultado
+        logger.info("La consulta no devolvió columnas (posiblemente INSERT/UPDATE/DELETE).")
+        return []
+    except pyodbc.Error:
+        if prepared:
+            conn.discard_statement_cursor(sql_template)
+        raise
+    finally:
+        if nombre:
+            duracion_consultas.observe(time.perf_counter() - inicio, nombre)
+            filas_consultas.observe(filas, nombre)
+        if not prepared:
+            cursor.close()
+
+
+class Transaction:
+    """
+    Unidad de trabajo sobre una única conexión del pool.
+
+    Todas las sentencias ejecutadas con `execute` comparten la misma conexión y
+    la misma transacción; el commit o el rollback se hacen una sola vez al
+    salir del bloque `async with transaction() as tx`.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def execute(self, sql_template, params=None, prepared=False, nombre=None):
+        """
+        Ejecuta una sentencia dentro de la transacción y devuelve sus filas.
+        `prepared` y `nombre` tienen el mismo significado que en `execute_query`.
+
+        Raises:
+            Exception: Si ocurre un error durante la ejecución de la consulta.
+        """
+        nombre = nombre_consulta(nombre)
+        inicio = time.perf_counter()
+        try:
+            return await db_executor.run(self._execute_sync, sql_template, params, prepared, nombre)
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+
+    async def execute_one(self, sql_template, params=None, prepared=False, nombre=None):
+        """Igual que execute, pero devuelve solo la primera fila o None."""
+        rows = await self.execute(sql_template, params, prepared, nombre_consulta(nombre))
+        return rows[0] if rows else None
+
+    async def executemany(self, sql_template, seq_of_params, fast=True, nombre=None):
+        """
+        Ejecuta la misma sentencia para cada conjunto de parámetros.
+        Con `fast=True` usa `fast_executemany` de pyodbc, que envía todos los
+        parámetros en un solo arreglo en lugar de una ida y vuelta por fila.
+
+        Raises:
+            Exception: Si ocurre un error durante la ejecución de la consulta.
+        """
+        nombre = nombre_consulta(nombre)
+        inicio = time.perf_counter()
+        try:
+            await db_executor.run(self._executemany_sync, sql_template, list(seq_of_params), fast, nombre)
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+
+    def _execute_sync(self, sql_template, params, prepared, nombre):
+        try:
+            return _run_statement_sync(self._conn, sql_template, params, prepared, nombre)
+        except pyodbc.Error as e:
+            logger.error(f"Error ejecutando la consulta en transacción (SQLSTATE: {e.args[0]}): {str(e)}")
+            if es_error_de_conexion(e):
+                self._conn.mark_broken()
+            raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+
+    def _executemany_sync(self, sql_template, seq_of_params, fast, nombre):
+        if not seq_of_params:
+            return
+        cursor = self._conn.cursor()
+        inicio = time.perf_counter()
+        self._conn.mark_dirty()
+        try:
+            cursor.fast_executemany = fast
+            logger.info(f"Ejecutando consulta masiva ({len(seq_of_params)} filas): {sql_template}")
+            cursor.executemany(sql_template, seq_of_params)
+        except pyodbc.Error as e:
+            logger.error(f"Error en la ejecución masiva (SQLSTATE: {e.args[0]}): {str(e)}")
+            if es_error_de_conexion(e):
+                self._conn.mark_broken()
+            raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+        finally:
+            duracion_consultas.observe(time.perf_counter() - inicio, nombre)
+            filas_consultas.observe(len(seq_of_params), nombre)
+            cursor.close()
+
+
+@asynccontextmanager
+async def transaction():
+    """
+    Abre una transacción sobre una conexión del pool.
+
+    Si el bloque termina sin errores se hace commit; si lanza cualquier
+    excepción (incluida una HTTPException de validación) se hace rollback y la
+    excepción se propaga. Para bloquear filas que se van a modificar, las
+    lecturas previas pueden usar los hints ROW_LOCK o RANGE_LOCK.
+
+    Uso:
+        async with transaction() as tx:
+            fila = await tx.execute_one("SELECT ... FROM [t] WITH (UPDLOCK, ROWLOCK) WHERE ...", params)
+            await tx.execute("UPDATE ...", params)
+
+    Raises:
+        Exception: Si ocurre un error de conexión, de ejecución o al hacer commit.
+    """
+    with medir("db"):
+        conn = await get_db_connection()
+    # Aunque solo lea, puede tener filas bloqueadas (ROW_LOCK) hasta el commit o el rollback.
+    conn.mark_dirty()
+    ok = False
+    try:
+        yield Transaction(conn)
+        ok = True
+    finally:
+        with medir("db"):
+            await _run_shielded(_end_transaction_sync, conn, ok)
+
+
+def _end_transaction_sync(conn, commit):
+    try:
+        if commit:
+            logger.info("Realizando commit de la transacción.")
+            conn.commit()
+        else:
+            logger.warning("Realizando rollback de la transacción.")
+    except pyodbc.Error as e:
+        logger.error(f"Error durante el commit (SQLSTATE: {e.args[0]}): {str(e)}")
+        if es_error_de_conexion(e):
+            conn.mark_broken()
+        raise Exception(f"Error confirmando la transacción: {str(e)}") from e
+    finally:
+        # Al devolverla al pool, una conexión sin commit (`dirty`) hace rollback automáticamente.
+        conn.close()
+        logger.info("Conexión devuelta al pool.")
+
+
+async def _run_shielded(func, *args):
+    # Ejecuta trabajo de limpieza (commit, rollback, devolver la conexión) protegido de
+    # la cancelación, para no perder conexiones del pool.
+    return await asyncio.shield(_run_cleanup(func, *args))
+
+
+async def _run_cleanup(func, *args):
+    # La limpieza bloquea como cualquier llamada a pyodbc, así que nunca corre en el event
+    # loop: si la cola del executor de base de datos está llena, usa el executor por defecto.
+    try:
+        return await db_executor.run(func, *args)
+    except ExecutorSaturatedError:
+        logger.warning("Executor de base de datos saturado: la limpieza usa el executor por defecto.")
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
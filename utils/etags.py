@@ -0,0 +1,112 @@
+import hashlib
+import threading
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from utils.tiempos import RutaCronometrada
+
+
+def etag_de(cuerpo: bytes) -> str:
+    """
+    ETag fuerte calculado sobre los bytes de la respuesta: todos los workers (y
+    cualquier réplica) dan el mismo para el mismo contenido, sin estado compartido.
+    """
+    return '"' + hashlib.blake2b(cuerpo, digest_size=12).hexdigest() + '"'
+
+
+class VersionesTablas:
+    """
+    Contador de versión por tabla, incrementado por los controladores después
+    de cada escritura. Lo usan las copias en memoria (instantáneas, índices de
+    búsqueda) para saber cuándo rearmarse. Es de este proceso: no registra las
+    escrituras de otros workers, por eso no sirve como validador HTTP (los ETags
+    salen del contenido, ver etag_de).
+
+    El incremento se hace después del commit: una lectura que empezó antes
+    queda con la versión anterior y se vuelve a hacer.
+    """
+
+    def __init__(self):
+        self._versiones = {}
+        self._suscripciones = []
+        self._lock = threading.Lock()
+        self._stats = {"not_modified": 0, "modified": 0}
+
+    def incrementar(self, *tablas):
+        """Marca como modificadas las tablas indicadas y avisa a quien esté suscrito a ellas."""
+        with self._lock:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+            avisar = [callback for observadas, callback in self._suscripciones if observadas.intersection(tablas)]
+        for callback in avisar:
+            callback()
+
+    def clave(self, tablas) -> tuple:
+        """Versiones actuales de `tablas`: cambia si y solo si alguna de ellas se modificó."""
+        with self._lock:
+            return tuple(self._versiones.get(tabla, 0) for tabla in tablas)
+
+    def al_cambiar(self, tablas, callback):
+        """Registra `callback()` para que se llame después de cada escritura en alguna de `tablas`."""
+        with self._lock:
+            self._suscripciones.append((frozenset(tablas), callback))
+
+    def _contar(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data["versiones"] = dict(self._versiones)
+        return data
+
+
+versiones = VersionesTablas()
+
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    # If-None-Match admite "*" o una lista de ETags (comparación débil: se ignora W/).
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def no_modificado(request: Request, etag: str) -> bool:
+    """True si el If-None-Match de la solicitud incluye `etag` (se puede responder 304)."""
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and _coincide(if_none_match, etag)
+
+
+class RutaConEtag(RutaCronometrada):
+    """
+    Ruta cronometrada con GET condicionales: agrega a las respuestas 200 un ETag
+    calculado sobre el cuerpo y, si el If-None-Match del cliente ya lo incluye,
+    responde 304 sin cuerpo. Se usa como `route_class` de los routers de lectura.
+
+    La ruta se ejecuta igual (el ETag sale del contenido), lo que se ahorra es el
+    envío de la respuesta. Las que ya traen su propio ETag (las instantáneas,
+    que lo calculan una sola vez al armarse) pasan sin cambios.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def handler_con_etag(request: Request):
+            respuesta = await handler(request)
+            cuerpo = getattr(respuesta, "body", None)
+            if request.method not in ("GET", "HEAD") or respuesta.status_code != 200 \
+                    or cuerpo is None or "etag" in respuesta.headers:
+                return respuesta
+            etag = etag_de(cuerpo)
+            if no_modificado(request, etag):
+                versiones._contar("not_modified")
+                return Response(status_code=304, headers={"ETag": etag})
+            versiones._contar("modified")
+            respuesta.headers["ETag"] = etag
+            return respuesta
+
+        return handler_con_etag
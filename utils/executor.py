@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturatedError(Exception):
+    """Se lanza cuando la cola del executor alcanzó su límite y se rechaza el trabajo."""
+
+
+class DatabaseExecutor:
+    """
+    Pool de hilos dedicado a las llamadas bloqueantes del driver (pyodbc).
+
+    Las corrutinas delegan el trabajo con `await executor.run(func, *args)`, de
+    modo que el event loop de uvicorn sigue atendiendo otras peticiones mientras
+    la consulta está en SQL Server. La cola de espera está acotada por
+    `max_queue`; al superarla se lanza ExecutorSaturatedError en lugar de
+    acumular trabajo sin límite.
+
+    Args:
+        max_workers (int): Número de hilos dedicados a la base de datos.
+        max_queue (int): Máximo de tareas en espera de un hilo libre (0 = sin límite).
+        name (str): Prefijo de los hilos y nombre usado en las métricas.
+    """
+
+    def __init__(self, max_workers=10, max_queue=100, name="db"):
+        if max_workers < 1:
+            raise ValueError(f"max_workers debe ser >= 1 (recibido {max_workers})")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name = name
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "run_time_total": 0.0,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, func, *args):
+        """
+        Ejecuta `func(*args)` en un hilo del executor y espera su resultado
+        sin bloquear el event loop.
+
+        Si la corrutina se cancela antes de que la llamada llegue a un hilo, la
+        llamada no se ejecuta. Si ya está corriendo, la cancelación se propaga
+        cuando termina: un hilo no se puede interrumpir, y lo que venga después
+        sobre la misma conexión (por ejemplo, el rollback de una transacción) no
+        debe correr a la vez que ella, porque una conexión pyodbc no admite dos hilos.
+
+        Raises:
+            ExecutorSaturatedError: Si la cola de espera está llena.
+        """
+        with self._lock:
+            if self.max_queue and self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise ExecutorSaturatedError(
+                    f"Executor {self.name} saturado: {self._queued} tareas en cola")
+            self._queued += 1
+            self._stats["submitted"] += 1
+        ticket = _Ticket()
+        future = self._get_executor().submit(self._call, func, args, ticket)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Si la tarea se canceló antes de llegar a un hilo, libera su lugar en la cola;
+            # si ya estaba corriendo, espera a que termine.
+            with self._lock:
+                en_cola = not ticket.started
+                if en_cola:
+                    ticket.started = True
+                    self._queued -= 1
+            if not en_cola:
+                await _esperar(future)
+            raise
+
+    def _call(self, func, args, ticket):
+        started_at = time.monotonic()
+        wait = started_at - ticket.submitted_at
+        with self._lock:
+            if ticket.started:
+                # La corrutina ya abandonó esta tarea; no hay nadie esperando el resultado.
+                return None
+            ticket.started = True
+            self._queued -= 1
+            self._running += 1
+            self._stats["wait_time_total"] += wait
+            if wait > self._stats["wait_time_max"]:
+                self._stats["wait_time_max"] = wait
+        ok = False
+        try:
+            result = func(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._stats["run_time_total"] += time.monotonic() - started_at
+                self._stats["completed" if ok else "failed"] += 1
+
+    def stats(self) -> dict:
+        """Devuelve profundidad de cola, hilos ocupados y tiempos de espera acumulados."""
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+            })
+        finished = data["completed"] + data["failed"]
+        data["wait_time_avg"] = data["wait_time_total"] / finished if finished else 0.0
+        return data
+
+    def shutdown(self, wait=True):
+        """Detiene los hilos del executor; se vuelve a crear si se usa de nuevo."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+async def _esperar(future):
+    # Espera a que termine una llamada ya iniciada, aunque la corrutina se vuelva a cancelar.
+    espera = asyncio.wrap_future(future)
+    while not espera.done():
+        try:
+            await asyncio.shield(espera)
+        except asyncio.CancelledError:
+            continue
+        except Exception:
+            # El error lo recibiría quien ya no espera el resultado.
+            break
+
+
+class _Ticket:
+    __slots__ = ("submitted_at", "started")
+
+    def __init__(self):
+        self.submitted_at = time.monotonic()
+        self.started = False
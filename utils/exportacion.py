@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+# Formatos de exportación soportados y su tipo de contenido HTTP.
+FORMATOS_EXPORTACION = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return str(valor)
+
+
+async def lotes_a_ndjson(lotes):
+    """Convierte lotes de filas (listas de diccionarios) en líneas NDJSON codificadas en UTF-8."""
+    async for lote in lotes:
+        yield "".join(
+            json.dumps(fila, default=_valor_json, ensure_ascii=False) + "\n" for fila in lote
+        ).encode("utf-8")
+
+
+async def lotes_a_csv(lotes, columnas):
+    """
+    Convierte lotes de filas en CSV codificado en UTF-8. La cabecera viaja junto
+    con el primer lote y se emite siempre, aunque la consulta no devuelva filas.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columnas, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    async for lote in lotes:
+        writer.writerows(
+            {k: (_valor_json(v) if isinstance(v, (date, datetime, Decimal)) else v) for k, v in fila.items()}
+            for fila in lote
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Consulta sin filas: solo queda la cabecera pendiente.
+        yield buffer.getvalue().encode("utf-8")
+
+
+def exportar_lotes(lotes, formato: str, columnas):
+    """Devuelve el generador de bytes para el formato pedido ("ndjson" o "csv")."""
+    if formato == "csv":
+        return lotes_a_csv(lotes, columnas)
+    return lotes_a_ndjson(lotes)
+
+
+async def iniciar_flujo(flujo):
+    """
+    Obtiene el primer bloque del flujo antes de enviar la respuesta, para que un
+    error al abrir la consulta se pueda reportar como un error HTTP normal.
+    Devuelve un generador equivalente al original.
+    """
+    try:
+        primero = await flujo.__anext__()
+    except StopAsyncIteration:
+        primero = None
+
+    async def continuar():
+        if primero is None:
+            return
+        yield primero
+        async for bloque in flujo:
+            yield bloque
+
+    return continuar()
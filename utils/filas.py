@@ -0,0 +1,58 @@
+class Filas:
+    """
+    Resultado compacto de una consulta: los nombres de columna se guardan una
+    sola vez y cada fila es una tupla de valores, en lugar de un diccionario
+    por fila con las mismas claves repetidas.
+
+    Se comporta como una lista de solo lectura de diccionarios: `len`, iteración,
+    `filas[i]` y `filas[-1]["columna"]` arman el diccionario de esa fila al
+    pedirlo, y `filas[a:b]` devuelve otro Filas sin copiar valores. La
+    conversión completa (`como_dicts`) se deja para la serialización.
+    """
+
+    __slots__ = ("columnas", "tuplas")
+
+    def __init__(self, columnas, tuplas):
+        self.columnas = tuple(columnas)
+        self.tuplas = tuplas
+
+    def __len__(self):
+        return len(self.tuplas)
+
+    def __bool__(self):
+        return bool(self.tuplas)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return Filas(self.columnas, self.tuplas[indice])
+        return dict(zip(self.columnas, self.tuplas[indice]))
+
+    def __iter__(self):
+        columnas = self.columnas
+        for tupla in self.tuplas:
+            yield dict(zip(columnas, tupla))
+
+    def __repr__(self):
+        return f"Filas(columnas={self.columnas!r}, filas={len(self.tuplas)})"
+
+    def como_dicts(self) -> list:
+        """Lista de diccionarios columna -> valor, como la que devuelve execute_query."""
+        columnas = self.columnas
+        return [dict(zip(columnas, tupla)) for tupla in self.tuplas]
+
+    def proyectar(self, campos):
+        """
+        Devuelve un Filas con exactamente las columnas de `campos`, una lista de
+        pares (nombre, valor por defecto): en ese orden, con el valor por defecto
+        para las columnas que falten y sin las que sobren.
+        """
+        nombres = tuple(nombre for nombre, _ in campos)
+        if nombres == self.columnas:
+            return self
+        posiciones = {columna: i for i, columna in enumerate(self.columnas)}
+        selectores = [(posiciones.get(nombre), defecto) for nombre, defecto in campos]
+        tuplas = [
+            tuple(defecto if i is None else tupla[i] for i, defecto in selectores)
+            for tupla in self.tuplas
+        ]
+        return Filas(nombres, tuplas)
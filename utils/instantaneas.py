@@ -0,0 +1,205 @@
+import asyncio
+import functools
+import gzip
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from utils.etags import etag_de, no_modificado, versiones
+from utils.respuestas import codificar_json
+
+logger = logging.getLogger(__name__)
+
+# Registro de todas las instantáneas creadas, para exponer sus estadísticas.
+instantaneas = {}
+
+
+def _fallo(tarea) -> bool:
+    return tarea.cancelled() or tarea.exception() is not None
+
+
+@dataclass(frozen=True)
+class Instantanea:
+    # Versiones de las tablas de origen con las que se armó (ver VersionesTablas.clave).
+    clave: tuple
+    # JSON comprimido con gzip, listo para enviar con Content-Encoding: gzip.
+    cuerpo_gzip: bytes
+    # ETag fuerte calculado sobre el contenido.
+    etag: str
+    tamano_json: int
+    elementos: int
+    generada: float
+
+
+class InstantaneaComprimida:
+    """
+    Resultado materializado de una consulta pesada, serializado a JSON una sola
+    vez y guardado comprimido con gzip, para servirlo desde memoria sin volver
+    a consultar, validar ni serializar.
+
+    Se considera vigente mientras no cambie la versión de sus tablas de origen
+    (ver utils/etags.py). Una escritura en ellas programa una reconstrucción en
+    segundo plano `demora` segundos después, de modo que una ráfaga de escrituras
+    produce una sola; una lectura que encuentra la instantánea vencida no espera
+    esa demora: reconstruye en el momento en lugar de entregar datos viejos. La nueva instantánea
+    reemplaza a la anterior de una sola vez: quien ya la tenía termina de
+    enviarla sin cambios. `refrescar_periodicamente` la reconstruye además cada
+    cierto tiempo, para recoger escrituras hechas fuera de este proceso.
+
+    Args:
+        name (str): Nombre de la instantánea (para estadísticas).
+        cargar: Función asíncrona sin argumentos que devuelve el contenido (JSON-serializable).
+        tablas (tuple): Tablas de las que depende el contenido.
+        demora (float): Segundos entre una escritura y la reconstrucción en segundo plano.
+    """
+
+    def __init__(self, name, cargar, tablas, demora=1.0):
+        self.name = name
+        self.tablas = tuple(tablas)
+        self.demora = demora
+        self._cargar = cargar
+        self._actual = None
+        self._refresco = None
+        self._programada = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "rebuilds": 0, "waits": 0, "errors": 0}
+        versiones.al_cambiar(self.tablas, self._programar)
+        instantaneas[name] = self
+
+    async def obtener(self) -> Instantanea:
+        """Devuelve la instantánea vigente, esperando su reconstrucción si está vencida."""
+        actual = self._actual
+        if actual is not None and actual.clave == versiones.clave(self.tablas):
+            self._contar("hits")
+            return actual
+        self._contar("waits")
+        return await asyncio.shield(self._reconstruir())
+
+    async def refrescar_periodicamente(self, intervalo: float):
+        """Reconstruye la instantánea al iniciar y luego cada `intervalo` segundos (hasta ser cancelada)."""
+        while True:
+            try:
+                await asyncio.shield(self._reconstruir(forzar=True))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"No se pudo refrescar la instantánea {self.name}: {e}")
+            await asyncio.sleep(intervalo)
+
+    async def esperar(self):
+        """Espera a que terminen la reconstrucción programada y la que esté en curso, si las hay."""
+        _, en_curso = self._refresco or (None, None)
+        pendientes = [tarea for tarea in (self._programada, en_curso) if tarea is not None and not tarea.done()]
+        await asyncio.gather(*pendientes, return_exceptions=True)
+
+    def _programar(self):
+        # Llamado después de una escritura en las tablas de origen.
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        with self._lock:
+            if self._programada is not None and not self._programada.done():
+                return
+            self._programada = asyncio.ensure_future(self._reconstruir_despues())
+        self._programada.add_done_callback(self._registrar_error)
+
+    async def _reconstruir_despues(self):
+        await asyncio.sleep(self.demora)
+        actual = self._actual
+        if actual is None or actual.clave != versiones.clave(self.tablas):
+            await asyncio.shield(self._reconstruir())
+
+    def _reconstruir(self, forzar=False) -> asyncio.Future:
+        # Una sola reconstrucción por clave: las lecturas que llegan mientras tanto la comparten.
+        # Si la última terminó con error, la próxima lectura vuelve a intentar.
+        clave = versiones.clave(self.tablas)
+        with self._lock:
+            clave_en_curso, tarea = self._refresco or (None, None)
+            if tarea is None or clave_en_curso != clave or (tarea.done() and (forzar or _fallo(tarea))):
+                tarea = asyncio.ensure_future(self._construir(clave))
+                self._refresco = (clave, tarea)
+        return tarea
+
+    async def _construir(self, clave) -> Instantanea:
+        inicio = time.perf_counter()
+        contenido = await self._cargar()
+        cuerpo = codificar_json(contenido)
+        # La compresión va en un hilo para no frenar el event loop con catálogos grandes.
+        # mtime=0: el mismo contenido produce los mismos bytes (y el mismo ETag).
+        cuerpo_gzip = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(gzip.compress, cuerpo, compresslevel=6, mtime=0)
+        )
+        nueva = Instantanea(
+            clave=clave,
+            cuerpo_gzip=cuerpo_gzip,
+            etag=etag_de(cuerpo_gzip),
+            tamano_json=len(cuerpo),
+            elementos=len(contenido),
+            generada=time.time(),
+        )
+        with self._lock:
+            # Una reconstrucción más vieja que la vigente no la reemplaza.
+            if self._actual is None or self._actual.clave <= clave:
+                self._actual = nueva
+            self._stats["rebuilds"] += 1
+        logger.info(
+            f"Instantánea {self.name}: {nueva.elementos} elementos, {len(cuerpo)} -> "
+            f"{len(cuerpo_gzip)} bytes en {(time.perf_counter() - inicio) * 1000:.1f} ms"
+        )
+        return nueva
+
+    def _registrar_error(self, tarea):
+        if not tarea.cancelled() and tarea.exception() is not None:
+            self._contar("errors")
+            logger.error(f"No se pudo reconstruir la instantánea {self.name}: {tarea.exception()}")
+
+    def _contar(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            actual = self._actual
+        data["name"] = self.name
+        if actual is not None:
+            data.update({
+                "elementos": actual.elementos,
+                "bytes_json": actual.tamano_json,
+                "bytes_gzip": len(actual.cuerpo_gzip),
+                "generada": actual.generada,
+                "vigente": actual.clave == versiones.clave(self.tablas),
+            })
+        return data
+
+
+def _acepta_gzip(request: Request) -> bool:
+    for parte in request.headers.get("accept-encoding", "").split(","):
+        codificacion, _, parametros = parte.strip().partition(";")
+        if codificacion.strip().lower() in ("gzip", "*"):
+            return parametros.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+async def respuesta_instantanea(request: Request, instantanea: InstantaneaComprimida) -> Response:
+    """
+    Sirve la instantánea tal como está en memoria: con Content-Encoding: gzip si
+    el cliente lo acepta (lo habitual), descomprimida si no, y 304 si el cliente
+    ya tiene ese contenido (If-None-Match).
+    """
+    actual = await instantanea.obtener()
+    comprimida = _acepta_gzip(request)
+    # Cada codificación es una representación distinta y lleva su propio ETag.
+    etag = actual.etag if comprimida else actual.etag[:-1] + '-identity"'
+    encabezados = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if no_modificado(request, etag):
+        return Response(status_code=304, headers=encabezados)
+    if comprimida:
+        encabezados["Content-Encoding"] = "gzip"
+        return Response(actual.cuerpo_gzip, media_type="application/json", headers=encabezados)
+    return Response(gzip.decompress(actual.cuerpo_gzip), media_type="application/json", headers=encabezados)
@@ -0,0 +1,163 @@
+import bisect
+import sys
+import threading
+import time
+
+# Límites de los buckets (en segundos o en filas) de cada tipo de histograma.
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_FILAS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Tipo de contenido del formato de texto de Prometheus.
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Registro de todos los histogramas creados, en orden de creación.
+histogramas = []
+
+
+class Histogram:
+    """
+    Histograma acumulativo con etiquetas, al estilo de Prometheus.
+
+    Cada combinación de valores de etiquetas tiene sus propios contadores por
+    bucket, su suma y su cantidad de observaciones. `observe` es seguro para
+    hilos, así que se puede llamar desde el executor de base de datos.
+
+    Args:
+        name (str): Nombre de la métrica (por ejemplo, "db_query_duration_seconds").
+        documentation (str): Descripción publicada en la línea HELP.
+        buckets (Sequence[float]): Límites superiores de los buckets, en orden.
+        labelnames (Sequence[str]): Nombres de las etiquetas, en orden.
+    """
+
+    def __init__(self, name, documentation, buckets=BUCKETS_LATENCIA, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        histogramas.append(self)
+
+    def observe(self, value, *labelvalues):
+        """Registra una observación para los valores de etiquetas dados (en el orden de `labelnames`)."""
+        indice = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(labelvalues)
+            if serie is None:
+                # [conteos por bucket..., +Inf], suma
+                serie = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += value
+
+    def render(self):
+        """Devuelve las líneas del histograma en el formato de texto de Prometheus."""
+        with self._lock:
+            series = [(labels, list(conteos), suma) for labels, (conteos, suma) in self._series.items()]
+        lineas = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, conteos, suma in sorted(series):
+            etiquetas = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(self.labelnames, labelvalues)]
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                le = "+Inf" if limite == float("inf") else repr(float(limite))
+                etiquetas_bucket = ",".join(etiquetas + [f'le="{le}"'])
+                lineas.append(f"{self.name}_bucket{{{etiquetas_bucket}}} {acumulado}")
+            sufijo = f"{{{','.join(etiquetas)}}}" if etiquetas else ""
+            lineas.append(f"{self.name}_sum{sufijo} {suma}")
+            lineas.append(f"{self.name}_count{sufijo} {acumulado}")
+        return lineas
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus() -> str:
+    """Todas las métricas registradas en el formato de texto de Prometheus."""
+    lineas = []
+    for histograma in histogramas:
+        lineas.extend(histograma.render())
+    return "\n".join(lineas) + "\n"
+
+
+# --- Métricas de la aplicación ---
+
+duracion_consultas = Histogram(
+    "db_query_duration_seconds",
+    "Tiempo de ejecución de cada consulta (ejecución y fetch), por nombre de consulta.",
+    labelnames=("query",),
+)
+filas_consultas = Histogram(
+    "db_query_rows",
+    "Filas devueltas por cada consulta, por nombre de consulta.",
+    buckets=BUCKETS_FILAS,
+    labelnames=("query",),
+)
+adquisicion_conexiones = Histogram(
+    "db_connection_acquire_seconds",
+    "Tiempo de espera para obtener una conexión del pool.",
+)
+duracion_rutas = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de cada solicitud HTTP, por método, ruta y código de estado.",
+    labelnames=("method", "route", "status"),
+)
+
+
+# --- Nombres estables de consultas ---
+
+_nombres_por_codigo = {}
+
+
+def nombre_consulta(nombre=None, profundidad=2) -> str:
+    """
+    Devuelve el nombre estable de una consulta. Si no se indica uno, se usa la
+    función que la ejecutó, con el nombre corto de su módulo: por ejemplo
+    "Prestamos.obtener_todos_prestamos" para Controllers/Prestamos.py.
+
+    Args:
+        nombre (str, optional): Nombre explícito; se devuelve tal cual.
+        profundidad (int): Marcos de pila a subir desde quien llama a esta función.
+    """
+    if nombre:
+        return nombre
+    frame = sys._getframe(profundidad)
+    codigo = frame.f_code
+    nombre = _nombres_por_codigo.get(codigo)
+    if nombre is None:
+        modulo = frame.f_globals.get("__name__", "").rsplit(".", 1)[-1]
+        nombre = _nombres_por_codigo[codigo] = f"{modulo}.{codigo.co_name}"
+    return nombre
+
+
+# --- Middleware ---
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide la latencia de cada solicitud HTTP, desde que
+    llega hasta que se envía el último bloque de la respuesta (incluye las
+    respuestas en streaming). La etiqueta `route` es la plantilla de la ruta
+    ("/libros/{isbn}"), no la URL, para que la cantidad de series sea acotada.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        estado = [500]
+
+        async def send_con_estado(message):
+            if message["type"] == "http.response.start":
+                estado[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            ruta = scope.get("route")
+            plantilla = getattr(ruta, "path", None) or "<sin_ruta>"
+            duracion_rutas.observe(time.perf_counter() - inicio, scope["method"], plantilla, str(estado[0]))
@@ -0,0 +1,69 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException
+
+# Límites del parámetro `limit` en los listados paginados.
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+
+def _a_json(valor):
+    # Las fechas se guardan con una marca de tipo para poder reconstruirlas al decodificar.
+    if isinstance(valor, datetime):
+        return {"dt": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"d": valor.isoformat()}
+    return valor
+
+
+def _desde_json(valor):
+    if isinstance(valor, dict):
+        if "dt" in valor:
+            return datetime.fromisoformat(valor["dt"])
+        if "d" in valor:
+            return date.fromisoformat(valor["d"])
+    return valor
+
+
+def codificar_cursor(valores) -> str:
+    """
+    Convierte los valores de la clave de ordenamiento de la última fila en un
+    cursor opaco (base64 url-safe) para pedir la página siguiente.
+    """
+    crudo = json.dumps([_a_json(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, cantidad: int) -> list:
+    """
+    Reconstruye los valores de la clave a partir de un cursor generado por
+    codificar_cursor.
+
+    Raises:
+        HTTPException: 400 si el cursor está mal formado o no corresponde al listado.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode("utf-8"))
+        if not isinstance(valores, list) or len(valores) != cantidad:
+            raise ValueError("cantidad de claves incorrecta")
+        return [_desde_json(v) for v in valores]
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def armar_pagina(filas: list, limit: int, claves) -> dict:
+    """
+    Arma la respuesta paginada a partir de `limit + 1` filas leídas: si sobra
+    una fila hay página siguiente, y el cursor se calcula con las `claves` de
+    la última fila entregada. Acepta una lista de diccionarios o un Filas.
+    """
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        siguiente = codificar_cursor([ultima[c] for c in claves])
+    return {"elementos": filas, "siguiente_cursor": siguiente}
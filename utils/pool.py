@@ -0,0 +1,437 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pyodbc
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE que indican que la conexión quedó inutilizable y no debe volver al pool.
+ESTADOS_CONEXION_ROTA = ("08", "HYT00", "HYT01", "IM")
+
+
+def es_error_de_conexion(error: Exception) -> bool:
+    """
+    Indica si un error de pyodbc corresponde a una conexión rota (red caída,
+    timeout de login, sesión cerrada por el servidor, etc.).
+    """
+    if not isinstance(error, pyodbc.Error) or not error.args:
+        return False
+    sqlstate = str(error.args[0])
+    return sqlstate.startswith(ESTADOS_CONEXION_ROTA)
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión pyodbc administrada por un ConnectionPool.
+
+    Delega todos los atributos a la conexión real, pero `close()` devuelve la
+    conexión al pool en lugar de cerrarla, de modo que el código existente que
+    hace `conn.close()` en un `finally` sigue funcionando sin cambios.
+
+    `dirty` indica que la conexión escribió o abrió una transacción y todavía no
+    hizo commit ni rollback: solo entonces el pool hace rollback al recibirla.
+    Una conexión que solo leyó vuelve al pool sin otra ida y vuelta al servidor.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw):
+        self._pool = pool
+        self._raw = raw
+        self._statement_cursors = OrderedDict()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self.dirty = False
+        self.broken = False
+        self.in_use = False
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def commit(self):
+        self._raw.commit()
+        self.dirty = False
+
+    def rollback(self):
+        self._raw.rollback()
+        self.dirty = False
+
+    def mark_dirty(self):
+        """Marca que la conexión escribió o abrió una transacción (ver `ConnectionPool.release`)."""
+        self.dirty = True
+
+    def statement_cursor(self, sql):
+        """
+        Devuelve el cursor reservado en esta conexión para la sentencia `sql`.
+        pyodbc prepara una sentencia parametrizada la primera vez que un cursor
+        la ejecuta y reutiliza ese handle mientras el texto no cambie, así que
+        dedicar un cursor a cada sentencia frecuente hace que se compile una vez
+        por conexión. Se guardan a lo sumo `statement_cache_size` cursores (LRU).
+        """
+        cursor = self._statement_cursors.get(sql)
+        if cursor is not None:
+            self._statement_cursors.move_to_end(sql)
+            self._pool._count("statement_cursor_hits")
+            return cursor
+        cursor = self._raw.cursor()
+        self._statement_cursors[sql] = cursor
+        self._pool._count("statement_cursor_misses")
+        while len(self._statement_cursors) > self._pool.statement_cache_size:
+            _, antiguo = self._statement_cursors.popitem(last=False)
+            _cerrar_cursor(antiguo)
+        return cursor
+
+    def discard_statement_cursor(self, sql):
+        """Descarta el cursor de una sentencia (por ejemplo, tras un error al ejecutarla)."""
+        cursor = self._statement_cursors.pop(sql, None)
+        if cursor is not None:
+            _cerrar_cursor(cursor)
+
+    def mark_broken(self):
+        """Marca la conexión para que se descarte al devolverla al pool."""
+        self.broken = True
+
+    def close(self):
+        """Devuelve la conexión al pool (no la cierra físicamente)."""
+        if self.in_use:
+            self._pool.release(self)
+
+    def age(self, now: float) -> float:
+        return now - self.created_at
+
+    def idle_time(self, now: float) -> float:
+        return now - self.last_used
+
+
+def _cerrar_cursor(cursor):
+    try:
+        cursor.close()
+    except pyodbc.Error as e:
+        logger.warning(f"Error cerrando cursor de sentencia: {e}")
+
+
+class PoolTimeoutError(Exception):
+    """Se lanza cuando no hay conexiones disponibles dentro del tiempo de espera."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones pyodbc seguro para hilos.
+
+    Mantiene entre `min_size` y `max_size` conexiones físicas abiertas, valida
+    las conexiones al entregarlas, las recicla al superar `max_lifetime`, cierra
+    las que exceden `idle_timeout` sin uso y lleva estadísticas de uso.
+
+    Args:
+        connection_string (str): Cadena de conexión para pyodbc.
+        name (str): Nombre del pool, usado en logs y estadísticas.
+        min_size (int): Conexiones que se mantienen abiertas aunque no se usen.
+        max_size (int): Máximo de conexiones físicas simultáneas.
+        max_lifetime (float): Segundos de vida máximos de una conexión (0 = sin límite).
+        idle_timeout (float): Segundos sin uso antes de cerrar una conexión sobrante.
+        acquire_timeout (float): Segundos máximos de espera por una conexión libre.
+        health_check_interval (float): Segundos tras los cuales una conexión ociosa
+            se valida con `health_check_query` antes de entregarse (0 = siempre).
+        connect_timeout (int): Timeout de login pasado a `pyodbc.connect`.
+        statement_cache_size (int): Cursores de sentencias preparadas que se
+            conservan por conexión (ver `PooledConnection.statement_cursor`).
+    """
+
+    def __init__(self, connection_string, name="default", min_size=1, max_size=10,
+                 max_lifetime=1800.0, idle_timeout=300.0, acquire_timeout=30.0,
+                 health_check_interval=30.0, health_check_query="SELECT 1",
+                 connect_timeout=10, reap_interval=60.0, statement_cache_size=32):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Tamaños de pool inválidos: min={min_size}, max={max_size}")
+        self.connection_string = connection_string
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+        self.connect_timeout = connect_timeout
+        self.reap_interval = reap_interval
+        self.statement_cache_size = statement_cache_size
+
+        self._lock = threading.Condition()
+        self._idle = []  # Pila LIFO: la conexión más reciente se reutiliza primero.
+        self._size = 0
+        self._closed = False
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "connect_errors": 0,
+            "acquired": 0,
+            "released": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "expired": 0,
+            "reaped": 0,
+            "discarded_broken": 0,
+            "rollbacks_on_release": 0,
+            "statement_cursor_hits": 0,
+            "statement_cursor_misses": 0,
+        }
+
+    # --- Ciclo de vida ---
+
+    def open(self):
+        """Abre las conexiones mínimas e inicia el hilo que cierra conexiones ociosas."""
+        with self._lock:
+            self._closed = False
+        try:
+            self._fill_to_min()
+        except Exception as e:
+            logger.error(f"[pool {self.name}] No se pudieron precalentar las conexiones: {e}")
+        if self.reap_interval and self._reaper is None:
+            self._stop_reaper.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name=f"pool-{self.name}-reaper", daemon=True)
+            self._reaper.start()
+        logger.info(f"[pool {self.name}] Pool abierto (min={self.min_size}, max={self.max_size}).")
+
+    def close(self):
+        """Cierra todas las conexiones ociosas y detiene el pool."""
+        self._stop_reaper.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._lock.notify_all()
+        for conn in idle:
+            self._destroy(conn)
+        logger.info(f"[pool {self.name}] Pool cerrado.")
+
+    # --- Préstamo y devolución de conexiones ---
+
+    def acquire(self, timeout=None) -> PooledConnection:
+        """
+        Entrega una conexión sana del pool, creando una nueva si hay capacidad.
+
+        Raises:
+            PoolTimeoutError: Si no se obtiene conexión dentro de `timeout` segundos.
+            pyodbc.Error: Si falla la creación de una conexión nueva.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        start = time.monotonic()
+
+        while True:
+            conn = None
+            create = False
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError(f"El pool {self.name} está cerrado")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Tiempo de espera agotado ({timeout}s) obteniendo conexión del pool {self.name}")
+                    waited = True
+                    self._lock.wait(remaining)
+                    if self._closed:
+                        raise RuntimeError(f"El pool {self.name} está cerrado")
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif not self._validate(conn):
+                # Conexión expirada o caída: se descarta y se intenta con otra.
+                self._discard(conn)
+                continue
+
+            conn.in_use = True
+            with self._lock:
+                self._stats["acquired"] += 1
+                if waited:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time_total"] += time.monotonic() - start
+            return conn
+
+    def release(self, conn: PooledConnection):
+        """
+        Devuelve una conexión al pool, descartándola si quedó rota o expiró. Si
+        escribió o abrió una transacción sin commit (`dirty`), primero hace rollback.
+        """
+        if not conn.in_use:
+            return
+        conn.in_use = False
+        conn.last_used = time.monotonic()
+
+        if conn.dirty and not conn.broken:
+            # Deja la sesión limpia: descarta lo que no se confirmó.
+            try:
+                conn.rollback()
+            except pyodbc.Error as e:
+                logger.warning(f"[pool {self.name}] Rollback al devolver conexión falló: {e}")
+                conn.broken = True
+            self._count("rollbacks_on_release")
+
+        expired = self.max_lifetime and conn.age(conn.last_used) >= self.max_lifetime
+        with self._lock:
+            self._stats["released"] += 1
+            if not conn.broken and not expired and not self._closed:
+                self._idle.append(conn)
+                self._lock.notify()
+                return
+            if conn.broken:
+                self._stats["discarded_broken"] += 1
+            elif expired:
+                self._stats["expired"] += 1
+        self._discard(conn)
+
+    # --- Mantenimiento ---
+
+    def reap_idle(self) -> int:
+        """
+        Cierra las conexiones ociosas que superan `idle_timeout` o `max_lifetime`,
+        respetando siempre `min_size`. Devuelve cuántas conexiones se cerraron.
+        """
+        now = time.monotonic()
+        victims = []
+        with self._lock:
+            keep = []
+            # Las más antiguas están al fondo de la pila.
+            for conn in self._idle:
+                expired = self.max_lifetime and conn.age(now) >= self.max_lifetime
+                stale = self.idle_timeout and conn.idle_time(now) >= self.idle_timeout
+                if expired or (stale and self._size - len(victims) > self.min_size):
+                    victims.append(conn)
+                    self._stats["expired" if expired else "reaped"] += 1
+                else:
+                    keep.append(conn)
+            self._idle = keep
+        for conn in victims:
+            self._discard(conn)
+        if victims:
+            logger.info(f"[pool {self.name}] {len(victims)} conexiones ociosas cerradas.")
+        try:
+            self._fill_to_min()
+        except Exception as e:
+            logger.error(f"[pool {self.name}] No se pudo reponer el mínimo de conexiones: {e}")
+        return len(victims)
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> dict:
+        """Devuelve una instantánea de las estadísticas del pool."""
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                "name": self.name,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            })
+        return data
+
+    # --- Internos ---
+
+    def _create(self) -> PooledConnection:
+        try:
+            logger.info(f"[pool {self.name}] Abriendo nueva conexión a la base de datos...")
+            raw = pyodbc.connect(self.connection_string, timeout=self.connect_timeout)
+        except pyodbc.Error as e:
+            with self._lock:
+                self._stats["connect_errors"] += 1
+            logger.error(f"[pool {self.name}] Error de conexión a la base de datos: {e}")
+            raise
+        with self._lock:
+            self._stats["connections_created"] += 1
+        return PooledConnection(self, raw)
+
+    def _validate(self, conn: PooledConnection) -> bool:
+        now = time.monotonic()
+        if self.max_lifetime and conn.age(now) >= self.max_lifetime:
+            with self._lock:
+                self._stats["expired"] += 1
+            return False
+        if now - conn.last_checked < self.health_check_interval:
+            return True
+        cursor = None
+        try:
+            cursor = conn.raw.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            conn.last_checked = now
+            return True
+        except pyodbc.Error as e:
+            logger.warning(f"[pool {self.name}] Conexión descartada por health check fallido: {e}")
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+            return False
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except pyodbc.Error:
+                    pass
+
+    def _discard(self, conn: PooledConnection):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+        self._destroy(conn)
+
+    def _destroy(self, conn: PooledConnection):
+        try:
+            conn.raw.close()
+        except pyodbc.Error as e:
+            logger.warning(f"[pool {self.name}] Error cerrando conexión: {e}")
+        with self._lock:
+            self._stats["connections_closed"] += 1
+
+    def _fill_to_min(self):
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._create()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            conn.last_used = time.monotonic()
+            with self._lock:
+                self._idle.insert(0, conn)
+                self._lock.notify()
+
+    def _reap_loop(self):
+        while not self._stop_reaper.wait(self.reap_interval):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"[pool {self.name}] Error en el mantenimiento del pool: {e}")
+
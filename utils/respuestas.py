@@ -0,0 +1,112 @@
+import functools
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import Response
+from pydantic_core import PydanticUndefined
+
+from utils.filas import Filas
+from utils.tiempos import medir
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+# Con RESPUESTAS_RAPIDAS=0 las rutas que usan respuesta_rapida vuelven al camino
+# normal de FastAPI (validación contra el response_model y JSONResponse).
+RESPUESTAS_RAPIDAS_HABILITADAS = os.getenv("RESPUESTAS_RAPIDAS", "1") == "1"
+
+
+def _valor_json(valor):
+    # Las filas compactas se convierten en diccionarios recién al serializar.
+    if isinstance(valor, Filas):
+        return valor.como_dicts()
+    # Decimal sale como número, igual que al validarlo contra un campo float del modelo.
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def codificar_json(contenido) -> bytes:
+    """Codifica a JSON (UTF-8) con orjson si está instalado, o con json como respaldo."""
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_valor_json)
+    return json.dumps(contenido, default=_valor_json, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespuestaJSONRapida(Response):
+    """
+    Respuesta JSON codificada con orjson a partir de datos ya armados. Como el
+    endpoint devuelve una Response, FastAPI no la valida contra el response_model.
+
+    La codificación se hace al construir la respuesta, dentro del endpoint, así
+    que en Server-Timing "serialize" queda incluido en "handler".
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        with medir("serialize"):
+            return codificar_json(content)
+
+
+@functools.lru_cache(maxsize=None)
+def _campos(modelo):
+    # (nombre, valor por defecto) de cada campo, en el orden del modelo.
+    campos = []
+    for nombre, campo in modelo.model_fields.items():
+        defecto = campo.get_default(call_default_factory=True)
+        campos.append((nombre, None if defecto is PydanticUndefined else defecto))
+    return tuple(campos)
+
+
+def filas_como_modelo(filas: list, modelo) -> list:
+    """
+    Da a las filas la forma de salida del modelo (plano): sus campos, en su
+    orden, con el valor por defecto para las columnas que falten y sin las que
+    sobren. Las filas vienen de la base de datos y no se vuelven a validar.
+
+    Si la primera fila ya tiene exactamente los campos del modelo en orden, se
+    asume lo mismo para todas (salen de la misma consulta) y se devuelven tal cual.
+    Un Filas sigue siendo un Filas (ver Filas.proyectar).
+    """
+    if not filas:
+        return filas
+    campos = _campos(modelo)
+    if isinstance(filas, Filas):
+        return filas.proyectar(campos)
+    if tuple(filas[0]) == tuple(nombre for nombre, _ in campos):
+        return filas
+    return [{nombre: fila.get(nombre, defecto) for nombre, defecto in campos} for fila in filas]
+
+
+def respuesta_rapida(contenido, modelo, status_code: int = 200):
+    """
+    Respuesta de lectura sin revalidar filas de la base de datos.
+
+    `contenido` es una fila, una lista de filas o una página de armar_pagina
+    ({"elementos": [...], "siguiente_cursor": ...}); `modelo` es el modelo
+    (plano) de cada fila; las filas pueden venir como Filas. Con
+    RESPUESTAS_RAPIDAS=0 devuelve el contenido como diccionarios para que
+    FastAPI lo valide con el response_model de la ruta.
+    """
+    if not RESPUESTAS_RAPIDAS_HABILITADAS:
+        if isinstance(contenido, Filas):
+            return contenido.como_dicts()
+        if isinstance(contenido, dict) and isinstance(contenido.get("elementos"), Filas):
+            return {**contenido, "elementos": contenido["elementos"].como_dicts()}
+        return contenido
+    if isinstance(contenido, (list, Filas)):
+        datos = filas_como_modelo(contenido, modelo)
+    elif "elementos" in contenido and "siguiente_cursor" in contenido:
+        datos = {
+            "elementos": filas_como_modelo(contenido["elementos"], modelo),
+            "siguiente_cursor": contenido["siguiente_cursor"],
+        }
+    else:
+        datos = filas_como_modelo([contenido], modelo)[0]
+    return RespuestaJSONRapida(datos, status_code=status_code)
@@ -0,0 +1,69 @@
+import threading
+
+
+class StatementRegistry:
+    """
+    Registro central de las sentencias SQL que se arman dinámicamente.
+
+    Cada plantilla se genera una sola vez por combinación de columnas y se
+    reutiliza con el mismo texto exacto en todas las llamadas siguientes, de
+    modo que SQL Server guarda un solo plan por combinación y pyodbc puede
+    reutilizar la sentencia preparada en cada conexión del pool (ver
+    `execute_query(..., prepared=True)`).
+
+    Las columnas se validan contra los campos del modelo pydantic y se ordenan
+    en el orden en que el modelo las declara, así que el texto no depende del
+    orden en que llegaron los datos.
+    """
+
+    def __init__(self):
+        self._plantillas = {}
+        self._lock = threading.Lock()
+        self._stats = {"compiled": 0, "hits": 0}
+
+    def update(self, tabla, modelo, clave, datos, salida, condicion=""):
+        """
+        Devuelve (sql, params) para `UPDATE tabla SET ... OUTPUT ... WHERE clave = ?`.
+
+        Args:
+            tabla (str): Tabla calificada, por ejemplo "[biblioteca].[libro]".
+            modelo (type[BaseModel]): Modelo cuyos campos son las columnas permitidas.
+            clave (str): Columna de la condición WHERE (no se puede actualizar).
+            datos (dict): Columnas a actualizar y sus valores.
+            salida (Sequence[str]): Columnas devueltas con OUTPUT INSERTED.
+            condicion (str): Condición adicional del WHERE (texto fijo; sus parámetros
+                van después del de la clave). Defaults to "".
+
+        Raises:
+            ValueError: Si `datos` trae columnas que no pertenecen al modelo.
+        """
+        permitidas = [campo for campo in modelo.model_fields if campo != clave]
+        desconocidas = set(datos).difference(permitidas)
+        if desconocidas:
+            raise ValueError(f"Columnas no permitidas para {tabla}: {sorted(desconocidas)}")
+        columnas = tuple(campo for campo in permitidas if campo in datos)
+        llave = ("update", tabla, clave, columnas, tuple(salida), condicion)
+        with self._lock:
+            sql = self._plantillas.get(llave)
+            if sql is None:
+                sql = f"""
+        UPDATE {tabla}
+        SET {", ".join(f"[{columna}] = ?" for columna in columnas)}
+        OUTPUT {", ".join(f"INSERTED.[{columna}]" for columna in salida)}
+        WHERE [{clave}] = ?{f" AND {condicion}" if condicion else ""};
+    """
+                self._plantillas[llave] = sql
+                self._stats["compiled"] += 1
+            else:
+                self._stats["hits"] += 1
+        return sql, [datos[columna] for columna in columnas]
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data["templates"] = len(self._plantillas)
+        return data
+
+
+# Registro compartido por todos los controladores.
+sentencias = StatementRegistry()
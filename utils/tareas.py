@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Registro de todas las tareas creadas, para exponer sus estadísticas.
+tareas = {}
+
+
+class TareaPeriodica:
+    """
+    Trabajo de mantenimiento que corre en segundo plano cada cierto tiempo
+    (por ejemplo, generar las multas por atraso), lanzado desde el ciclo de
+    vida de la aplicación con `correr_periodicamente`.
+
+    Dos ejecuciones de la misma tarea nunca se superponen: si se pide una
+    mientras otra está en curso, se espera esa. Guarda estadísticas de las
+    ejecuciones: cantidad, errores, duración y el resultado de la última.
+
+    Args:
+        name (str): Nombre de la tarea (para estadísticas).
+        funcion: Función asíncrona sin argumentos; lo que devuelve queda como último resultado.
+    """
+
+    def __init__(self, name, funcion):
+        self.name = name
+        self._funcion = funcion
+        self._en_curso = None
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "errors": 0, "last_started": None, "last_duration_ms": None,
+                       "last_result": None, "last_error": None}
+        tareas[name] = self
+
+    async def ejecutar(self):
+        """Ejecuta la tarea (o espera la ejecución en curso) y devuelve su resultado."""
+        with self._lock:
+            if self._en_curso is None or self._en_curso.done():
+                self._en_curso = asyncio.ensure_future(self._medir())
+            tarea = self._en_curso
+        return await asyncio.shield(tarea)
+
+    async def correr_periodicamente(self, intervalo: float):
+        """Ejecuta la tarea al iniciar y luego cada `intervalo` segundos (hasta ser cancelada)."""
+        while True:
+            try:
+                await self.ejecutar()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Falló la tarea {self.name}: {e}")
+            await asyncio.sleep(intervalo)
+
+    async def _medir(self):
+        inicio = time.perf_counter()
+        with self._lock:
+            self._stats["last_started"] = time.time()
+        try:
+            resultado = await self._funcion()
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._stats["runs"] += 1
+                self._stats["last_duration_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        with self._lock:
+            self._stats["last_result"] = resultado
+        return resultado
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+        data["name"] = self.name
+        return data
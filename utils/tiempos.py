@@ -0,0 +1,181 @@
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+# Se puede desactivar el encabezado Server-Timing y activar el log por solicitud por variables de entorno.
+SERVER_TIMING_HABILITADO = os.getenv("SERVER_TIMING", "1") == "1"
+SERVER_TIMING_LOG = os.getenv("SERVER_TIMING_LOG", "0") == "1"
+
+# Tramos que se publican, en este orden, en el encabezado Server-Timing.
+TRAMOS = ("db", "handler", "validate", "serialize")
+
+
+class TiemposSolicitud:
+    """
+    Acumula los tiempos de una solicitud HTTP por tramo ("db", "handler",
+    "validate", "serialize") y la cantidad de consultas ejecutadas.
+
+    Las tareas hijas (asyncio.gather, agrupamiento de lecturas) heredan el
+    contexto, así que todas suman sobre el mismo objeto; por eso, con consultas
+    en paralelo, "db" puede ser mayor que "handler".
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tramos = {}
+        self.consultas = 0
+        self.fin_handler = None
+
+    def agregar(self, tramo, segundos):
+        self.tramos[tramo] = self.tramos.get(tramo, 0.0) + segundos
+
+    def encabezado(self) -> str:
+        """Valor del encabezado Server-Timing (duraciones en milisegundos)."""
+        partes = []
+        for tramo in TRAMOS:
+            if tramo == "db":
+                partes.append(f'db;desc="{self.consultas} consultas";dur={self.tramos.get("db", 0.0) * 1000:.1f}')
+            elif tramo in self.tramos:
+                partes.append(f"{tramo};dur={self.tramos[tramo] * 1000:.1f}")
+        partes.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.1f}")
+        return ", ".join(partes)
+
+
+_tiempos_actuales = contextvars.ContextVar("tiempos_solicitud", default=None)
+
+
+def tiempos_actuales():
+    """Los tiempos de la solicitud en curso, o None fuera de una solicitud."""
+    return _tiempos_actuales.get()
+
+
+@contextmanager
+def medir(tramo):
+    """Suma la duración del bloque al tramo indicado de la solicitud en curso (si la hay)."""
+    tiempos = _tiempos_actuales.get()
+    if tiempos is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos.agregar(tramo, time.perf_counter() - inicio)
+
+
+def registrar_consulta(segundos):
+    """Suma una consulta y su duración al tramo "db" de la solicitud en curso (si la hay)."""
+    tiempos = _tiempos_actuales.get()
+    if tiempos is not None:
+        tiempos.consultas += 1
+        tiempos.agregar("db", segundos)
+
+
+def _cronometrar_endpoint(endpoint):
+    # Mide el endpoint ("handler", incluye el tiempo de base de datos) y marca cuándo
+    # terminó: lo que pasa hasta que se renderiza la respuesta es la validación de FastAPI.
+    if getattr(endpoint, "_cronometrado", False):
+        # include_router vuelve a crear la ruta con el endpoint ya envuelto.
+        return endpoint
+
+    def terminar(tiempos, inicio):
+        tiempos.fin_handler = time.perf_counter()
+        tiempos.agregar("handler", tiempos.fin_handler - inicio)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def envoltura(*args, **kwargs):
+            tiempos = _tiempos_actuales.get()
+            if tiempos is None:
+                return await endpoint(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                terminar(tiempos, inicio)
+    else:
+        @functools.wraps(endpoint)
+        def envoltura(*args, **kwargs):
+            tiempos = _tiempos_actuales.get()
+            if tiempos is None:
+                return endpoint(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                terminar(tiempos, inicio)
+    envoltura._cronometrado = True
+    return envoltura
+
+
+class RutaCronometrada(APIRoute):
+    """
+    Ruta de FastAPI que mide su endpoint para el encabezado Server-Timing.
+    Se usa como `route_class` de los routers.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _cronometrar_endpoint(endpoint), **kwargs)
+
+
+class RespuestaJSONCronometrada(JSONResponse):
+    """
+    JSONResponse que mide su serialización ("serialize") y registra como
+    "validate" el tiempo desde que terminó el endpoint (validación contra el
+    response_model y conversión con jsonable_encoder).
+    """
+
+    def render(self, content) -> bytes:
+        tiempos = _tiempos_actuales.get()
+        if tiempos is None:
+            return super().render(content)
+        inicio = time.perf_counter()
+        if tiempos.fin_handler is not None:
+            tiempos.agregar("validate", inicio - tiempos.fin_handler)
+            tiempos.fin_handler = None
+        try:
+            return super().render(content)
+        finally:
+            tiempos.agregar("serialize", time.perf_counter() - inicio)
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI que abre los tiempos de cada solicitud y, al empezar la
+    respuesta, agrega el encabezado Server-Timing con el desglose
+    db (con cantidad de consultas) / handler / validate / serialize / total.
+    Con SERVER_TIMING_LOG=1 también lo escribe en el log.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SERVER_TIMING_HABILITADO or SERVER_TIMING_LOG):
+            await self.app(scope, receive, send)
+            return
+        tiempos = TiemposSolicitud()
+        token = _tiempos_actuales.set(tiempos)
+
+        async def send_con_tiempos(message):
+            if message["type"] == "http.response.start":
+                valor = tiempos.encabezado()
+                if SERVER_TIMING_HABILITADO:
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", valor.encode("latin-1"))]
+                if SERVER_TIMING_LOG:
+                    logger.info(f"{scope['method']} {scope['path']} -> {message['status']} | {valor}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_tiempos)
+        finally:
+            _tiempos_actuales.reset(token)